@@ -0,0 +1,36 @@
+# app/api/v1/endpoints/authors.py
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+
+from app.crud.books import get_book_repository
+from app.schemas.author import AuthorListResponse
+from app.schemas.response import pagination
+
+router = APIRouter()
+
+
+@router.get("/", response_model=AuthorListResponse)
+def get_authors(
+    q: Optional[str] = Query(
+        None, max_length=255, description="Начало имени (без учета регистра)"
+    ),
+    skip: int = Query(0, ge=0, description="Количество пропускаемых записей"),
+    limit: int = Query(
+        100, ge=1, le=1000, description="Количество записей на странице"
+    ),
+):
+    """Авторы по алфавиту с числом книг"""
+    authors, total = get_book_repository().list_authors(q, skip, limit)
+
+    response_data = {
+        "success": True,
+        "data": authors,
+        "pagination": pagination(total, skip, limit),
+        "timestamp": datetime.now().isoformat(),
+    }
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
@@ -1,26 +1,61 @@
 # app/api/v1/endpoints/books.py
+import asyncio
+import json
+import logging
 import sqlite3
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.config import settings
+from app.crud.books import DEFAULT_DESCENDING, LIST_COLUMNS, SORTS, get_book_repository
+from app.crud.isbn import canonical_isbn, get_isbn_filter
+from app.crud.popularity import get_popularity_tracker
+from app.crud.suggest import get_suggest_index
+from app.jobs.manager import SUCCEEDED, get_job_manager
+from app.schemas.book import (
+    AvailabilityBatch,
+    BookCreate,
+    BookFilter,
+    BookResponse,
+    BookUpdate,
+    BulkSelection,
+    BulkUpdate,
+    IsbnBatch,
+)
+from app.schemas.response import BookListResponse, pagination
 
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+router = APIRouter()
+logger = logging.getLogger(__name__)
 
-from app.schemas.book import BookCreate, BookUpdate
-from app.schemas.response import BookListResponse
+# Период опроса журнала изменений при long-poll/SSE и heartbeat SSE (секунды)
+CHANGES_POLL_INTERVAL = 0.25
+SSE_HEARTBEAT_INTERVAL = 15.0
+
+# Поля, от которых зависят индексы подсказок, похожих книг и дубликатов
+TEXT_FIELDS = {"title", "author", "description"}
 
-router = APIRouter()
 
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Разбор параметра fields=title,author (id возвращается всегда)"""
+    if fields is None:
+        return None
 
-def get_db_connection():
-    """Получение соединения с БД"""
-    conn = sqlite3.connect("library.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in BookResponse.model_fields]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Недопустимые поля: {', '.join(unknown) or fields}",
+        )
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
 
 
 @router.get("/", response_model=BookListResponse)
-async def get_books(
+def get_books(
     skip: int = Query(0, ge=0, description="Количество пропускаемых записей"),
     limit: int = Query(
         100, ge=1, le=1000, description="Количество записей на странице"
@@ -32,90 +67,67 @@ async def get_books(
         None, description="Фильтр по названию (частичное совпадение)"
     ),
     year: Optional[int] = Query(None, ge=1000, le=2100, description="Фильтр по году"),
+    year_from: Optional[int] = Query(
+        None, ge=1000, le=2100, description="Год издания не раньше"
+    ),
+    year_to: Optional[int] = Query(
+        None, ge=1000, le=2100, description="Год издания не позже"
+    ),
+    updated_since: Optional[datetime] = Query(
+        None, description="Измененные начиная с момента (ISO 8601, без пояса - UTC)"
+    ),
     search: Optional[str] = Query(
         None, description="Поиск по названию ИЛИ автору"
     ),  # НОВЫЙ параметр
     available_only: bool = Query(False, description="Только доступные книги"),
+    fields: Optional[str] = Query(
+        None, description="Поля через запятую, например title,author"
+    ),
+    view: str = Query(
+        "compact",
+        pattern="^(compact|full)$",
+        description="compact - без description, full - все поля",
+    ),
+    sort: str = Query(
+        "created_at",
+        pattern=f"^({'|'.join(SORTS)})$",
+        description="Поле сортировки",
+    ),
+    order: Optional[str] = Query(
+        None,
+        pattern="^(asc|desc)$",
+        description="Направление; по умолчанию desc для дат и asc для остального",
+    ),
 ):
-    """Получить список книг с пагинацией и фильтрацией"""
+    """Получить список книг с пагинацией, фильтрацией и сортировкой"""
+    columns = parse_fields(fields)
+    if columns is None and view == "compact":
+        columns = list(LIST_COLUMNS)
+    if order is None:
+        descending = DEFAULT_DESCENDING.get(sort, False)
+    else:
+        descending = order == "desc"
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Строим запрос
-        query = "SELECT * FROM books WHERE 1=1"
-        count_query = "SELECT COUNT(*) as total FROM books WHERE 1=1"
-        params = []
-
-        if author:
-            query += " AND author LIKE ?"
-            count_query += " AND author LIKE ?"
-            params.append(f"%{author}%")
-
-        if title:
-            query += " AND title LIKE ?"
-            count_query += " AND title LIKE ?"
-            params.append(f"%{title}%")
-
-        if search:  # Поиск по названию ИЛИ автору
-            query += " AND (title LIKE ? OR author LIKE ?)"
-            count_query += " AND (title LIKE ? OR author LIKE ?)"
-            params.append(f"%{search}%")
-            params.append(f"%{search}%")
-
-        if year:
-            query += " AND year = ?"
-            count_query += " AND year = ?"
-            params.append(year)
-
-        if available_only:
-            query += " AND is_available = 1"
-            count_query += " AND is_available = 1"
-
-        # Получаем общее количество
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()["total"]
-
-        # Добавляем пагинацию
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, skip])
-
-        # Выполняем основной запрос
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        # Преобразуем Row в dict (правильный способ)
-        books = []
-        for row in rows:
-            book_dict = {}
-            for key in row.keys():
-                value = row[key]
-                # Преобразуем булевы значения
-                if key == "is_available":
-                    value = bool(value)
-                book_dict[key] = value
-            books.append(book_dict)
-
-        conn.close()
-
-        # Рассчитываем пагинацию
-        page = (skip // limit) + 1 if limit > 0 else 1
-        total_pages = (total + limit - 1) // limit if limit > 0 else 1
+        filters = BookFilter(
+            author=author,
+            title=title,
+            year=year,
+            year_from=year_from,
+            year_to=year_to,
+            updated_since=updated_since,
+            search=search,
+            available_only=available_only,
+        )
+        books, total = get_book_repository().list_books(
+            filters, skip, limit, columns, sort, descending
+        )
 
         # Формируем ответ
         response_data = {
             "success": True,
             "data": books,
-            "pagination": {
-                "total": total,
-                "page": page,
-                "limit": limit,
-                "total_pages": total_pages,
-                "has_next": skip + limit < total,
-                "has_prev": skip > 0,
-                "next_page": skip + limit if skip + limit < total else None,
-                "prev_page": skip - limit if skip > 0 else None,
-            },
+            "pagination": pagination(total, skip, limit),
             "timestamp": datetime.now().isoformat(),
         }
 
@@ -130,199 +142,509 @@ async def get_books(
         )
 
 
-@router.get("/{book_id}")
-async def get_book(book_id: int):
-    """Получить книгу по ID"""
+def _read_changes(since: int, limit: int) -> dict:
+    """Пакет изменений из журнала (501, если хранилище его не ведет)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        batch = get_book_repository().changes_since(since, limit)
+    except NotImplementedError:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Лента изменений не поддерживается этим хранилищем",
+        )
+    # Записи после since уже удалены компакцией - клиенту нужна полная сверка
+    batch["truncated"] = since + 1 < batch["oldest_version"]
+    return batch
 
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        row = cursor.fetchone()  # Исправлено: было book, теперь row
 
-        conn.close()
+def format_sse(change: dict) -> str:
+    """Событие Server-Sent Events для одного изменения"""
+    data = json.dumps(change, ensure_ascii=False)
+    return f"id: {change['version']}\nevent: change\ndata: {data}\n\n"
 
-        if not row:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Книга с ID {book_id} не найдена",
-            )
 
-        # Преобразуем Row в dict
-        book_dict = {}
-        for key in row.keys():
-            value = row[key]
-            if key == "is_available":
-                value = bool(value)
-            book_dict[key] = value
+@router.get("/changes")
+async def get_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Последняя полученная версия"),
+    limit: int = Query(500, ge=1, le=5000, description="Размер пакета"),
+    wait: float = Query(
+        0, ge=0, le=60, description="Long-poll: сколько секунд ждать изменений"
+    ),
+    stream: bool = Query(False, description="Поток Server-Sent Events"),
+    last_event_id: Optional[int] = Header(None),
+):
+    """Лента изменений книг (long-poll или Server-Sent Events)"""
+    if last_event_id is not None:
+        since = max(since, last_event_id)
+
+    # Соединение долгое, поэтому эндпоинт асинхронный, а чтение журнала
+    # (SQLite) - в пуле потоков, как у остальных эндпоинтов
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        await run_in_threadpool(_read_changes, since, 1)  # 501 до начала потока
+
+        async def events():
+            cursor = since
+            idle = 0.0
+            while not await request.is_disconnected():
+                batch = await run_in_threadpool(_read_changes, cursor, limit)
+                if batch["truncated"]:
+                    yield "event: truncated\ndata: {}\n\n"
+                for change in batch["changes"]:
+                    yield format_sse(change)
+                    cursor = change["version"]
+                if batch["changes"]:
+                    idle = 0.0
+                    continue
+                if idle >= SSE_HEARTBEAT_INTERVAL:
+                    yield ": heartbeat\n\n"
+                    idle = 0.0
+                await asyncio.sleep(CHANGES_POLL_INTERVAL)
+                idle += CHANGES_POLL_INTERVAL
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
 
-        response_data = {
-            "success": True,
-            "data": book_dict,
-            "timestamp": datetime.now().isoformat(),
-        }
+    # Long-poll: ждем первых изменений не дольше wait секунд
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    batch = await run_in_threadpool(_read_changes, since, limit)
+    while not batch["changes"] and loop.time() < deadline:
+        await asyncio.sleep(CHANGES_POLL_INTERVAL)
+        batch = await run_in_threadpool(_read_changes, since, limit)
+
+    changes = batch["changes"]
+    response_data = {
+        "success": True,
+        "data": changes,
+        "next_since": changes[-1]["version"] if changes else since,
+        "latest_version": batch["latest_version"],
+        "truncated": batch["truncated"],
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.get("/suggest")
+def suggest_books(
+    q: str = Query(..., min_length=1, max_length=100, description="Начало слов"),
+    limit: int = Query(10, ge=1, le=50, description="Количество подсказок"),
+):
+    """Подсказки по префиксам слов названия и автора (из индекса в памяти)"""
+    index = get_suggest_index()
+    index.sync(get_book_repository())
 
-        return JSONResponse(
-            content=response_data, media_type="application/json; charset=utf-8"
-        )
+    response_data = {
+        "success": True,
+        "data": index.suggest(q, limit),
+        "timestamp": datetime.now().isoformat(),
+    }
 
-    except HTTPException:
-        raise
-    except Exception as e:
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.get("/popular")
+def popular_books(
+    limit: int = Query(10, ge=1, le=100, description="Количество книг"),
+):
+    """Самые просматриваемые книги (рейтинг в памяти)
+
+    Просмотры учитываются с задержкой до одного интервала сброса счетчиков.
+    """
+    repository = get_book_repository()
+    top = get_popularity_tracker().popular(limit, repository)
+    books = repository.get_books_by_ids([book_id for book_id, _ in top], LIST_COLUMNS)
+
+    response_data = {
+        "success": True,
+        "data": [
+            dict(books[book_id], views=views)
+            for book_id, views in top
+            if book_id in books
+        ],
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.get("/duplicates")
+def get_duplicates(
+    skip: int = Query(0, ge=0, description="Сколько групп пропустить"),
+    limit: int = Query(50, ge=1, le=500, description="Количество групп"),
+):
+    """Группы почти-дубликатов из последней задачи find_duplicates"""
+    manager = get_job_manager()
+    jobs = manager.store.list(SUCCEEDED, 1, "find_duplicates") if manager else []
+    if not jobs:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении книги: {str(e)}",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Поиск дубликатов еще не выполнялся " "(задача find_duplicates)",
+        )
+    job = jobs[0]
+    groups = job["result"]["groups"][skip : skip + limit]
+    books = get_book_repository().get_books_by_ids(
+        [book_id for group in groups for book_id in group["ids"]], LIST_COLUMNS
+    )
+
+    data = []
+    for group in groups:
+        # Книги могли удалить после поиска
+        members = [books[i] for i in group["ids"] if i in books]
+        if len(members) > 1:
+            data.append({"similarity": group["similarity"], "books": members})
+
+    response_data = {
+        "success": True,
+        "data": data,
+        "total": job["result"]["group_count"],
+        "job_id": job["id"],
+        "computed_at": job["finished_at"],
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+def _duplicate_index():
+    """Индекс дубликатов, если проверка при создании включена"""
+    if not settings.DEDUP_CHECK_ON_INSERT:
+        return None
+    # NumPy подгружается при первом обращении, а не при старте
+    from app.crud.dedup import get_duplicate_index
+
+    return get_duplicate_index()
+
+
+def _possible_duplicates(title: str, author: str) -> List[dict]:
+    """Похожие по названию и автору книги (пусто, если проверка выключена)"""
+    index = _duplicate_index()
+    if index is None:
+        return []
+    index.sync(get_book_repository())
+    return index.check(title, author)
+
+
+def _ensure_isbn_is_new(isbn: Optional[str], book_id: Optional[int] = None):
+    """409, если ISBN уже есть в каталоге в любой форме (ISBN-10/13)
+
+    Фильтр Блума отсекает заведомо новые ISBN без запроса к БД.
+    """
+    if not isbn:
+        return
+    existing = get_isbn_filter().find(get_book_repository(), [isbn], sync=False)
+    if existing[isbn] is not None and existing[isbn]["id"] != book_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Книга с таким ISBN уже существует",
         )
 
 
-@router.post("/", status_code=201)  # Исправлено: явно указываем 201
-async def create_book(book: BookCreate):
-    """Создать новую книгу"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Вставляем книгу
-        cursor.execute(
-            """
-            INSERT INTO books (title, author, isbn, year, description, is_available)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """,
-            (
-                book.title,
-                book.author,
-                book.isbn,
-                book.year,
-                book.description,
-                1 if book.is_available else 0,
-            ),
+@router.get("/by-isbn/{isbn}")
+def get_book_by_isbn(isbn: str):
+    """Получить книгу по ISBN (ISBN-10 и ISBN-13 взаимозаменяемы)"""
+    book_dict = get_isbn_filter().find(get_book_repository(), [isbn])[isbn]
+
+    if not book_dict:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Книга с ISBN {isbn} не найдена",
         )
 
-        book_id = cursor.lastrowid
+    response_data = {
+        "success": True,
+        "data": book_dict,
+        "timestamp": datetime.now().isoformat(),
+    }
 
-        # Получаем созданную книгу
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        row = cursor.fetchone()
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
 
-        conn.commit()
-        conn.close()
 
-        if not row:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Ошибка при создании книги",
-            )
+@router.post("/by-isbn")
+def get_books_by_isbn(batch: IsbnBatch):
+    """Пакетный поиск книг по ISBN (null для отсутствующих)"""
+    found = get_isbn_filter().find(get_book_repository(), batch.isbns)
 
-        # Преобразуем Row в dict
-        book_dict = {}
-        for key in row.keys():
-            value = row[key]
-            if key == "is_available":
-                value = bool(value)
-            book_dict[key] = value
+    response_data = {
+        "success": True,
+        "data": [{"isbn": isbn, "book": found[isbn]} for isbn in batch.isbns],
+        "timestamp": datetime.now().isoformat(),
+    }
 
-        response_data = {
-            "success": True,
-            "data": book_dict,
-            "message": "Книга успешно создана",
-            "timestamp": datetime.now().isoformat(),
-        }
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
 
-        return JSONResponse(
-            status_code=201,  # Явно указываем статус код в ответе
-            content=response_data,
-            media_type="application/json; charset=utf-8",
+
+def _change_availability(book_id: int, available: bool):
+    """Выдача/возврат одной книги одним условным UPDATE"""
+    result = get_book_repository().set_availability([book_id], available)
+
+    if result["not_found"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Книга с ID {book_id} не найдена",
+        )
+    if result["conflicts"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                f"Книга с ID {book_id} уже выдана"
+                if not available
+                else f"Книга с ID {book_id} не была выдана"
+            ),
         )
 
-    except sqlite3.IntegrityError as e:
-        if "UNIQUE constraint failed" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Книга с таким ISBN уже существует",
-            )
+    response_data = {
+        "success": True,
+        "data": {"id": book_id, "is_available": available},
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+def _change_availability_batch(batch: AvailabilityBatch, available: bool):
+    """Пакетная выдача/возврат книг"""
+    result = get_book_repository().set_availability(
+        batch.ids, available, atomic=batch.atomic
+    )
+
+    if batch.atomic and (result["conflicts"] or result["not_found"]):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ошибка базы данных: {str(e)}",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                f"Изменения не применены: конфликты {result['conflicts']}, "
+                f"не найдены {result['not_found']}"
+            ),
+        )
+
+    response_data = {
+        "success": True,
+        "data": result,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.post("/checkout")
+def checkout_books(batch: AvailabilityBatch):
+    """Выдать несколько книг за один запрос"""
+    return _change_availability_batch(batch, available=False)
+
+
+@router.post("/return")
+def return_books(batch: AvailabilityBatch):
+    """Вернуть несколько книг за один запрос"""
+    return _change_availability_batch(batch, available=True)
+
+
+def _bulk_result(selection: BulkSelection, matched: List[int], key: str) -> dict:
+    """Ответ пакетной операции: счетчики и ID из списка, которых нет"""
+    data = {
+        "matched": len(matched),
+        key: 0 if selection.dry_run else len(matched),
+        "dry_run": selection.dry_run,
+    }
+    if selection.ids is not None:
+        found = set(matched)
+        data["not_found"] = [i for i in dict.fromkeys(selection.ids) if i not in found]
+    return {
+        "success": True,
+        "data": data,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@router.patch("/bulk")
+def bulk_update_books(bulk: BulkUpdate):
+    """Изменить одни и те же поля у книг по списку ID или по фильтрам
+
+    Все изменения - одним UPDATE в одной транзакции; dry_run только
+    считает подходящие книги.
+    """
+    fields = bulk.fields.model_dump(exclude_none=True)
+    try:
+        updated = get_book_repository().update_books(
+            bulk.ids, bulk.filters, fields, dry_run=bulk.dry_run
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при создании книги: {str(e)}",
+            detail=f"Ошибка при обновлении книг: {str(e)}",
         )
 
+    if not bulk.dry_run and fields.keys() & TEXT_FIELDS:
+        books = get_book_repository().get_books_by_ids(updated)
+        for book_id, book in books.items():
+            _refresh_indexes(book_id, book)
 
-@router.put("/{book_id}")
-async def update_book(book_id: int, book_update: BookUpdate):
-    """Обновить книгу по ID"""
+    return JSONResponse(
+        content=_bulk_result(bulk, updated, "updated"),
+        media_type="application/json; charset=utf-8",
+    )
+
+
+@router.delete("/bulk")
+def bulk_delete_books(bulk: BulkSelection):
+    """Удалить книги по списку ID или по фильтрам одним DELETE"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        deleted = get_book_repository().delete_books(
+            bulk.ids, bulk.filters, dry_run=bulk.dry_run
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при удалении книг: {str(e)}",
+        )
 
-        # Проверяем существует ли книга
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        existing_book = cursor.fetchone()
+    if not bulk.dry_run:
+        for book_id in deleted:
+            get_popularity_tracker().forget(book_id)
+            _refresh_indexes(book_id)
 
-        if not existing_book:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Книга с ID {book_id} не найдена",
-            )
+    return JSONResponse(
+        content=_bulk_result(bulk, deleted, "deleted"),
+        media_type="application/json; charset=utf-8",
+    )
 
-        # Собираем поля для обновления
-        update_fields = []
-        update_values = []
 
-        if book_update.title is not None:
-            update_fields.append("title = ?")
-            update_values.append(book_update.title)
+@router.post("/{book_id}/checkout")
+def checkout_book(book_id: int):
+    """Выдать книгу (409, если она уже выдана)"""
+    return _change_availability(book_id, available=False)
 
-        if book_update.author is not None:
-            update_fields.append("author = ?")
-            update_values.append(book_update.author)
 
-        if book_update.isbn is not None:
-            update_fields.append("isbn = ?")
-            update_values.append(book_update.isbn)
+@router.post("/{book_id}/return")
+def return_book(book_id: int):
+    """Вернуть книгу (409, если она не была выдана)"""
+    return _change_availability(book_id, available=True)
 
-        if book_update.year is not None:
-            update_fields.append("year = ?")
-            update_values.append(book_update.year)
 
-        if book_update.description is not None:
-            update_fields.append("description = ?")
-            update_values.append(book_update.description)
+def _refresh_similar(book_id: int, book: Optional[dict] = None):
+    """Обновление вектора книги в индексе похожих (book=None - удалена)"""
+    from app.crud.similar import get_similar_index
 
-        if book_update.is_available is not None:
-            update_fields.append("is_available = ?")
-            update_values.append(1 if book_update.is_available else 0)
+    index = get_similar_index()
+    if index is None:
+        return
+    if book is None:
+        index.remove(book_id)
+    else:
+        index.upsert(book)
 
-        # Добавляем updated_at
-        update_fields.append("updated_at = CURRENT_TIMESTAMP")
 
-        if not update_fields:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Нет данных для обновления",
-            )
+def _refresh_duplicates(book_id: int, book: Optional[dict] = None):
+    """Обновление книги в индексе дубликатов (book=None - удалена)"""
+    index = _duplicate_index()
+    if index is None:
+        return
+    if book is None:
+        index.remove(book_id)
+    else:
+        index.add(book)
+
+
+def _refresh_indexes(book_id: int, book: Optional[dict] = None):
+    """Индексы в памяти после записи в БД (book=None - книга удалена)
+
+    Запись уже зафиксирована, поэтому ошибка индекса только логируется:
+    500 заставил бы клиента повторить запрос и создать книгу второй раз.
+    Пропущенное изменение индексы подтянут из журнала при синхронизации.
+    """
+    try:
+        if book is None:
+            get_suggest_index().remove(book_id)
+        else:
+            get_suggest_index().upsert(book_id, book["title"], book["author"])
+        _refresh_similar(book_id, book)
+        _refresh_duplicates(book_id, book)
+    except Exception:
+        logger.exception("Не удалось обновить индексы книги %s", book_id)
+
+
+@router.get("/{book_id}/similar")
+def similar_books(
+    book_id: int,
+    limit: int = Query(10, ge=1, le=50, description="Количество книг"),
+):
+    """Похожие книги по TF-IDF названия, автора и описания"""
+    from app.crud.similar import TEXT_COLUMNS, get_similar_index
+
+    index = get_similar_index()
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Похожие книги недоступны: не установлены numpy и scipy",
+        )
+    repository = get_book_repository()
+    book = repository.get_book(book_id, TEXT_COLUMNS)
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Книга с ID {book_id} не найдена",
+        )
+
+    index.sync(repository)
+    found = index.similar(book, limit)
+    books = repository.get_books_by_ids([item["id"] for item in found], LIST_COLUMNS)
 
-        # Добавляем ID в конец значений
-        update_values.append(book_id)
+    response_data = {
+        "success": True,
+        "data": [
+            dict(books[item["id"]], score=item["score"])
+            for item in found
+            if item["id"] in books
+        ],
+        "timestamp": datetime.now().isoformat(),
+    }
 
-        # Выполняем обновление
-        update_query = f"UPDATE books SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(update_query, update_values)
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
 
-        # Получаем обновленную книгу
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        updated_book = cursor.fetchone()
 
-        conn.commit()
-        conn.close()
+@router.get("/{book_id}")
+def get_book(
+    book_id: int,
+    fields: Optional[str] = Query(
+        None, description="Поля через запятую, например title,author"
+    ),
+):
+    """Получить книгу по ID"""
+    columns = parse_fields(fields)
+
+    try:
+        book_dict = get_book_repository().get_book(book_id, columns)
+
+        if not book_dict:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Книга с ID {book_id} не найдена",
+            )
+        get_popularity_tracker().hit(book_id)
 
         response_data = {
             "success": True,
-            "data": dict(updated_book),
-            "message": "Книга успешно обновлена",
+            "data": book_dict,
             "timestamp": datetime.now().isoformat(),
         }
 
@@ -330,6 +652,37 @@ async def update_book(book_id: int, book_update: BookUpdate):
             content=response_data, media_type="application/json; charset=utf-8"
         )
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении книги: {str(e)}",
+        )
+
+
+@router.post("/", status_code=201)  # Исправлено: явно указываем 201
+def create_book(
+    book: BookCreate,
+    reject_duplicates: bool = Query(
+        False, description="409, если уже есть почти такая же книга"
+    ),
+):
+    """Создать новую книгу"""
+    # Храним ISBN-13: тогда UNIQUE столбца ловит и ISBN-10 той же книги
+    if book.isbn:
+        book.isbn = canonical_isbn(book.isbn)
+    _ensure_isbn_is_new(book.isbn)
+    duplicates = _possible_duplicates(book.title, book.author)
+    if duplicates and reject_duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Похожая книга уже существует: ID "
+            + ", ".join(str(d["id"]) for d in duplicates),
+        )
+
+    try:
+        book_dict = get_book_repository().create_book(book.model_dump())
     except sqlite3.IntegrityError as e:
         if "UNIQUE constraint failed" in str(e):
             raise HTTPException(
@@ -340,60 +693,116 @@ async def update_book(book_id: int, book_update: BookUpdate):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Ошибка базы данных: {str(e)}",
         )
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при обновлении книги: {str(e)}",
+            detail=f"Ошибка при создании книги: {str(e)}",
         )
 
+    # Книга уже сохранена: дальше ответ - только 201
+    if book_dict["isbn"]:
+        get_isbn_filter().add(book_dict["isbn"])
+    _refresh_indexes(book_dict["id"], book_dict)
+
+    response_data = {
+        "success": True,
+        "data": book_dict,
+        "possible_duplicates": duplicates,
+        "message": "Книга успешно создана",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        status_code=201,  # Явно указываем статус код в ответе
+        content=response_data,
+        media_type="application/json; charset=utf-8",
+    )
 
-@router.delete("/{book_id}")
-async def delete_book(book_id: int):
-    """Удалить книгу по ID"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
 
-        # Проверяем существует ли книга
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        book = cursor.fetchone()
+@router.put("/{book_id}")
+def update_book(book_id: int, book_update: BookUpdate):
+    """Обновить книгу по ID"""
+    if book_update.isbn:
+        book_update.isbn = canonical_isbn(book_update.isbn)
+    try:
+        _ensure_isbn_is_new(book_update.isbn, book_id)
 
-        if not book:
+        # Обновляем только переданные поля (updated_at обновляется всегда)
+        updated_book = get_book_repository().update_book(
+            book_id, book_update.model_dump(exclude_none=True)
+        )
+    except sqlite3.IntegrityError as e:
+        if "UNIQUE constraint failed" in str(e):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Книга с ID {book_id} не найдена",
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Книга с таким ISBN уже существует",
             )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка базы данных: {str(e)}",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при обновлении книги: {str(e)}",
+        )
 
-        # Удаляем книгу
-        cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
+    if not updated_book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Книга с ID {book_id} не найдена",
+        )
+    if book_update.isbn:
+        get_isbn_filter().add(book_update.isbn)
+    _refresh_indexes(book_id, updated_book)
 
-        conn.commit()
-        conn.close()
+    response_data = {
+        "success": True,
+        "data": updated_book,
+        "message": "Книга успешно обновлена",
+        "timestamp": datetime.now().isoformat(),
+    }
 
-        response_data = {
-            "success": True,
-            "message": f"Книга с ID {book_id} успешно удалена",
-            "deleted_book": dict(book),
-            "timestamp": datetime.now().isoformat(),
-        }
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
 
-        return JSONResponse(
-            content=response_data, media_type="application/json; charset=utf-8"
-        )
 
-    except HTTPException:
-        raise
+@router.delete("/{book_id}")
+def delete_book(book_id: int):
+    """Удалить книгу по ID"""
+    try:
+        book = get_book_repository().delete_book(book_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при удалении книги: {str(e)}",
         )
 
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Книга с ID {book_id} не найдена",
+        )
+    get_popularity_tracker().forget(book_id)
+    _refresh_indexes(book_id)
+
+    response_data = {
+        "success": True,
+        "message": f"Книга с ID {book_id} успешно удалена",
+        "deleted_book": book,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
 
 @router.patch("/{book_id}")
-async def partial_update_book(book_id: int, book_update: BookUpdate):
+def partial_update_book(book_id: int, book_update: BookUpdate):
     """Частично обновить книгу по ID (аналог PUT)"""
     # Используем ту же логику что и PUT
-    return await update_book(book_id, book_update)
+    return update_book(book_id, book_update)
@@ -0,0 +1,167 @@
+# app/api/v1/endpoints/jobs.py
+import hmac
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse, JSONResponse
+
+from app.core.config import settings
+from app.jobs.manager import (
+    FINISHED_STATUSES,
+    SUCCEEDED,
+    QueueFullError,
+    get_job_manager,
+)
+from app.schemas.job import JobCreate
+
+router = APIRouter()
+
+# Только с X-Admin-Token: restore перезаписывает живую базу, а снимок
+# backup - полная копия базы
+ADMIN_JOB_TYPES = {"backup", "restore"}
+
+
+def _manager():
+    manager = get_job_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Подсистема задач не запущена",
+        )
+    return manager
+
+
+def _get_job(job_id: int) -> dict:
+    job = _manager().store.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Задача с ID {job_id} не найдена",
+        )
+    return job
+
+
+def _job_response(job: dict, status_code: int = 200, message: Optional[str] = None):
+    response_data = {
+        "success": True,
+        "data": job,
+        "timestamp": datetime.now().isoformat(),
+    }
+    if message:
+        response_data["message"] = message
+
+    return JSONResponse(
+        status_code=status_code,
+        content=response_data,
+        media_type="application/json; charset=utf-8",
+    )
+
+
+def _check_admin(token: Optional[str]):
+    """403, если ADMIN_TOKEN не задан или X-Admin-Token с ним не совпадает"""
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(
+        (token or "").encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Задача доступна только администратору (X-Admin-Token)",
+        )
+
+
+@router.post("/", status_code=202)
+def submit_job(job: JobCreate, x_admin_token: Optional[str] = Header(None)):
+    """Поставить задачу в очередь"""
+    if job.type in ADMIN_JOB_TYPES:
+        _check_admin(x_admin_token)
+    manager = _manager()
+    try:
+        created = manager.submit(job.type, job.params, job.priority)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{e}. Доступные типы: {', '.join(sorted(manager.handlers))}",
+        )
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Очередь задач заполнена, повторите позже",
+            headers={"Retry-After": "5"},
+        )
+
+    return _job_response(
+        created, status_code=202, message="Задача поставлена в очередь"
+    )
+
+
+@router.get("/")
+def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", description="Статус"),
+    limit: int = Query(100, ge=1, le=1000),
+    job_type: Optional[str] = Query(None, alias="type", description="Тип задачи"),
+):
+    """Список задач (новые первыми)"""
+    response_data = {
+        "success": True,
+        "data": _manager().store.list(job_status, limit, job_type),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int):
+    """Состояние и прогресс задачи"""
+    return _job_response(_get_job(job_id))
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: int):
+    """Результат завершенной задачи (409, пока она не завершилась)"""
+    job = _get_job(job_id)
+    if job["status"] not in FINISHED_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Задача {job_id} еще не завершена ({job['status']})",
+        )
+
+    response_data = {
+        "success": job["status"] == SUCCEEDED,
+        "data": job["result"],
+        "status": job["status"],
+        "error": job["error"],
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    return JSONResponse(
+        content=response_data, media_type="application/json; charset=utf-8"
+    )
+
+
+@router.get("/{job_id}/download")
+def download_job_file(job_id: int, x_admin_token: Optional[str] = Header(None)):
+    """Файл задачи: выгрузка export или снимок backup (только администратору)"""
+    job = _get_job(job_id)
+    if job["type"] in ADMIN_JOB_TYPES:
+        _check_admin(x_admin_token)
+    if job["status"] != SUCCEEDED or not (job["result"] or {}).get("path"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"У задачи {job_id} нет готового файла",
+        )
+
+    return FileResponse(
+        job["result"]["path"],
+        media_type=job["result"].get("media_type", "application/x-ndjson"),
+        filename=job["result"].get("filename", f"books-{job_id}.ndjson"),
+    )
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: int):
+    """Отменить задачу"""
+    _get_job(job_id)
+    return _job_response(_manager().cancel(job_id), message="Отмена запрошена")
@@ -0,0 +1,322 @@
+# app/core/admission.py
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+
+from app.schemas.response import ErrorCodes
+
+# Классы запросов: у каждого свой лимит одновременных запросов
+READ = "read"
+SEARCH = "search"
+WRITE = "write"
+
+# Запросы списка с этими параметрами - поиск LIKE, а не чтение по индексу
+SEARCH_PARAMS = ("search", "title", "author")
+# Пути, которые только читают, хотя и принимают POST
+READ_POSTS = ("/api/v1/books/by-isbn",)
+# Долгие соединения (long-poll/SSE): только лимит частоты, без слота
+UNLIMITED_PATHS = ("/api/v1/books/changes",)
+
+
+def classify(method: str, path: str, query_string: bytes) -> Optional[str]:
+    """Класс запроса к API; None - запрос не занимает слот"""
+    if path in UNLIMITED_PATHS:
+        return None
+    if method not in ("GET", "HEAD") and path not in READ_POSTS:
+        return WRITE
+    if path.endswith(("/suggest", "/similar", "/duplicates")):
+        return SEARCH
+    if path in ("/api/v1/books", "/api/v1/books/") and query_string:
+        params = parse_qs(query_string.decode("latin-1"))
+        if any(params.get(name, [""])[0] for name in SEARCH_PARAMS):
+            return SEARCH
+    return READ
+
+
+class TokenBuckets:
+    """Token bucket на каждого клиента: rate токенов в секунду, не больше burst
+
+    Корзины хранятся в LRU на max_clients клиентов: вытесняется давно
+    не приходивший клиент, чья корзина к этому времени и так полна.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_clients: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """Списать токен; 0 - можно, иначе через сколько секунд появится токен"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                tokens, updated = bucket
+                bucket[0] = min(self.burst, tokens + (now - updated) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimit:
+    """Лимит одновременных запросов класса с очередью ожидания FIFO
+
+    Освободившийся слот передается первому ждущему напрямую, поэтому
+    новые запросы не обгоняют очередь. Ждать можно не дольше timeout,
+    а в очереди - не больше max_queue запросов: остальным сразу отказ.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            self.shed += 1
+            return False
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if waiter.done():
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.admitted += 1
+            return True
+        self._abandon(waiter)
+        self.shed += 1
+        return False
+
+    def _abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            self.release()  # слот успели передать - возвращаем его
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # слот переходит ждущему
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_wait_ms": round(self.total_wait * 1000 / max(self.admitted, 1), 3),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class AdmissionController:
+    """Допуск запросов к API: лимит частоты на клиента и слоты по классам
+
+    * сверх лимита частоты клиента - 429 с Retry-After;
+    * запрос ждет свободного слота своего класса не дольше queue_timeout,
+      при переполненной очереди или по истечении ожидания - 503 с
+      Retry-After (сброс нагрузки вместо накопления таймаутов).
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        rate: float,
+        burst: float,
+        queue_timeout: float = 1.0,
+        max_queue: int = 100,
+        max_clients: int = 10000,
+        trust_forwarded: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = {
+            name: ConcurrencyLimit(limit, max_queue) for name, limit in limits.items()
+        }
+        self.buckets = (
+            TokenBuckets(rate, burst, max_clients, clock) if rate > 0 else None
+        )
+        self.queue_timeout = queue_timeout
+        self.trust_forwarded = trust_forwarded
+        self.rate_limited = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "AdmissionController":
+        return cls(
+            {
+                READ: settings.ADMISSION_READ_LIMIT,
+                SEARCH: settings.ADMISSION_SEARCH_LIMIT,
+                WRITE: settings.ADMISSION_WRITE_LIMIT,
+            },
+            rate=settings.RATE_LIMIT_PER_SECOND,
+            burst=settings.RATE_LIMIT_BURST,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+            trust_forwarded=settings.ADMISSION_TRUST_FORWARDED,
+        )
+
+    def client_id(self, scope) -> str:
+        """Клиент - адрес соединения или первый X-Forwarded-For за прокси"""
+        if self.trust_forwarded:
+            forwarded = Headers(scope=scope).get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check_rate(self, scope) -> float:
+        """0 - запрос укладывается в лимит частоты, иначе Retry-After"""
+        if self.buckets is None:
+            return 0.0
+        wait = self.buckets.take(self.client_id(scope))
+        if wait:
+            self.rate_limited += 1
+        return wait
+
+    def capacity(self) -> int:
+        """Сколько запросов всех классов может выполняться одновременно"""
+        return sum(limit.limit for limit in self.limits.values())
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "clients": len(self.buckets) if self.buckets is not None else 0,
+            "classes": {name: limit.stats() for name, limit in self.limits.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """Admission control для путей /api/: отказ 429/503 до запуска эндпоинта
+
+    Слот держится, пока выполняется эндпоинт. Эндпоинты с SQLite - обычные
+    def и работают в пуле потоков, поэтому лимиты классов ограничивают
+    именно параллельную работу с базой, а цикл событий остается свободным.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    @staticmethod
+    async def reject(send, status: int, error: str, code: str, retry_after: int):
+        body = json.dumps(
+            {
+                "success": False,
+                "error": error,
+                "code": code,
+                "details": {"retry_after": retry_after},
+            },
+            ensure_ascii=False,
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not path.startswith("/api/")
+            or path.endswith("/openapi.json")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        wait = controller.check_rate(scope)
+        if wait:
+            await self.reject(
+                send,
+                429,
+                "Слишком много запросов",
+                ErrorCodes.RATE_LIMITED.value,
+                max(1, math.ceil(wait)),
+            )
+            return
+
+        request_class = classify(scope["method"], path, scope.get("query_string", b""))
+        limit = controller.limits.get(request_class)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limit.acquire(controller.queue_timeout):
+            await self.reject(
+                send,
+                503,
+                "Сервис перегружен, повторите позже",
+                ErrorCodes.OVERLOADED.value,
+                controller.retry_after(),
+            )
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
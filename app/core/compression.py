@@ -0,0 +1,276 @@
+# app/core/compression.py
+import gzip
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:  # zstd - опциональная зависимость
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Разбор Accept-Encoding в {кодировка: q}"""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+# Все кэши сжатых тел процесса (для сброса после замены данных)
+_caches: "weakref.WeakSet[CompressedBodyCache]" = weakref.WeakSet()
+
+
+def clear_compressed_caches():
+    """Сброс кэшей сжатых тел: данные заменены целиком (restore)"""
+    for cache in list(_caches):
+        cache.clear()
+
+
+class CompressedBodyCache:
+    """LRU-кэш сжатых тел ответов с ограничением по байтам
+
+    Ключ - (кодировка, путь, query, версия данных), а не содержимое тела:
+    в каждом JSON-ответе есть timestamp, и одинаковых тел не бывает.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+class CompressionMiddleware:
+    """Сжатие ответов gzip/zstd по Accept-Encoding
+
+    * ответы меньше minimum_size и уже сжатые ответы не трогаем;
+    * тело обычного ответа сжимается целиком;
+    * потоковые ответы (more_body=True) сжимаются по чанкам с flush,
+      поэтому остаются потоковыми.
+
+    Кэш сжатых тел работает для GET под cache_paths (кроме cache_exclude),
+    если передан version - версия данных, от которых зависит ответ. Пока
+    версия та же, повторный запрос получает уже сжатое тело (с timestamp
+    первого ответа); эндпоинт при этом выполняется как обычно. Версия
+    читается не чаще раза в version_ttl секунд и заново после каждой
+    записи через этот процесс; если она пошла назад (база восстановлена
+    из бэкапа), кэш сбрасывается.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        cache_bytes: int = 32 * 1024 * 1024,
+        version: Optional[Callable[[], Optional[int]]] = None,
+        cache_paths: Sequence[str] = ("/",),
+        cache_exclude: Sequence[str] = (),
+        version_ttl: float = 0.0,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.version = version
+        self.cache_paths = tuple(cache_paths)
+        self.cache_exclude = tuple(cache_exclude)
+        self.cache = (
+            CompressedBodyCache(cache_bytes)
+            if cache_bytes > 0 and version is not None
+            else None
+        )
+        self.version_ttl = version_ttl
+        self._version = None
+        self._version_expires = 0.0
+        self._max_version = None
+
+    def choose_encoding(self, headers: Headers) -> Optional[str]:
+        accepted = parse_accept_encoding(headers.get("accept-encoding", ""))
+        if zstandard is not None and accepted.get("zstd", 0) > 0:
+            return "zstd"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def cache_key(self, scope, encoding: str):
+        """Ключ кэша запроса или None, если ответ не кэшируется"""
+        if self.cache is None or scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        if not path.startswith(self.cache_paths) or path.startswith(self.cache_exclude):
+            return None
+        # Версию читаем до эндпоинта: тело не старее нее
+        version = self.current_version()
+        if version is None:
+            return None
+        return encoding, path, scope["query_string"], version
+
+    def current_version(self) -> Optional[int]:
+        """Версия данных (из памяти, если прочитана меньше version_ttl назад)"""
+        now = time.monotonic()
+        if now < self._version_expires:
+            return self._version
+        version = self.version()
+        if version is not None:
+            if self._max_version is not None and version < self._max_version:
+                # Номера версий пойдут повторно уже для других данных
+                self.cache.clear()
+            self._max_version = version
+        self._version = version
+        self._version_expires = now + self.version_ttl
+        return version
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        # mtime=0 - одинаковое тело дает одинаковый результат
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def stream_compressor(self, encoding: str):
+        """Пара функций (сжать чанк с flush, завершить поток)"""
+        if encoding == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+            return (
+                lambda chunk: compressor.compress(chunk)
+                + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush,
+            )
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return (
+            lambda chunk: compressor.compress(chunk)
+            + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.respond(scope, receive, send)
+        finally:
+            if scope["type"] == "http" and scope["method"] not in ("GET", "HEAD"):
+                # Своя запись видна следующему GET сразу, без ожидания ttl
+                self._version_expires = 0.0
+
+    async def respond(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(Headers(scope=scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        cache_key = self.cache_key(scope, encoding)
+        start_message = None
+        stream = None  # (сжать чанк, завершить) для потокового ответа
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, stream, passthrough
+
+            if message["type"] == "http.response.start":
+                # Заголовки отправим, когда увидим первый чанк тела
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is not None:
+                compress_chunk, finish = stream
+                message["body"] = compress_chunk(body) + (
+                    b"" if more_body else finish()
+                )
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Потоковый ответ: сжимаем по чанкам
+                del headers["Content-Length"]
+                stream = self.stream_compressor(encoding)
+                message["body"] = stream[0](body)
+            else:
+                cacheable = cache_key is not None and start_message["status"] == 200
+                compressed = self.cache.get(cache_key) if cacheable else None
+                if compressed is None:
+                    compressed = self.compress(encoding, body)
+                    if cacheable:
+                        self.cache.put(cache_key, compressed)
+                message["body"] = compressed
+                headers["Content-Length"] = str(len(compressed))
+
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
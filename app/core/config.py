@@ -14,6 +14,10 @@ class Settings:
 
     # База данных
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./library.db")
+    # Режим журнала файловой базы SQLite (WAL - читатели не ждут писателя)
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    # Количество файлов-шардов для файловой базы SQLite (1 - без шардирования)
+    DATABASE_SHARDS: int = int(os.getenv("DATABASE_SHARDS", "1"))
 
     # CORS
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "*").split(",")
@@ -22,6 +26,107 @@ class Settings:
     DEFAULT_PAGE_SIZE: int = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
     MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "1000"))
 
+    # Сжатие ответов
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_ZSTD_LEVEL: int = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+    # Бюджет кэша сжатых тел (0 - без кэша)
+    COMPRESSION_CACHE_BYTES: int = int(
+        os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024))
+    )
+    # Сколько секунд кэш доверяет прочитанной версии данных (записи других
+    # процессов видны с такой задержкой)
+    COMPRESSION_VERSION_TTL: float = float(os.getenv("COMPRESSION_VERSION_TTL", "0.1"))
+
+    # Admission control: одновременных запросов по классам, сколько ждать
+    # слота (секунды) и сколько запросов может ждать, прежде чем 503
+    ADMISSION_READ_LIMIT: int = int(os.getenv("ADMISSION_READ_LIMIT", "64"))
+    ADMISSION_SEARCH_LIMIT: int = int(os.getenv("ADMISSION_SEARCH_LIMIT", "8"))
+    # SQLite пишет в один поток: лишние писатели только ждут блокировку
+    ADMISSION_WRITE_LIMIT: int = int(os.getenv("ADMISSION_WRITE_LIMIT", "4"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+    # Клиент - первый адрес X-Forwarded-For (только за доверенным прокси)
+    ADMISSION_TRUST_FORWARDED: bool = (
+        os.getenv("ADMISSION_TRUST_FORWARDED", "False").lower() == "true"
+    )
+    # Token bucket на клиента: запросов в секунду (0 - без лимита) и всплеск
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", "100"))
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "200"))
+    RATE_LIMIT_MAX_CLIENTS: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+
+    # Прогрев после старта: горячие страницы SQLite и запросы до готовности
+    # (/ready). В фоне - порт открывается сразу, /ready ждет прогрева
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    WARMUP_BACKGROUND: bool = os.getenv("WARMUP_BACKGROUND", "False").lower() == "true"
+    # Бюджет обхода горячих страниц (секунды); остальное прогреют запросы
+    WARMUP_MAX_SECONDS: float = float(os.getenv("WARMUP_MAX_SECONDS", "10"))
+
+    # Обслуживание SQLite: чекпойнты WAL, инкрементальный VACUUM, ANALYZE
+    MAINTENANCE_ENABLED: bool = (
+        os.getenv("MAINTENANCE_ENABLED", "True").lower() == "true"
+    )
+    MAINTENANCE_CHECKPOINT_INTERVAL: float = float(
+        os.getenv("MAINTENANCE_CHECKPOINT_INTERVAL", "5")
+    )
+    # Размер WAL, после которого делается TRUNCATE-чекпойнт
+    MAINTENANCE_WAL_TRUNCATE_BYTES: int = int(
+        os.getenv("MAINTENANCE_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024))
+    )
+    MAINTENANCE_VACUUM_INTERVAL: float = float(
+        os.getenv("MAINTENANCE_VACUUM_INTERVAL", "60")
+    )
+    # Страниц за шаг incremental_vacuum и пауза между шагами (секунды)
+    MAINTENANCE_VACUUM_PAGES: int = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "256"))
+    MAINTENANCE_VACUUM_PAUSE: float = float(
+        os.getenv("MAINTENANCE_VACUUM_PAUSE", "0.05")
+    )
+    MAINTENANCE_ANALYZE_INTERVAL: float = float(
+        os.getenv("MAINTENANCE_ANALYZE_INTERVAL", "3600")
+    )
+
+    # Лента изменений: сколько записей журнала хранить и как часто чистить
+    CHANGE_LOG_MAX_ENTRIES: int = int(os.getenv("CHANGE_LOG_MAX_ENTRIES", "100000"))
+    CHANGE_LOG_MAX_AGE_SECONDS: int = int(
+        os.getenv("CHANGE_LOG_MAX_AGE_SECONDS", str(7 * 24 * 3600))
+    )
+    CHANGE_LOG_COMPACT_INTERVAL: int = int(
+        os.getenv("CHANGE_LOG_COMPACT_INTERVAL", "300")
+    )
+
+    # Популярность: размер рейтинга и период сброса счетчиков просмотров
+    POPULAR_TOP_K: int = int(os.getenv("POPULAR_TOP_K", "100"))
+    POPULARITY_FLUSH_INTERVAL: float = float(
+        os.getenv("POPULARITY_FLUSH_INTERVAL", "5")
+    )
+
+    # Похожие книги: каталог файлов индекса TF-IDF (пусто - только в памяти)
+    SIMILAR_INDEX_DIR: str = os.getenv("SIMILAR_INDEX_DIR", "./data/similar")
+    # Как часто (секунды) фоновая задача вливает накопленную дельту индекса
+    SIMILAR_MERGE_INTERVAL: float = float(os.getenv("SIMILAR_MERGE_INTERVAL", "30"))
+
+    # Почти-дубликаты (MinHash/LSH): порог похожести и проверка при создании
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+    DEDUP_CHECK_ON_INSERT: bool = (
+        os.getenv("DEDUP_CHECK_ON_INSERT", "True").lower() == "true"
+    )
+    DEDUP_MAX_GROUPS: int = int(os.getenv("DEDUP_MAX_GROUPS", "10000"))
+
+    # Фоновые задачи
+    JOBS_DATABASE_URL: str = os.getenv("JOBS_DATABASE_URL", "sqlite:///./jobs.db")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_QUEUE_SIZE: int = int(os.getenv("JOBS_QUEUE_SIZE", "100"))
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "./data/exports")
+
+    # Онлайн-бэкап: каталог снимков, страниц за шаг и пауза между шагами
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "./data/backups")
+    BACKUP_STEP_PAGES: int = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+    BACKUP_STEP_PAUSE: float = float(os.getenv("BACKUP_STEP_PAUSE", "0.01"))
+    BACKUP_COMPRESS: bool = os.getenv("BACKUP_COMPRESS", "True").lower() == "true"
+    # Токен администратора для backup и restore (заголовок X-Admin-Token);
+    # пустой - обе задачи через API запрещены
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
     # API
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_DESCRIPTION: str = """
@@ -0,0 +1,82 @@
+# app/core/startup.py
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.crud.books import DEFAULT_DESCENDING, LIST_COLUMNS, SORTS, BookRepository
+from app.db.warmup import warm_pages
+from app.schemas.book import BookFilter
+
+
+class Warmup:
+    """Этапы прогрева после старта; до их окончания сервис не готов
+
+    Каждый этап - (имя, функция); замеряются длительность и результат.
+    Ошибка этапа записывается и не мешает следующим: прогрев ускоряет
+    первые запросы, но не нужен для их правильности.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[], object]]]):
+        self.stages = stages
+        self.results = {}
+        self.duration_ms: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def run(self):
+        started = time.perf_counter()
+        for name, func in self.stages:
+            stage_started = time.perf_counter()
+            try:
+                result, error = func(), None
+            except Exception as e:
+                result, error = None, str(e)
+            self.results[name] = {
+                "duration_ms": round((time.perf_counter() - stage_started) * 1000, 3),
+                "result": result,
+                "error": error,
+            }
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._done.set()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "duration_ms": self.duration_ms,
+            "stages": dict(self.results),
+        }
+
+
+def warm_storage_pages(repository: BookRepository, max_seconds: float) -> dict:
+    """Горячие страницы каждой базы хранилища (не дольше max_seconds)"""
+    deadline = time.monotonic() + max_seconds
+    return {
+        factory.path or ":memory:": warm_pages(factory, deadline)
+        for factory in repository.connection_factories()
+    }
+
+
+def warm_queries(repository: BookRepository, page_size: int) -> dict:
+    """Первая страница списка для каждой сортировки, счетчик и авторы
+
+    Соединения не переиспользуются между запросами, поэтому кэша
+    подготовленных запросов, который можно было бы заполнить заранее, нет.
+    Вместо этого горячие запросы выполняются один раз: их страницы
+    попадают в кэш, а ленивая инициализация Python-кода проходит до
+    первого клиента.
+    """
+    filters = BookFilter()
+    for sort in SORTS:
+        repository.list_books(
+            filters,
+            0,
+            page_size,
+            list(LIST_COLUMNS),
+            sort,
+            DEFAULT_DESCENDING.get(sort, False),
+        )
+    repository.list_authors(None, 0, page_size)
+    return {"sorts": len(SORTS), "books": repository.count()}
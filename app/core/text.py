@@ -0,0 +1,14 @@
+# app/core/text.py
+import unicodedata
+
+
+def normalize(text: str) -> str:
+    """Нормализация для поиска: без диакритики, casefold (Ё -> е, É -> e)"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold()
+
+
+def normalize_name(name: str) -> str:
+    """Ключ имени автора: normalize и схлопнутые пробелы"""
+    return " ".join(normalize(name).split())
@@ -0,0 +1,1207 @@
+# app/crud/books.py
+import bisect
+import heapq
+import json
+import sqlite3
+import string
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.text import normalize_name
+from app.db.descriptions import decode_description, encode_description
+from app.db.session import (
+    BACKEND_MEMORY,
+    BACKEND_SQLITE_FILE,
+    ConnectionFactory,
+    init_schema,
+    parse_database_url,
+)
+from app.schemas.book import BookFilter
+
+# Колонки таблицы books в порядке объявления
+BOOK_COLUMNS = (
+    "id",
+    "title",
+    "author",
+    "isbn",
+    "year",
+    "description",
+    "is_available",
+    "created_at",
+    "updated_at",
+)
+
+# Компактное представление списка - без тяжелого description
+LIST_COLUMNS = tuple(c for c in BOOK_COLUMNS if c != "description")
+
+# Больше любого символа - верхняя граница диапазона префикса
+MAX_CHAR = "\U0010ffff"
+
+# Поля, которые разрешено изменять через update_book
+UPDATABLE_FIELDS = ("title", "author", "isbn", "year", "description", "is_available")
+
+# SQL-выражения полей книги: имя автора берется из справочника authors,
+# сжатое описание - из book_descriptions и только если оно запрошено
+COLUMN_SQL = {c: f"books.{c}" for c in BOOK_COLUMNS}
+COLUMN_SQL["author"] = "authors.name"
+COLUMN_SQL[
+    "description"
+] = "(SELECT data FROM book_descriptions WHERE book_id = books.id)"
+
+# Книги с именем автора. CROSS JOIN закрепляет books внешней таблицей,
+# чтобы список шел по idx_books_list без сортировки
+BOOKS_FROM = "books CROSS JOIN authors ON authors.id = books.author_id"
+
+# Сортировка по автору идет по idx_authors_name_norm, а книги каждого
+# автора - по idx_books_author_id, поэтому authors - внешняя таблица
+AUTHORS_FROM = "authors CROSS JOIN books ON books.author_id = authors.id"
+
+# Авторы, подходящие под фильтр, - по маленькому справочнику, дальше
+# книги выбираются по индексу idx_books_author_id
+AUTHOR_MATCH = "books.author_id IN (SELECT id FROM authors WHERE name_norm LIKE ?)"
+
+# NOCASE в SQLite приводит к нижнему регистру только ASCII
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Белый список сортировок списка: выражения ORDER BY (дальше всегда
+# books.id) и тот же порядок в Python для хранилища в памяти и слияния
+# шардов. Каждой сортировке соответствует индекс в ее порядке
+SORTS: Dict[str, Tuple[Tuple[str, ...], Callable[[dict], tuple]]] = {
+    "created_at": (("books.created_at",), lambda b: (b["created_at"],)),
+    "updated_at": (("books.updated_at",), lambda b: (b["updated_at"],)),
+    "year": (("books.year",), lambda b: (b["year"],)),
+    "title": (
+        ("books.title COLLATE NOCASE",),
+        lambda b: (b["title"].translate(ASCII_LOWER),),
+    ),
+    # authors.id (rowid индекса) делает порядок авторов строго уникальным,
+    # и книги внутри автора идут по idx_books_author_id без сортировки;
+    # имя автора уникально, поэтому в Python id автора не нужен
+    "author": (
+        ("authors.name_norm", "authors.name", "authors.id"),
+        lambda b: (normalize_name(b["author"]), b["author"]),
+    ),
+}
+
+# Порядок по умолчанию: даты - от новых, остальное - по возрастанию
+DEFAULT_DESCENDING = {"created_at": True, "updated_at": True}
+
+
+def row_to_dict(row) -> dict:
+    """Преобразование sqlite3.Row в dict с булевым is_available"""
+    book = dict(row)
+    if "is_available" in book:
+        book["is_available"] = bool(book["is_available"])
+    if isinstance(book.get("description"), bytes):
+        book["description"] = decode_description(book["description"])
+    return book
+
+
+def select_list(columns: Optional[Sequence[str]]) -> str:
+    """Список колонок для SELECT ... FROM BOOKS_FROM (проверка по BOOK_COLUMNS)"""
+    if columns is None:
+        columns = BOOK_COLUMNS
+    unknown = set(columns) - set(BOOK_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return ", ".join(f"{COLUMN_SQL[c]} AS {c}" for c in columns)
+
+
+def author_prefix_key(prefix: str) -> str:
+    """Ключ префикса имени автора; пробел в конце значит целое слово"""
+    key = normalize_name(prefix)
+    if key and prefix[-1:].isspace():
+        key += " "
+    return key
+
+
+def project(book: dict, columns: Optional[Sequence[str]]) -> dict:
+    """Оставить в книге только запрошенные поля"""
+    if columns is None:
+        return book
+    return {c: book[c] for c in columns}
+
+
+def _utc_timestamp() -> str:
+    """Метка времени в формате CURRENT_TIMESTAMP SQLite"""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def sql_timestamp(value: datetime) -> str:
+    """datetime в формате CURRENT_TIMESTAMP (UTC); без пояса - уже UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def sort_key(sort: str) -> Callable[[dict], tuple]:
+    """Ключ сортировки SORTS[sort] для книги в Python"""
+    key = SORTS[sort][1]
+    return lambda book: key(book) + (book["id"],)
+
+
+def order_by(sort: str, descending: bool) -> str:
+    """ORDER BY по белому списку SORTS"""
+    direction = " DESC" if descending else ""
+    return ", ".join(f"{expr}{direction}" for expr in SORTS[sort][0] + ("books.id",))
+
+
+class BookRepository:
+    """Базовый интерфейс хранилища книг"""
+
+    def init_schema(self) -> bool:
+        """Схема хранилища; True - DDL выполнялся (схема создана или обновлена)"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def scan(
+        self, columns: Optional[Sequence[str]] = None, batch_size: int = 10000
+    ) -> Iterator[dict]:
+        """Все книги по одной (для построения индексов в памяти)"""
+        raise NotImplementedError
+
+    def list_books(
+        self,
+        filters: BookFilter,
+        skip: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+    ) -> Tuple[List[dict], int]:
+        """Страница книг и общее количество; columns=None - все поля
+
+        sort - ключ из SORTS, при равенстве книги упорядочены по id.
+        """
+        raise NotImplementedError
+
+    def get_book(
+        self, book_id: int, columns: Optional[Sequence[str]] = None
+    ) -> Optional[dict]:
+        raise NotImplementedError
+
+    def create_book(self, data: dict) -> dict:
+        raise NotImplementedError
+
+    def update_book(self, book_id: int, fields: dict) -> Optional[dict]:
+        raise NotImplementedError
+
+    def delete_book(self, book_id: int) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update_books(
+        self,
+        book_ids: Optional[Sequence[int]],
+        filters: Optional[BookFilter],
+        fields: dict,
+        dry_run: bool = False,
+    ) -> List[int]:
+        """Одни и те же поля у книг по списку ID или по фильтрам
+
+        Одна транзакция и один UPDATE на хранилище. Возвращает ID
+        измененных книг, при dry_run - подходящих, ничего не меняя.
+        """
+        raise NotImplementedError
+
+    def delete_books(
+        self,
+        book_ids: Optional[Sequence[int]],
+        filters: Optional[BookFilter],
+        dry_run: bool = False,
+    ) -> List[int]:
+        """Удаление книг по списку ID или по фильтрам, как update_books"""
+        raise NotImplementedError
+
+    def set_availability(
+        self, book_ids: List[int], available: bool, atomic: bool = False
+    ) -> dict:
+        """Выдача (available=False) или возврат (available=True) книг
+
+        Возвращает {"updated": [...], "conflicts": [...], "not_found": [...]}.
+        При atomic=True изменения применяются только если прошли все ID.
+        """
+        raise NotImplementedError
+
+    def get_books_by_isbns(self, isbns: Sequence[str]) -> dict:
+        """Книги по списку ISBN: {isbn: книга} только для найденных"""
+        raise NotImplementedError
+
+    def get_books_by_ids(
+        self, book_ids: Sequence[int], columns: Optional[Sequence[str]] = None
+    ) -> Dict[int, dict]:
+        """Книги по списку ID: {id: книга} только для найденных"""
+        raise NotImplementedError
+
+    def add_views(self, counts: Dict[int, int]) -> Dict[int, int]:
+        """Прибавить просмотры одной транзакцией; новые итоги по книгам
+
+        Просмотры удаленных книг отбрасываются.
+        """
+        raise NotImplementedError
+
+    def top_viewed(self, limit: int) -> List[Tuple[int, int]]:
+        """Самые просматриваемые книги: [(id, просмотры)] по убыванию"""
+        raise NotImplementedError
+
+    def list_authors(
+        self, prefix: Optional[str], skip: int, limit: int
+    ) -> Tuple[List[dict], int]:
+        """Авторы по алфавиту: [{"name", "book_count"}] и общее количество
+
+        prefix - начало имени без учета регистра и диакритики.
+        """
+        raise NotImplementedError
+
+    def data_version(self) -> Optional[int]:
+        """Версия данных: растет при любой записи книг (по журналу изменений)
+
+        None - хранилище версию не знает, и кэши по ней не используются.
+        """
+        return None
+
+    def changes_since(self, since: int, limit: int) -> dict:
+        """Изменения с версией > since
+
+        Возвращает {"changes": [...], "latest_version": int,
+        "oldest_version": int}. В каждом изменении - текущее компактное
+        состояние книги (None для удаленных).
+        """
+        raise NotImplementedError
+
+    def compact_changes(
+        self, max_entries: int, max_age_seconds: Optional[int] = None
+    ) -> int:
+        """Удаление старых записей журнала изменений, возвращает их число"""
+        raise NotImplementedError
+
+    def connection_factories(self) -> List[ConnectionFactory]:
+        """Фабрики соединений SQLite хранилища (для обслуживания базы)"""
+        return []
+
+    def vacuum(self):
+        """Сжатие файла базы (VACUUM); для хранилища в памяти ничего не делает"""
+
+    def rebuild_indexes(self):
+        """Перестроение индексов и статистики планировщика"""
+
+    def close(self):
+        pass
+
+
+def availability_result(book_ids, updated, existing) -> dict:
+    """Разбор результата выдачи/возврата по спискам ID"""
+    updated = set(updated)
+    existing = set(existing)
+    return {
+        "updated": [i for i in book_ids if i in updated],
+        "conflicts": [i for i in book_ids if i in existing and i not in updated],
+        "not_found": [i for i in book_ids if i not in existing],
+    }
+
+
+def read_changes(
+    repository: BookRepository, since: int, batch_size: int = 5000
+) -> Tuple[List[dict], int, bool]:
+    """Все изменения после since для индексов в памяти
+
+    Возвращает (изменения, последняя версия, truncated). truncated=True -
+    журнал уже очищен дальше since либо моложе since (база восстановлена из
+    бэкапа), и индекс нужно строить заново. NotImplementedError хранилища
+    пробрасывается.
+    """
+    changes = []
+    while True:
+        batch = repository.changes_since(since, batch_size)
+        if since + 1 < batch["oldest_version"] or batch["latest_version"] < since:
+            return [], batch["latest_version"], True
+        changes.extend(batch["changes"])
+        if batch["changes"]:
+            since = batch["changes"][-1]["version"]
+        if len(batch["changes"]) < batch_size:
+            return changes, since, False
+
+
+def bulk_where(
+    book_ids: Optional[Sequence[int]], filters: Optional[BookFilter]
+) -> Tuple[str, list]:
+    """WHERE пакетной операции; список ID - одним JSON-параметром"""
+    if book_ids is not None:
+        return "books.id IN (SELECT value FROM json_each(?))", [json.dumps(book_ids)]
+    return build_where(filters)
+
+
+def build_where(filters: BookFilter, sort: Optional[str] = None) -> Tuple[str, list]:
+    """WHERE-условие и параметры для набора фильтров
+
+    Для запроса страницы передается sort: диапазоны по другим колонкам
+    помечаются унарным +, чтобы SQLite не брал их индекс и не сортировал
+    во временном B-дереве, а шел по индексу сортировки и останавливался
+    на LIMIT. Запрос количества (sort=None) использует все индексы.
+    """
+    clauses = ["1=1"]
+    params = []
+
+    def column(name):
+        indexed = sort is None or sort == name
+        return f"books.{name}" if indexed else f"+books.{name}"
+
+    # При сортировке по автору authors уже в запросе - фильтр прямо на нем
+    author_match = "authors.name_norm LIKE ?" if sort == "author" else AUTHOR_MATCH
+
+    if filters.author:
+        clauses.append(author_match)
+        params.append(f"%{normalize_name(filters.author)}%")
+
+    if filters.title:
+        clauses.append("books.title LIKE ?")
+        params.append(f"%{filters.title}%")
+
+    if filters.search:  # Поиск по названию ИЛИ автору
+        clauses.append(f"(books.title LIKE ? OR {author_match})")
+        params.append(f"%{filters.search}%")
+        params.append(f"%{normalize_name(filters.search)}%")
+
+    if filters.year:
+        clauses.append("books.year = ?")
+        params.append(filters.year)
+
+    if filters.year_from:
+        clauses.append(f"{column('year')} >= ?")
+        params.append(filters.year_from)
+
+    if filters.year_to:
+        clauses.append(f"{column('year')} <= ?")
+        params.append(filters.year_to)
+
+    if filters.updated_since:
+        clauses.append(f"{column('updated_at')} >= ?")
+        params.append(sql_timestamp(filters.updated_since))
+
+    if filters.available_only:
+        clauses.append(f"{column('is_available')} = 1")
+
+    return " AND ".join(clauses), params
+
+
+class SQLiteBookRepository(BookRepository):
+    """Хранилище в SQLite (файл или общая in-memory база)"""
+
+    def __init__(
+        self,
+        factory: ConnectionFactory,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        journal_mode: Optional[str] = None,
+    ):
+        self.factory = factory
+        self.journal_mode = journal_mode
+        # В режиме шардирования ID выдаются с шагом shard_count:
+        # шард k получает k+1, k+1+N, ... и (id - 1) % N == k
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+
+    def connect(self):
+        return self.factory.connect()
+
+    @staticmethod
+    def _select_book(conn, book_id, columns=None):
+        return conn.execute(
+            f"SELECT {select_list(columns)} FROM {BOOKS_FROM} WHERE books.id = ?",
+            (book_id,),
+        ).fetchone()
+
+    @staticmethod
+    def _author_id(conn, name: str) -> int:
+        """ID автора по имени; новый автор добавляется в справочник"""
+        return conn.execute(
+            """
+            INSERT INTO authors (name, name_norm) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET name = excluded.name
+            RETURNING id
+        """,
+            (name, normalize_name(name)),
+        ).fetchone()[0]
+
+    @staticmethod
+    def _store_description(conn, book_ids: Sequence[int], text: Optional[str]):
+        """Описание книг в book_descriptions одним запросом (None - удалить)"""
+        if text is None:
+            conn.execute(
+                "DELETE FROM book_descriptions "
+                "WHERE book_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(book_ids),),
+            )
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO book_descriptions (book_id, data) "
+                "SELECT value, ? FROM json_each(?)",
+                (encode_description(text), json.dumps(book_ids)),
+            )
+
+    def init_schema(self):
+        conn = self.connect()
+        try:
+            return init_schema(
+                conn, None if self.factory.is_memory else self.journal_mode
+            )
+        finally:
+            conn.close()
+
+    def count(self) -> int:
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        finally:
+            conn.close()
+
+    def scan(self, columns=None, batch_size=10000):
+        select = select_list(columns)
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT {select} FROM {BOOKS_FROM} ORDER BY books.id"
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row_to_dict(row)
+        finally:
+            conn.close()
+
+    def list_books(
+        self, filters, skip, limit, columns=None, sort="created_at", descending=True
+    ):
+        where, params = build_where(filters)
+        page_where, page_params = build_where(filters, sort)
+        select = select_list(columns)
+        source = AUTHORS_FROM if sort == "author" else BOOKS_FROM
+        conn = self.connect()
+        try:
+            total = conn.execute(
+                f"SELECT COUNT(*) as total FROM books WHERE {where}", params
+            ).fetchone()["total"]
+            rows = conn.execute(
+                f"SELECT {select} FROM {source} WHERE {page_where} "
+                f"ORDER BY {order_by(sort, descending)} LIMIT ? OFFSET ?",
+                page_params + [limit, skip],
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row_to_dict(row) for row in rows], total
+
+    def get_book(self, book_id, columns=None):
+        select_list(columns)
+        conn = self.connect()
+        try:
+            row = self._select_book(conn, book_id, columns)
+        finally:
+            conn.close()
+        return row_to_dict(row) if row else None
+
+    def create_book(self, data):
+        conn = self.connect()
+        try:
+            values = (
+                data["title"],
+                self._author_id(conn, data["author"]),
+                data.get("isbn"),
+                data["year"],
+                1 if data.get("is_available", True) else 0,
+            )
+            if self.shard_count > 1:
+                # ID вычисляется в том же INSERT, поэтому выдача атомарна
+                # даже при нескольких процессах
+                cursor = conn.execute(
+                    """
+                    INSERT INTO books (id, title, author_id, isbn, year, is_available)
+                    VALUES (
+                        (SELECT COALESCE(
+                            (SELECT seq FROM sqlite_sequence WHERE name = 'books'), ?
+                        ) + ?),
+                        ?, ?, ?, ?, ?
+                    )
+                """,
+                    (
+                        self.shard_index + 1 - self.shard_count,
+                        self.shard_count,
+                    )
+                    + values,
+                )
+            else:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO books (title, author_id, isbn, year, is_available)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    values,
+                )
+            if data.get("description") is not None:
+                self._store_description(conn, [cursor.lastrowid], data["description"])
+            row = self._select_book(conn, cursor.lastrowid)
+            conn.commit()
+        finally:
+            conn.close()
+        return row_to_dict(row)
+
+    def _assignments(self, conn, fields) -> Tuple[str, list]:
+        """SET-часть UPDATE для изменяемых полей (updated_at - всегда)
+
+        Описание хранится отдельно - его пишет _store_description.
+        """
+        update_fields = []
+        update_values = []
+        for name in UPDATABLE_FIELDS:
+            if name in fields and name != "description":
+                value = fields[name]
+                if name == "is_available":
+                    value = 1 if value else 0
+                if name == "author":
+                    name, value = "author_id", self._author_id(conn, value)
+                update_fields.append(f"{name} = ?")
+                update_values.append(value)
+        update_fields.append("updated_at = CURRENT_TIMESTAMP")
+        return ", ".join(update_fields), update_values
+
+    def update_book(self, book_id, fields):
+        conn = self.connect()
+        try:
+            assignments, values = self._assignments(conn, fields)
+            cursor = conn.execute(
+                f"UPDATE books SET {assignments} WHERE id = ?", values + [book_id]
+            )
+            if cursor.rowcount == 0:
+                return None
+            if "description" in fields:
+                self._store_description(conn, [book_id], fields["description"])
+            row = self._select_book(conn, book_id)
+            conn.commit()
+        finally:
+            conn.close()
+        return row_to_dict(row)
+
+    def delete_book(self, book_id):
+        conn = self.connect()
+        try:
+            row = self._select_book(conn, book_id)
+            if not row:
+                return None
+            conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        return row_to_dict(row)
+
+    def update_books(self, book_ids, filters, fields, dry_run=False):
+        where, params = bulk_where(book_ids, filters)
+        conn = self.connect()
+        try:
+            if dry_run:
+                rows = conn.execute(f"SELECT id FROM books WHERE {where}", params)
+                return [row[0] for row in rows]
+            assignments, values = self._assignments(conn, fields)
+            updated = [
+                row[0]
+                for row in conn.execute(
+                    f"UPDATE books SET {assignments} WHERE {where} RETURNING id",
+                    values + params,
+                ).fetchall()
+            ]
+            if "description" in fields and updated:
+                self._store_description(conn, updated, fields["description"])
+            if updated:
+                conn.commit()  # иначе откатывается и новый автор без книг
+        finally:
+            conn.close()
+        return updated
+
+    def delete_books(self, book_ids, filters, dry_run=False):
+        where, params = bulk_where(book_ids, filters)
+        conn = self.connect()
+        try:
+            if dry_run:
+                rows = conn.execute(f"SELECT id FROM books WHERE {where}", params)
+                return [row[0] for row in rows]
+            deleted = [
+                row[0]
+                for row in conn.execute(
+                    f"DELETE FROM books WHERE {where} RETURNING id", params
+                ).fetchall()
+            ]
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+
+    def set_availability(self, book_ids, available, atomic=False):
+        book_ids = list(dict.fromkeys(book_ids))
+        placeholders = ", ".join("?" * len(book_ids))
+        conn = self.connect()
+        try:
+            # Один условный UPDATE: выдать можно только доступную книгу и наоборот
+            updated = [
+                row[0]
+                for row in conn.execute(
+                    f"UPDATE books SET is_available = ? "
+                    f"WHERE is_available = ? AND id IN ({placeholders}) "
+                    "RETURNING id",
+                    [int(available), int(not available)] + book_ids,
+                ).fetchall()
+            ]
+            if len(updated) == len(book_ids):
+                conn.commit()
+                return availability_result(book_ids, updated, updated)
+
+            # Медленный путь: отличаем конфликт от отсутствующей книги
+            existing = [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT id FROM books WHERE id IN ({placeholders})", book_ids
+                ).fetchall()
+            ]
+            if atomic:
+                conn.rollback()
+                result = availability_result(book_ids, updated, existing)
+                result["updated"] = []
+                return result
+            conn.commit()
+        finally:
+            conn.close()
+        return availability_result(book_ids, updated, existing)
+
+    def get_books_by_isbns(self, isbns):
+        isbns = list(dict.fromkeys(isbns))
+        found = {}
+        conn = self.connect()
+        try:
+            # Пачками, чтобы не упереться в лимит параметров SQLite
+            for start in range(0, len(isbns), 500):
+                chunk = isbns[start : start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT {select_list(None)} FROM {BOOKS_FROM} "
+                    f"WHERE books.isbn IN ({placeholders})",
+                    chunk,
+                ):
+                    found[row["isbn"]] = row_to_dict(row)
+        finally:
+            conn.close()
+        return found
+
+    def get_books_by_ids(self, book_ids, columns=None):
+        book_ids = list(dict.fromkeys(book_ids))
+        if columns is not None and "id" not in columns:
+            select = select_list(list(columns) + ["id"])
+        else:
+            select = select_list(columns)
+        found = {}
+        conn = self.connect()
+        try:
+            for start in range(0, len(book_ids), 500):
+                chunk = book_ids[start : start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT {select} FROM {BOOKS_FROM} "
+                    f"WHERE books.id IN ({placeholders})",
+                    chunk,
+                ):
+                    book = row_to_dict(row)
+                    found[row["id"]] = project(book, columns) if columns else book
+        finally:
+            conn.close()
+        return found
+
+    def add_views(self, counts):
+        totals = {}
+        conn = self.connect()
+        try:
+            for book_id, views in counts.items():
+                row = conn.execute(
+                    """
+                    INSERT INTO book_stats (book_id, views)
+                    SELECT id, ? FROM books WHERE id = ?
+                    ON CONFLICT(book_id) DO UPDATE SET views = views + excluded.views
+                    RETURNING views
+                """,
+                    (views, book_id),
+                ).fetchone()
+                if row is not None:
+                    totals[book_id] = row[0]
+            conn.commit()
+        finally:
+            conn.close()
+        return totals
+
+    def top_viewed(self, limit):
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT book_id, views FROM book_stats "
+                "ORDER BY views DESC, book_id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(row[0], row[1]) for row in rows]
+
+    def list_authors(self, prefix, skip, limit):
+        where, params = "1=1", []
+        if prefix:
+            # Диапазон по idx_authors_name_norm вместо LIKE
+            key = author_prefix_key(prefix)
+            where, params = "name_norm >= ? AND name_norm < ?", [key, key + MAX_CHAR]
+        conn = self.connect()
+        try:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM authors WHERE {where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT name, book_count FROM authors WHERE {where} "
+                "ORDER BY name_norm, name LIMIT ? OFFSET ?",
+                params + [limit, skip],
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows], total
+
+    def data_version(self):
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'book_changes'"
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def changes_since(self, since, limit):
+        book_columns = ", ".join(f"{COLUMN_SQL[c]} AS book_{c}" for c in LIST_COLUMNS)
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT c.version, c.book_id, c.op, c.changed_at, {book_columns}
+                FROM book_changes c
+                LEFT JOIN books ON books.id = c.book_id
+                LEFT JOIN authors ON authors.id = books.author_id
+                WHERE c.version > ?
+                ORDER BY c.version
+                LIMIT ?
+            """,
+                (since, limit),
+            ).fetchall()
+            latest, oldest = conn.execute(
+                """
+                SELECT
+                    COALESCE(
+                        (SELECT seq FROM sqlite_sequence WHERE name = 'book_changes'),
+                        0
+                    ),
+                    (SELECT MIN(version) FROM book_changes)
+                """
+            ).fetchone()
+        finally:
+            conn.close()
+
+        changes = []
+        for row in rows:
+            book = None
+            if row["op"] != "delete" and row["book_id"] is not None:
+                book = row_to_dict({c: row[f"book_{c}"] for c in LIST_COLUMNS})
+                if book["id"] is None:
+                    book = None
+            changes.append(
+                {
+                    "version": row["version"],
+                    "book_id": row["book_id"],
+                    "op": row["op"],
+                    "changed_at": row["changed_at"],
+                    "book": book,
+                }
+            )
+        return {
+            "changes": changes,
+            "latest_version": latest,
+            "oldest_version": oldest if oldest is not None else latest + 1,
+        }
+
+    def compact_changes(self, max_entries, max_age_seconds=None):
+        conn = self.connect()
+        try:
+            deleted = conn.execute(
+                """
+                DELETE FROM book_changes
+                WHERE version <= (SELECT MAX(version) FROM book_changes) - ?
+            """,
+                (max_entries,),
+            ).rowcount
+            if max_age_seconds is not None:
+                deleted += conn.execute(
+                    "DELETE FROM book_changes WHERE changed_at < datetime('now', ?)",
+                    (f"-{int(max_age_seconds)} seconds",),
+                ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+
+    def connection_factories(self):
+        return [self.factory]
+
+    def vacuum(self):
+        conn = self.connect()
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    def rebuild_indexes(self):
+        conn = self.connect()
+        try:
+            conn.execute("REINDEX books")
+            conn.execute("REINDEX authors")
+            conn.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        self.factory.close()
+
+
+class InMemoryBookRepository(BookRepository):
+    """Хранилище на чистом Python - самое быстрое, для тестов и бенчмарков"""
+
+    def __init__(self):
+        self._books = {}
+        self._isbn_index = {}
+        self._next_id = 1
+        self._changes = []
+        self._change_version = 0
+        self._views = {}
+        self._author_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def init_schema(self):
+        return False
+
+    def _log_change(self, book_id: int, op: str):
+        """Запись в журнал изменений (аналог триггеров SQLite)"""
+        self._change_version += 1
+        self._changes.append(
+            {
+                "version": self._change_version,
+                "book_id": book_id,
+                "op": op,
+                "changed_at": _utc_timestamp(),
+            }
+        )
+
+    def count(self):
+        return len(self._books)
+
+    def scan(self, columns=None, batch_size=10000):
+        select_list(columns)
+        with self._lock:
+            books = list(self._books.values())
+        for book in books:
+            yield dict(project(book, columns))
+
+    def _count_author(self, name: str, delta: int):
+        count = self._author_counts.get(name, 0) + delta
+        if count:
+            self._author_counts[name] = count
+        else:
+            self._author_counts.pop(name, None)
+
+    @staticmethod
+    def _matches(book: dict, filters: BookFilter) -> bool:
+        # LIKE в SQLite регистронезависим - повторяем это поведение
+        def contains(value, needle):
+            return needle.casefold() in (value or "").casefold()
+
+        def author_contains(value, needle):
+            return normalize_name(needle) in normalize_name(value)
+
+        if filters.author and not author_contains(book["author"], filters.author):
+            return False
+        if filters.title and not contains(book["title"], filters.title):
+            return False
+        if filters.search and not (
+            contains(book["title"], filters.search)
+            or author_contains(book["author"], filters.search)
+        ):
+            return False
+        if filters.year and book["year"] != filters.year:
+            return False
+        if filters.year_from and book["year"] < filters.year_from:
+            return False
+        if filters.year_to and book["year"] > filters.year_to:
+            return False
+        if filters.updated_since and book["updated_at"] < sql_timestamp(
+            filters.updated_since
+        ):
+            return False
+        if filters.available_only and not book["is_available"]:
+            return False
+        return True
+
+    def list_books(
+        self, filters, skip, limit, columns=None, sort="created_at", descending=True
+    ):
+        select_list(columns)
+        with self._lock:
+            matched = [b for b in self._books.values() if self._matches(b, filters)]
+        matched.sort(key=sort_key(sort), reverse=descending)
+        page = matched[skip : skip + limit]
+        return [dict(project(b, columns)) for b in page], len(matched)
+
+    def get_book(self, book_id, columns=None):
+        select_list(columns)
+        book = self._books.get(book_id)
+        return dict(project(book, columns)) if book else None
+
+    def _check_isbn(self, isbn, book_id=None):
+        if isbn is not None and self._isbn_index.get(isbn, book_id) != book_id:
+            # Тот же тип ошибки, что и у SQLite - эндпоинты обрабатывают его
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: books.isbn")
+
+    def create_book(self, data):
+        with self._lock:
+            isbn = data.get("isbn")
+            self._check_isbn(isbn)
+            now = _utc_timestamp()
+            book = {
+                "id": self._next_id,
+                "title": data["title"],
+                "author": data["author"],
+                "isbn": isbn,
+                "year": data["year"],
+                "description": data.get("description"),
+                "is_available": bool(data.get("is_available", True)),
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._books[book["id"]] = book
+            if isbn is not None:
+                self._isbn_index[isbn] = book["id"]
+            self._next_id += 1
+            self._count_author(book["author"], 1)
+            self._log_change(book["id"], "insert")
+            return dict(book)
+
+    def update_book(self, book_id, fields):
+        with self._lock:
+            return self._update_locked(book_id, fields)
+
+    def _update_locked(self, book_id, fields):
+        book = self._books.get(book_id)
+        if book is None:
+            return None
+        changes = {k: fields[k] for k in UPDATABLE_FIELDS if k in fields}
+        if "isbn" in changes:
+            self._check_isbn(changes["isbn"], book_id)
+            self._isbn_index.pop(book["isbn"], None)
+            if changes["isbn"] is not None:
+                self._isbn_index[changes["isbn"]] = book_id
+        if "is_available" in changes:
+            changes["is_available"] = bool(changes["is_available"])
+        if "author" in changes:
+            self._count_author(book["author"], -1)
+            self._count_author(changes["author"], 1)
+        book.update(changes)
+        book["updated_at"] = _utc_timestamp()
+        self._log_change(book_id, "update")
+        return dict(book)
+
+    def delete_book(self, book_id):
+        with self._lock:
+            return self._delete_locked(book_id)
+
+    def _delete_locked(self, book_id):
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return None
+        if book["isbn"] is not None:
+            self._isbn_index.pop(book["isbn"], None)
+        self._views.pop(book_id, None)
+        self._count_author(book["author"], -1)
+        self._log_change(book_id, "delete")
+        return dict(book)
+
+    def _select_locked(self, book_ids, filters) -> List[int]:
+        if book_ids is not None:
+            return [i for i in dict.fromkeys(book_ids) if i in self._books]
+        return [i for i, b in self._books.items() if self._matches(b, filters)]
+
+    def update_books(self, book_ids, filters, fields, dry_run=False):
+        with self._lock:
+            matched = self._select_locked(book_ids, filters)
+            if not dry_run:
+                for book_id in matched:
+                    self._update_locked(book_id, fields)
+        return matched
+
+    def delete_books(self, book_ids, filters, dry_run=False):
+        with self._lock:
+            matched = self._select_locked(book_ids, filters)
+            if not dry_run:
+                for book_id in matched:
+                    self._delete_locked(book_id)
+        return matched
+
+    def set_availability(self, book_ids, available, atomic=False):
+        book_ids = list(dict.fromkeys(book_ids))
+        with self._lock:
+            existing = [i for i in book_ids if i in self._books]
+            updated = [
+                i for i in existing if self._books[i]["is_available"] != available
+            ]
+            if atomic and len(updated) != len(book_ids):
+                result = availability_result(book_ids, updated, existing)
+                result["updated"] = []
+                return result
+            for book_id in updated:
+                self._books[book_id]["is_available"] = available
+                self._log_change(book_id, "update")
+        return availability_result(book_ids, updated, existing)
+
+    def get_books_by_isbns(self, isbns):
+        with self._lock:
+            return {
+                isbn: dict(self._books[self._isbn_index[isbn]])
+                for isbn in isbns
+                if isbn in self._isbn_index
+            }
+
+    def get_books_by_ids(self, book_ids, columns=None):
+        with self._lock:
+            return {
+                book_id: dict(project(self._books[book_id], columns))
+                for book_id in book_ids
+                if book_id in self._books
+            }
+
+    def add_views(self, counts):
+        with self._lock:
+            totals = {}
+            for book_id, views in counts.items():
+                if book_id in self._books:
+                    totals[book_id] = self._views.get(book_id, 0) + views
+            self._views.update(totals)
+            return totals
+
+    def top_viewed(self, limit):
+        with self._lock:
+            return heapq.nsmallest(
+                limit, self._views.items(), key=lambda item: (-item[1], item[0])
+            )
+
+    def list_authors(self, prefix, skip, limit):
+        key = author_prefix_key(prefix) if prefix else ""
+        with self._lock:
+            authors = [
+                (normalize_name(name), name, count)
+                for name, count in self._author_counts.items()
+            ]
+        authors = sorted(a for a in authors if a[0].startswith(key))
+        page = [
+            {"name": name, "book_count": count}
+            for _, name, count in authors[skip : skip + limit]
+        ]
+        return page, len(authors)
+
+    def data_version(self):
+        with self._lock:
+            return self._change_version
+
+    def changes_since(self, since, limit):
+        with self._lock:
+            start = bisect.bisect_right(
+                self._changes, since, key=lambda c: c["version"]
+            )
+            changes = []
+            for change in self._changes[start : start + limit]:
+                book = self._books.get(change["book_id"])
+                if change["op"] == "delete" or book is None:
+                    book = None
+                else:
+                    book = project(book, LIST_COLUMNS)
+                changes.append(dict(change, book=book))
+            oldest = (
+                self._changes[0]["version"]
+                if self._changes
+                else self._change_version + 1
+            )
+            return {
+                "changes": changes,
+                "latest_version": self._change_version,
+                "oldest_version": oldest,
+            }
+
+    def compact_changes(self, max_entries, max_age_seconds=None):
+        with self._lock:
+            before = len(self._changes)
+            keep = self._changes[-max_entries:] if max_entries > 0 else []
+            if max_age_seconds is not None:
+                cutoff = (
+                    datetime.utcnow() - timedelta(seconds=max_age_seconds)
+                ).strftime("%Y-%m-%d %H:%M:%S")
+                keep = [c for c in keep if c["changed_at"] >= cutoff]
+            self._changes = keep
+            return before - len(keep)
+
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMA для каждого соединения по настройкам"""
+    pragmas = []
+    if settings.SQLITE_JOURNAL_MODE.upper() == "WAL":
+        pragmas.append("PRAGMA synchronous = NORMAL")
+        if settings.MAINTENANCE_ENABLED:
+            # Чекпойнты делает планировщик, а не случайный поток запроса
+            pragmas.append("PRAGMA wal_autocheckpoint = 0")
+    return pragmas
+
+
+def create_repository(database_url: str, shards: int = 1) -> BookRepository:
+    """Создание хранилища по DATABASE_URL
+
+    shards > 1 включает шардирование файловой базы SQLite на N файлов.
+    """
+    backend, path = parse_database_url(database_url)
+    if backend == BACKEND_MEMORY:
+        return InMemoryBookRepository()
+    if backend == BACKEND_SQLITE_FILE and shards > 1:
+        from app.crud.sharding import ShardedBookRepository
+
+        return ShardedBookRepository.from_path(path, shards)
+    if backend == BACKEND_SQLITE_FILE:
+        return SQLiteBookRepository(
+            ConnectionFactory(path, sqlite_pragmas()),
+            journal_mode=settings.SQLITE_JOURNAL_MODE,
+        )
+    return SQLiteBookRepository(ConnectionFactory(path))
+
+
+_repository: Optional[BookRepository] = None
+
+
+def get_book_repository() -> BookRepository:
+    """Хранилище книг приложения (создается по settings.DATABASE_URL)"""
+    global _repository
+    if _repository is None:
+        _repository = create_repository(settings.DATABASE_URL, settings.DATABASE_SHARDS)
+    return _repository
+
+
+def set_book_repository(repository: Optional[BookRepository]):
+    """Подмена хранилища (тесты, бенчмарки). None - сброс к настройкам"""
+    global _repository
+    previous = _repository
+    _repository = repository
+    return previous
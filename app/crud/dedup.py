@@ -0,0 +1,369 @@
+# app/crud/dedup.py
+import os
+import re
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.text import normalize
+from app.crud.books import BookRepository, read_changes
+
+try:  # NumPy - опциональная зависимость
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+DEDUP_COLUMNS = ["id", "title", "author"]
+
+# 3-грамм за одну векторную операцию: временный массив (3-граммы x num_perm)
+# uint64 при 64 хешах - около 16 МБ независимо от размера пачки
+GRAMS_PER_CHUNK = 32768
+
+# Книги одной корзины полосы сравниваются попарно; в больших корзинах
+# (частые коллизии) - каждая с MAX_BUCKET_SPAN следующими
+MAX_BUCKET_SPAN = 64
+
+
+def dedup_text(title: str, author: str) -> str:
+    """Название и автор без регистра, диакритики и пунктуации"""
+    text = NON_WORD_RE.sub(" ", normalize(f"{title} {author}")).strip()
+    # Пробелы по краям; у пустого текста все равно есть одна 3-грамма
+    return f" {text} " if text else "   "
+
+
+class MinHasher:
+    """MinHash по символьным 3-граммам и ключи LSH-полос
+
+    num_perm хешей делятся на bands полос по rows = num_perm / bands.
+    Пара с похожестью s попадает хотя бы в одну общую полосу с
+    вероятностью 1 - (1 - s^rows)^bands: при 64 = 16 x 4 это ~0.99 для
+    s = 0.7 и ~0.12 для s = 0.3.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if np is None:
+            raise RuntimeError("Для поиска дубликатов нужен пакет numpy")
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # multiply-shift хеширование: (a * x + b) >> 32, a нечетное
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2**63, self.rows, dtype=np.uint64)
+        self._band_mix |= np.uint64(1)
+
+    def signatures(self, texts: Sequence[str]):
+        """Сигнатуры (len(texts), num_perm) uint32
+
+        Тексты хешируются кусками не больше GRAMS_PER_CHUNK 3-грамм в
+        заранее выделенный массив результата.
+        """
+        texts = list(texts)
+        result = np.empty((len(texts), self.num_perm), np.uint32)
+        start = grams = 0
+        for end, text in enumerate(texts, 1):
+            grams += len(text) - 2
+            if grams >= GRAMS_PER_CHUNK or end == len(texts):
+                result[start:end] = self._signatures_chunk(texts[start:end])
+                start, grams = end, 0
+        return result
+
+    def _signatures_chunk(self, texts: List[str]):
+        lengths = np.fromiter((len(t) for t in texts), np.int64, len(texts))
+        codes = np.frombuffer("".join(texts).encode("utf-32-le"), np.uint32)
+        codes = codes.astype(np.uint64)
+        # 3-грамма - три кодовые точки (< 2^21) в одном 63-битном числе
+        grams = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21))
+        grams |= codes[2:]
+        # Выбрасываем 3-граммы на стыке соседних текстов
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        counts = lengths - 2
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        grams = grams[np.arange(counts.sum()) + offsets]
+
+        # Один временный массив: сложение и сдвиг на месте
+        with np.errstate(over="ignore"):
+            hashed = grams[:, None] * self._a
+            hashed += self._b
+        hashed >>= np.uint64(32)
+        first = np.cumsum(counts) - counts
+        return np.minimum.reduceat(hashed, first, axis=0)
+
+    def band_keys(self, signatures):
+        """Ключи полос (n, bands) uint64; номер полосы входит в ключ"""
+        sig = signatures.astype(np.uint64).reshape(-1, self.bands, self.rows)
+        with np.errstate(over="ignore"):
+            keys = (sig * self._band_mix).sum(axis=2, dtype=np.uint64)
+            keys = keys * np.uint64(0x9E3779B97F4A7C15) + np.arange(
+                self.bands, dtype=np.uint64
+            )
+        return keys
+
+
+def similarity(first, second) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    return float(np.mean(first == second))
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def find_duplicates(
+    repository: BookRepository,
+    hasher: MinHasher,
+    threshold: float = 0.7,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> List[dict]:
+    """Группы почти одинаковых книг по всему каталогу
+
+    Сигнатуры и ключи полос считаются пачками один раз и пишутся в
+    memmap-файлы, затем для каждой полосы ключи сортируются, и все пары
+    книг с одинаковым ключом (корзина) становятся кандидатами - не только
+    соседние, иначе чужая коллизия между двумя дубликатами разрывала бы
+    пару. Кандидаты проверяются по сигнатурам и склеиваются в группы.
+    Время - O(n log n), память - O(n) на полосу.
+    """
+    expected = max(repository.count(), 1)
+    with tempfile.TemporaryDirectory() as workdir:
+
+        def open_array(name, shape, dtype):
+            return np.lib.format.open_memmap(
+                os.path.join(workdir, name), mode="w+", dtype=dtype, shape=shape
+            )
+
+        capacity = expected + batch_size
+        sigs = open_array("signatures.npy", (capacity, hasher.num_perm), np.uint32)
+        # Строка на полосу: ключи одной полосы лежат подряд
+        keys = open_array("band_keys.npy", (hasher.bands, capacity), np.uint64)
+        ids = np.zeros(capacity, np.int64)
+        n = 0
+        batch_ids, batch_texts = [], []
+
+        def flush_batch():
+            nonlocal sigs, keys, ids, n
+            if not batch_ids:
+                return
+            if n + len(batch_ids) > len(ids):
+                # Каталог вырос во время сканирования
+                grown = len(ids) * 2
+                new_sigs = open_array(
+                    f"signatures-{grown}.npy", (grown, hasher.num_perm), np.uint32
+                )
+                new_sigs[:n] = sigs[:n]
+                new_keys = open_array(
+                    f"band_keys-{grown}.npy", (hasher.bands, grown), np.uint64
+                )
+                new_keys[:, :n] = keys[:, :n]
+                sigs, keys = new_sigs, new_keys
+                ids = np.concatenate([ids, np.zeros(grown - len(ids), np.int64)])
+            batch_sigs = hasher.signatures(batch_texts)
+            sigs[n : n + len(batch_ids)] = batch_sigs
+            keys[:, n : n + len(batch_ids)] = hasher.band_keys(batch_sigs).T
+            ids[n : n + len(batch_ids)] = batch_ids
+            n += len(batch_ids)
+            batch_ids.clear()
+            batch_texts.clear()
+            if progress is not None:
+                progress(0.6 * min(n / expected, 1.0), f"Сигнатуры: {n}")
+
+        for book in repository.scan(DEDUP_COLUMNS, batch_size):
+            batch_ids.append(book["id"])
+            batch_texts.append(dedup_text(book["title"], book["author"]))
+            if len(batch_ids) >= batch_size:
+                flush_batch()
+        flush_batch()
+
+        sigs = sigs[:n]
+        ids = ids[:n]
+        union = _UnionFind()
+        edges: Dict[tuple, float] = {}
+        for band in range(hasher.bands):
+            band_keys = np.asarray(keys[band, :n])
+            order = np.argsort(band_keys, kind="stable")
+            sorted_keys = band_keys[order]
+            # Пары на расстоянии step в отсортированном порядке; корзины
+            # непрерывны, так что без совпадений на step их нет и дальше
+            for step in range(1, MAX_BUCKET_SPAN + 1):
+                same = np.flatnonzero(sorted_keys[step:] == sorted_keys[:-step])
+                if not len(same):
+                    break
+                for start in range(0, len(same), batch_size):
+                    chunk = same[start : start + batch_size]
+                    left = order[chunk]
+                    right = order[chunk + step]
+                    scores = (sigs[left] == sigs[right]).mean(axis=1)
+                    for a, b, score in zip(left.tolist(), right.tolist(), scores):
+                        if score >= threshold:
+                            edges[(min(a, b), max(a, b))] = float(score)
+                            union.union(a, b)
+            if progress is not None:
+                progress(0.6 + 0.4 * (band + 1) / hasher.bands, f"Полоса {band + 1}")
+
+        groups: Dict[int, List[int]] = {}
+        for position in list(union.parent):
+            groups.setdefault(union.find(position), []).append(position)
+        # Похожесть группы - самая слабая из проверенных связей
+        weakest: Dict[int, float] = {}
+        for (a, _), score in edges.items():
+            root = union.find(a)
+            weakest[root] = min(weakest.get(root, 1.0), score)
+        result = [
+            {
+                "ids": sorted(int(ids[m]) for m in members),
+                "similarity": round(weakest[root], 3),
+            }
+            for root, members in groups.items()
+        ]
+        del sigs, keys
+    result.sort(key=lambda group: (-len(group["ids"]), group["ids"][0]))
+    return result
+
+
+class DuplicateIndex:
+    """LSH-индекс в памяти для проверки дубликатов при создании книги
+
+    Хранит сигнатуру каждой книги и ее ключи полос. Кандидаты - книги
+    хотя бы с одной общей полосой; они проверяются по сигнатуре.
+    """
+
+    def __init__(self, hasher: Optional[MinHasher] = None, threshold: float = 0.7):
+        self.hasher = hasher or MinHasher()
+        self.threshold = threshold
+        self.version = 0
+        self._signatures: Dict[int, bytes] = {}
+        self._buckets: Dict[int, object] = {}  # ключ -> ID или set(ID)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def build(self, repository: BookRepository, batch_size: int = 2000):
+        with self._lock:
+            self._signatures = {}
+            self._buckets = {}
+            try:
+                self.version = repository.changes_since(0, 1)["latest_version"]
+            except NotImplementedError:
+                self.version = 0
+            batch = []
+            for book in repository.scan(DEDUP_COLUMNS, batch_size):
+                batch.append(book)
+                if len(batch) >= batch_size:
+                    self._add_batch(batch)
+                    batch = []
+            self._add_batch(batch)
+
+    def _add_batch(self, books: List[dict]):
+        if not books:
+            return
+        sigs = self.hasher.signatures(
+            [dedup_text(b["title"], b["author"]) for b in books]
+        )
+        keys = self.hasher.band_keys(sigs).tolist()
+        for book, sig, book_keys in zip(books, sigs, keys):
+            self._remove(book["id"])
+            self._signatures[book["id"]] = sig.tobytes()
+            for key in book_keys:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    self._buckets[key] = book["id"]
+                elif isinstance(bucket, set):
+                    bucket.add(book["id"])
+                else:
+                    self._buckets[key] = {bucket, book["id"]}
+
+    def _remove(self, book_id: int):
+        signature = self._signatures.pop(book_id, None)
+        if signature is None:
+            return
+        sig = np.frombuffer(signature, np.uint32)[None, :]
+        for key in self.hasher.band_keys(sig)[0].tolist():
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, set):
+                bucket.discard(book_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket.pop()
+            elif bucket == book_id:
+                del self._buckets[key]
+
+    def add(self, book: dict):
+        with self._lock:
+            self._add_batch([book])
+
+    def remove(self, book_id: int):
+        with self._lock:
+            self._remove(book_id)
+
+    def sync(self, repository: BookRepository):
+        """Изменения других процессов из журнала изменений"""
+        with self._lock:
+            try:
+                changes, version, truncated = read_changes(repository, self.version)
+            except NotImplementedError:
+                return
+            if truncated:
+                self.build(repository)
+                return
+            for change in changes:
+                if change["book"] is None:
+                    self._remove(change["book_id"])
+            self._add_batch([c["book"] for c in changes if c["book"] is not None])
+            self.version = version
+
+    def check(
+        self, title: str, author: str, exclude_id: Optional[int] = None, limit: int = 5
+    ) -> List[dict]:
+        """Похожие книги: [{"id", "similarity"}] по убыванию похожести"""
+        sig = self.hasher.signatures([dedup_text(title, author)])
+        keys = self.hasher.band_keys(sig)[0].tolist()
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if isinstance(bucket, set):
+                    candidates.update(bucket)
+                elif bucket is not None:
+                    candidates.add(bucket)
+            candidates.discard(exclude_id)
+            found = []
+            for book_id in candidates:
+                other = np.frombuffer(self._signatures[book_id], np.uint32)
+                score = similarity(sig[0], other)
+                if score >= self.threshold:
+                    found.append({"id": book_id, "similarity": round(score, 3)})
+        found.sort(key=lambda item: (-item["similarity"], item["id"]))
+        return found[:limit]
+
+
+_index: Optional[DuplicateIndex] = None
+
+
+def get_duplicate_index() -> Optional[DuplicateIndex]:
+    """Общий индекс дубликатов приложения (None без numpy)"""
+    global _index
+    if _index is None and np is not None:
+        _index = DuplicateIndex(threshold=settings.DEDUP_THRESHOLD)
+    return _index
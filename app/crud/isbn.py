@@ -0,0 +1,180 @@
+# app/crud/isbn.py
+import hashlib
+import math
+import re
+import threading
+from typing import Iterable, List, Optional
+
+from app.crud.books import BookRepository, read_changes
+
+ISBN_CLEAN_RE = re.compile(r"[\s-]")
+
+
+def clean_isbn(isbn: str) -> str:
+    """ISBN без пробелов и дефисов, X в верхнем регистре"""
+    return ISBN_CLEAN_RE.sub("", isbn).upper()
+
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    body = "978" + isbn10[:9]
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def isbn13_to_isbn10(isbn13: str) -> Optional[str]:
+    if not isbn13.startswith("978"):
+        return None
+    body = isbn13[3:12]
+    total = sum(int(d) * (10 - i) for i, d in enumerate(body))
+    check = (11 - total % 11) % 11
+    return body + ("X" if check == 10 else str(check))
+
+
+def isbn_variants(isbn: str) -> List[str]:
+    """Все формы записи ISBN: как передан, ISBN-13 и ISBN-10"""
+    cleaned = clean_isbn(isbn)
+    variants = [cleaned]
+    if len(cleaned) == 10 and cleaned[:9].isdigit():
+        variants.append(isbn10_to_isbn13(cleaned))
+    elif len(cleaned) == 13 and cleaned.isdigit():
+        isbn10 = isbn13_to_isbn10(cleaned)
+        if isbn10 is not None:
+            variants.append(isbn10)
+    return variants
+
+
+def canonical_isbn(isbn: str) -> str:
+    """Каноническая форма (ISBN-13, если ISBN-10 переводится)"""
+    variants = isbn_variants(isbn)
+    return next((v for v in variants if len(v) == 13), variants[0])
+
+
+class BloomFilter:
+    """Фильтр Блума: "точно нет" без ложных отрицаний"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1000)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Двойное хеширование: h1 + i * h2 из одного 128-битного дайджеста
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item)
+        )
+
+
+class IsbnFilter:
+    """Фильтр Блума по ISBN каталога с догонянием по журналу изменений
+
+    Удаленные ISBN остаются в фильтре - это лишь лишняя проверка в БД.
+    При переполнении фильтр перестраивается с удвоенной емкостью. Пустой
+    фильтр ответил бы "точно нет" на любой ISBN, поэтому find() до первого
+    построения (прогрев в фоне) строит его сам.
+    """
+
+    def __init__(self, error_rate: float = 0.01):
+        self.error_rate = error_rate
+        self.version = 0
+        self.built = False
+        self._bloom = BloomFilter(0, error_rate)
+        self._lock = threading.Lock()
+
+    def build(self, repository: BookRepository):
+        """Полное построение по хранилищу"""
+        with self._lock:
+            self._build(repository)
+
+    def ensure_built(self, repository: BookRepository):
+        """Построение, если фильтр еще не строился"""
+        if self.built:
+            return
+        with self._lock:
+            if not self.built:
+                self._build(repository)
+
+    def _build(self, repository: BookRepository):
+        try:
+            self.version = repository.changes_since(0, 1)["latest_version"]
+        except NotImplementedError:
+            self.version = 0
+        isbns = [book["isbn"] for book in repository.scan(["isbn"]) if book["isbn"]]
+        self._bloom = BloomFilter(len(isbns) * 2, self.error_rate)
+        for isbn in isbns:
+            self._bloom.add(canonical_isbn(isbn))
+        self.built = True
+
+    def add(self, isbn: str):
+        with self._lock:
+            self._bloom.add(canonical_isbn(isbn))
+
+    def sync(self, repository: BookRepository):
+        """Добавление ISBN, записанных мимо этого процесса"""
+        with self._lock:
+            try:
+                changes, version, truncated = read_changes(repository, self.version)
+            except NotImplementedError:
+                return
+            if truncated or self._bloom.count + len(changes) > self._bloom.capacity:
+                self._build(repository)
+                return
+            for change in changes:
+                book = change["book"]
+                if book is not None and book["isbn"]:
+                    self._bloom.add(canonical_isbn(book["isbn"]))
+            self.version = version
+
+    def might_exist(self, isbn: str) -> bool:
+        """False - такого ISBN в каталоге точно нет (в любой форме записи)"""
+        return canonical_isbn(isbn) in self._bloom
+
+    def find(
+        self, repository: BookRepository, isbns: Iterable[str], sync: bool = True
+    ) -> dict:
+        """{исходный ISBN: книга или None}; "точно новые" не идут в БД
+
+        sync=False - без догоняния по журналу (одиночные проверки, где
+        запись другого процесса все равно поймает UNIQUE).
+        """
+        self.ensure_built(repository)
+        if sync:
+            self.sync(repository)
+        isbns = list(isbns)
+        probe = {}
+        for isbn in isbns:
+            if self.might_exist(isbn):
+                for variant in isbn_variants(isbn):
+                    probe.setdefault(variant, []).append(isbn)
+
+        found = repository.get_books_by_isbns(list(probe)) if probe else {}
+        result = {isbn: None for isbn in isbns}
+        for variant, book in found.items():
+            for isbn in probe[variant]:
+                result[isbn] = book
+        return result
+
+
+_filter: Optional[IsbnFilter] = None
+
+
+def get_isbn_filter() -> IsbnFilter:
+    """Общий фильтр ISBN приложения"""
+    global _filter
+    if _filter is None:
+        _filter = IsbnFilter()
+    return _filter
@@ -0,0 +1,188 @@
+# app/crud/popularity.py
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.crud.books import BookRepository
+
+
+class ViewCounter:
+    """Счетчики просмотров в памяти, разбитые на полосы
+
+    Каждый поток пишет в свою полосу (по идентификатору потока), так что
+    параллельные запросы почти не ждут друг друга на блокировке.
+    """
+
+    def __init__(self, stripes: int = 16):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._counts = [{} for _ in range(stripes)]
+
+    def hit(self, book_id: int, views: int = 1):
+        i = threading.get_ident() % len(self._locks)
+        with self._locks[i]:
+            counts = self._counts[i]
+            counts[book_id] = counts.get(book_id, 0) + views
+
+    def drain(self) -> Dict[int, int]:
+        """Забрать накопленное и обнулить счетчики"""
+        total = {}
+        for i, lock in enumerate(self._locks):
+            with lock:
+                counts, self._counts[i] = self._counts[i], {}
+            for book_id, views in counts.items():
+                total[book_id] = total.get(book_id, 0) + views
+        return total
+
+    def pending(self) -> int:
+        return sum(sum(counts.values()) for counts in self._counts)
+
+
+class TopK:
+    """K книг с наибольшим числом просмотров
+
+    Мин-куча с ленивым удалением: устаревшие записи остаются в куче и
+    пропускаются, пока куча не вырастет вдвое больше k.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._scores: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int]] = []
+
+    def __contains__(self, book_id: int) -> bool:
+        return book_id in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _pop_min(self):
+        while self._heap:
+            views, book_id = heapq.heappop(self._heap)
+            if self._scores.get(book_id) == views:
+                del self._scores[book_id]
+                return
+
+    def _min_views(self) -> int:
+        while self._heap:
+            views, book_id = self._heap[0]
+            if self._scores.get(book_id) == views:
+                return views
+            heapq.heappop(self._heap)
+        return 0
+
+    def update(self, book_id: int, views: int):
+        """Новый итог просмотров книги"""
+        if book_id not in self._scores:
+            if len(self._scores) >= self.k and views <= self._min_views():
+                return
+        self._scores[book_id] = views
+        heapq.heappush(self._heap, (views, book_id))
+        if len(self._scores) > self.k:
+            self._pop_min()
+        if len(self._heap) > 2 * self.k:
+            self._heap = [(v, i) for i, v in self._scores.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, book_id: int):
+        self._scores.pop(book_id, None)
+
+    def items(self, limit: int) -> List[Tuple[int, int]]:
+        """[(id, просмотры)] по убыванию просмотров"""
+        return heapq.nsmallest(
+            limit, self._scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+class PopularityTracker:
+    """Write-behind учет просмотров и рейтинг популярных книг
+
+    get_book только увеличивает счетчик в памяти; накопленное раз в
+    flush_interval пишется в book_stats одной транзакцией, а новые итоги
+    обновляют top-K. При падении теряются просмотры не больше чем за один
+    интервал сброса.
+
+    Вытесненные из top-K книги в памяти не хранятся, поэтому после
+    удаления книги рейтинг добирается из book_stats при следующем
+    сбросе или запросе популярных.
+    """
+
+    def __init__(self, k: int = 100, stripes: int = 16):
+        self.counter = ViewCounter(stripes)
+        self.top = TopK(k)
+        self.flushed_views = 0
+        self._short = False  # в top меньше k книг после удаления
+        self._lock = threading.Lock()
+
+    def hit(self, book_id: int):
+        self.counter.hit(book_id)
+
+    def load(self, repository: BookRepository):
+        """Начальный top-K из book_stats"""
+        with self._lock:
+            self._reload(repository)
+
+    def _reload(self, repository: BookRepository):
+        self.top = TopK(self.top.k)
+        for book_id, views in repository.top_viewed(self.top.k):
+            self.top.update(book_id, views)
+        self._short = False
+
+    def _refill(self, repository: BookRepository):
+        if self._short:
+            self._reload(repository)
+
+    def flush(self, repository: BookRepository) -> dict:
+        """Запись накопленных просмотров пачкой"""
+        counts = self.counter.drain()
+        if not counts:
+            with self._lock:
+                self._refill(repository)
+            return {"books": 0, "views": 0}
+        try:
+            totals = repository.add_views(counts)
+        except Exception:
+            # Не теряем просмотры при ошибке записи - вернем их в счетчики
+            for book_id, views in counts.items():
+                self.counter.hit(book_id, views)
+            raise
+        with self._lock:
+            self._refill(repository)
+            for book_id, views in totals.items():
+                self.top.update(book_id, views)
+        views = sum(counts.values())
+        self.flushed_views += views
+        return {"books": len(counts), "views": views}
+
+    def reset(self, repository: BookRepository):
+        """База заменена целиком (restore): несброшенные просмотры относятся
+        к прежним данным и отбрасываются, рейтинг читается заново"""
+        self.counter.drain()
+        with self._lock:
+            self._reload(repository)
+
+    def forget(self, book_id: int):
+        """Книга удалена - убрать из рейтинга"""
+        with self._lock:
+            if book_id in self.top:
+                self.top.remove(book_id)
+                self._short = True
+
+    def popular(
+        self, limit: int, repository: Optional[BookRepository] = None
+    ) -> List[Tuple[int, int]]:
+        with self._lock:
+            if repository is not None:
+                self._refill(repository)
+            return self.top.items(limit)
+
+
+_tracker: Optional[PopularityTracker] = None
+
+
+def get_popularity_tracker() -> PopularityTracker:
+    """Общий учет популярности приложения"""
+    global _tracker
+    if _tracker is None:
+        _tracker = PopularityTracker(settings.POPULAR_TOP_K)
+    return _tracker
@@ -0,0 +1,270 @@
+# app/crud/sharding.py
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from app.core.config import settings
+from app.core.text import normalize_name
+from app.crud.books import (
+    BookRepository,
+    SQLiteBookRepository,
+    availability_result,
+    project,
+    sort_key,
+    sqlite_pragmas,
+)
+from app.db.session import ConnectionFactory
+
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    """Пути файлов-шардов: library.db -> library.shard0.db, library.shard1.db, ..."""
+    stem, ext = os.path.splitext(path)
+    return [f"{stem}.shard{k}{ext or '.db'}" for k in range(shards)]
+
+
+class ShardedBookRepository(BookRepository):
+    """Каталог, разбитый на N файлов SQLite
+
+    * ID выдаются с шагом N, поэтому шард книги - (id - 1) % N, и чтение,
+      обновление и удаление по ID идут напрямую в один шард;
+    * новые книги распределяются по хешу ISBN (без ISBN - по кругу), но
+      при обновлении ISBN остается в шарде книги, поэтому UNIQUE шарда не
+      ловит повтор в другом шарде: записи, задающие ISBN, проверяют все
+      шарды и пишут под одной блокировкой (один процесс на базу);
+    * список книг собирается со всех шардов (scatter-gather) и сливается
+      k-way merge по ключу сортировки.
+    """
+
+    def __init__(self, shards: List[SQLiteBookRepository]):
+        self.shards = shards
+        self._round_robin = itertools.count()
+        # Проверка ISBN во всех шардах и запись - без гонки между ними
+        self._isbn_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(shards), thread_name_prefix="shard"
+        )
+
+    @classmethod
+    def from_path(cls, path: str, shards: int) -> "ShardedBookRepository":
+        return cls(
+            [
+                SQLiteBookRepository(
+                    ConnectionFactory(shard_path, sqlite_pragmas()),
+                    k,
+                    shards,
+                    settings.SQLITE_JOURNAL_MODE,
+                )
+                for k, shard_path in enumerate(shard_paths(path, shards))
+            ]
+        )
+
+    def shard_for_id(self, book_id: int) -> SQLiteBookRepository:
+        return self.shards[(book_id - 1) % len(self.shards)]
+
+    def shard_for_isbn(self, isbn) -> SQLiteBookRepository:
+        if isbn is None:
+            return self.shards[next(self._round_robin) % len(self.shards)]
+        return self.shards[zlib.crc32(isbn.encode()) % len(self.shards)]
+
+    def _map(self, func):
+        """Выполнение func(shard) на всех шардах параллельно"""
+        return list(self._executor.map(func, self.shards))
+
+    def _check_isbn(self, isbn, book_id=None):
+        """Проверка уникальности ISBN в остальных шардах"""
+        if isbn is None:
+            return
+
+        def lookup(shard):
+            conn = shard.connect()
+            try:
+                return conn.execute(
+                    "SELECT id FROM books WHERE isbn = ?", (isbn,)
+                ).fetchone()
+            finally:
+                conn.close()
+
+        for row in self._map(lookup):
+            if row is not None and row["id"] != book_id:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: books.isbn")
+
+    def init_schema(self):
+        return any([shard.init_schema() for shard in self.shards])
+
+    def count(self):
+        return sum(self._map(lambda shard: shard.count()))
+
+    def scan(self, columns=None, batch_size=10000):
+        for shard in self.shards:
+            yield from shard.scan(columns, batch_size)
+
+    def list_books(
+        self, filters, skip, limit, columns=None, sort="created_at", descending=True
+    ):
+        # Для слияния нужны поле сортировки и id, даже если их не запросили
+        shard_columns = columns
+        if columns is not None:
+            shard_columns = list(columns) + [
+                c for c in (sort, "id") if c not in columns
+            ]
+
+        # Каждому шарду нужна вся голова выборки до skip + limit
+        results = self._map(
+            lambda shard: shard.list_books(
+                filters, 0, skip + limit, shard_columns, sort, descending
+            )
+        )
+        total = sum(shard_total for _, shard_total in results)
+        merged = heapq.merge(
+            *(books for books, _ in results),
+            key=sort_key(sort),
+            reverse=descending,
+        )
+        page = itertools.islice(merged, skip, skip + limit)
+        return [project(book, columns) for book in page], total
+
+    def get_book(self, book_id, columns=None):
+        return self.shard_for_id(book_id).get_book(book_id, columns)
+
+    def create_book(self, data):
+        isbn = data.get("isbn")
+        if isbn is None:
+            return self.shard_for_isbn(None).create_book(data)
+        with self._isbn_lock:
+            self._check_isbn(isbn)
+            return self.shard_for_isbn(isbn).create_book(data)
+
+    def update_book(self, book_id, fields):
+        if fields.get("isbn") is None:
+            return self.shard_for_id(book_id).update_book(book_id, fields)
+        with self._isbn_lock:
+            self._check_isbn(fields["isbn"], book_id)
+            return self.shard_for_id(book_id).update_book(book_id, fields)
+
+    def get_books_by_isbns(self, isbns):
+        found = {}
+        for shard_found in self._map(lambda shard: shard.get_books_by_isbns(isbns)):
+            found.update(shard_found)
+        return found
+
+    def _group_by_shard(self, book_ids):
+        groups = {}
+        for book_id in book_ids:
+            groups.setdefault(self.shard_for_id(book_id), []).append(book_id)
+        return groups
+
+    def get_books_by_ids(self, book_ids, columns=None):
+        found = {}
+        for shard, ids in self._group_by_shard(book_ids).items():
+            found.update(shard.get_books_by_ids(ids, columns))
+        return found
+
+    def add_views(self, counts):
+        totals = {}
+        for shard, ids in self._group_by_shard(counts).items():
+            totals.update(shard.add_views({i: counts[i] for i in ids}))
+        return totals
+
+    def top_viewed(self, limit):
+        return heapq.nsmallest(
+            limit,
+            itertools.chain.from_iterable(
+                self._map(lambda shard: shard.top_viewed(limit))
+            ),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+    def list_authors(self, prefix, skip, limit):
+        # У автора в каждом шарде своя строка справочника: собираем все
+        # подходящие имена (LIMIT -1 - без ограничения; авторов на порядки
+        # меньше, чем книг) и складываем счетчики
+        results = self._map(lambda shard: shard.list_authors(prefix, 0, -1)[0])
+        merged = heapq.merge(
+            *results, key=lambda a: (normalize_name(a["name"]), a["name"])
+        )
+        authors = [
+            {"name": name, "book_count": sum(a["book_count"] for a in group)}
+            for name, group in itertools.groupby(merged, key=lambda a: a["name"])
+        ]
+        return authors[skip : skip + limit], len(authors)
+
+    def delete_book(self, book_id):
+        return self.shard_for_id(book_id).delete_book(book_id)
+
+    def data_version(self):
+        # Сумма счетчиков шардов растет при любой записи в любой шард
+        return sum(shard.data_version() for shard in self.shards)
+
+    def _bulk(self, book_ids, call):
+        """Пакетная операция: по ID - в шарды этих ID, по фильтрам - во все
+
+        Каждый шард выполняет свою часть отдельной транзакцией.
+        """
+        if book_ids is None:
+            results = self._map(lambda shard: call(shard, None))
+        else:
+            groups = self._group_by_shard(dict.fromkeys(book_ids))
+            results = [call(shard, ids) for shard, ids in groups.items()]
+        return sorted(itertools.chain.from_iterable(results))
+
+    def update_books(self, book_ids, filters, fields, dry_run=False):
+        return self._bulk(
+            book_ids,
+            lambda shard, ids: shard.update_books(ids, filters, fields, dry_run),
+        )
+
+    def delete_books(self, book_ids, filters, dry_run=False):
+        return self._bulk(
+            book_ids, lambda shard, ids: shard.delete_books(ids, filters, dry_run)
+        )
+
+    def set_availability(self, book_ids, available, atomic=False):
+        book_ids = list(dict.fromkeys(book_ids))
+        groups = self._group_by_shard(book_ids)
+
+        updated, existing = [], []
+        for shard, ids in groups.items():
+            result = shard.set_availability(ids, available)
+            updated += result["updated"]
+            existing += result["updated"] + result["conflicts"]
+
+        if atomic and len(updated) != len(book_ids):
+            # Шарды - отдельные файлы, поэтому откатываем компенсацией
+            applied_ids = set(updated)
+            for shard, ids in groups.items():
+                applied = [i for i in ids if i in applied_ids]
+                if applied:
+                    shard.set_availability(applied, not available)
+            result = availability_result(book_ids, updated, existing)
+            result["updated"] = []
+            return result
+        return availability_result(book_ids, updated, existing)
+
+    def compact_changes(self, max_entries, max_age_seconds=None):
+        # Журнал у каждого шарда свой (по нему считается data_version);
+        # общий бюджет записей делится между шардами поровну
+        per_shard = -(-max_entries // len(self.shards))
+        return sum(
+            self._map(lambda shard: shard.compact_changes(per_shard, max_age_seconds))
+        )
+
+    def connection_factories(self):
+        return [shard.factory for shard in self.shards]
+
+    def vacuum(self):
+        for shard in self.shards:
+            shard.vacuum()
+
+    def rebuild_indexes(self):
+        for shard in self.shards:
+            shard.rebuild_indexes()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,512 @@
+# app/crud/similar.py
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.crud.books import BookRepository, read_changes
+from app.crud.suggest import tokenize
+
+try:  # NumPy/SciPy - опциональные зависимости
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover
+    np = None
+    sparse = None
+
+# Поля книги, по которым строится вектор
+TEXT_COLUMNS = ["id", "title", "author", "description"]
+
+# Массивы основной матрицы в каталоге поколения
+ARRAYS = ("data", "indices", "indptr", "book_ids", "idf")
+# Файл блокировки поколения: читатели держат LOCK_SH, удаление - LOCK_EX
+GENERATION_LOCK = "LOCK"
+
+
+def _generation_ns(name: str) -> Optional[int]:
+    """Метка времени поколения gen-<ns> (None - не каталог поколения)"""
+    prefix, _, stamp = name.partition("-")
+    return int(stamp) if prefix == "gen" and stamp.isdigit() else None
+
+
+def _lock_generation(directory: str, flags: int) -> Optional[int]:
+    """Дескриптор с блокировкой LOCK поколения; None - его нет или занято"""
+    try:
+        fd = os.open(os.path.join(directory, GENERATION_LOCK), os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, flags)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def text_features(book: dict) -> Counter:
+    """Токены книги; название и автор весят больше описания"""
+    counts = Counter()
+    for token in tokenize(book["title"]) + tokenize(book["author"]):
+        counts[token] += 2
+    for token in tokenize(book.get("description") or ""):
+        if len(token) > 2:
+            counts[token] += 1
+    return counts
+
+
+class SimilarIndex:
+    """Индекс TF-IDF по названию, автору и описанию для похожих книг
+
+    Слова хешируются в n_features признаков (без словаря). Основная
+    матрица хранится в CSC (столбец - признак) и отображается с диска
+    через mmap, поэтому старт не требует перестроения. Скоринг
+    затрагивает только столбцы признаков запроса. Изменения копятся в
+    небольшой дельте в памяти; слияние с основной матрицей, когда дельта
+    превышает merge_threshold, делает планировщик обслуживания
+    (merge_if_needed), а не запрос. IDF фиксируется при построении и
+    обновляется полным перестроением (задача rebuild_indexes).
+
+    Каталог могут делить несколько процессов: каждый держит блокировку
+    поколения, которое отобразил, а запись удаляет только более старые
+    поколения, которые никто не держит.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        n_features: int = 1 << 18,
+        merge_threshold: int = 5000,
+        sync_interval: float = 1.0,
+    ):
+        if np is None:
+            raise RuntimeError("Для похожих книг нужны пакеты numpy и scipy")
+        self.path = path
+        self.n_features = n_features
+        self.merge_threshold = merge_threshold
+        self.sync_interval = sync_interval
+        self.version = 0
+        self.opened = False
+        self._last_sync = 0.0
+        self._pin = None  # дескриптор блокировки отображенного поколения
+        self._lock = threading.RLock()
+        # Построение и слияние не идут одновременно; порядок: он, затем _lock
+        self._merge_lock = threading.Lock()
+        self._set_base(
+            np.zeros(0, np.float32),
+            np.zeros(0, np.int32),
+            np.zeros(n_features + 1, np.int64),
+            np.zeros(0, np.int64),
+            np.ones(n_features, np.float32),
+        )
+        self._delta = {}  # ID -> (признаки, веса) или None для удаленных
+
+    def __len__(self):
+        size = len(self._book_ids)
+        for book_id, row in self._delta.items():
+            in_base = self._position(book_id) is not None
+            if row is None and in_base:
+                size -= 1
+            elif row is not None and not in_base:
+                size += 1
+        return size
+
+    def _set_base(self, data, indices, indptr, book_ids, idf, pin=None):
+        self._data = data
+        self._indices = indices
+        self._indptr = indptr
+        self._book_ids = book_ids  # отсортированы по возрастанию
+        self._idf = idf
+        self._delta_matrix = None
+        # Прежнее поколение больше не отображено - его можно удалять
+        if self._pin is not None:
+            os.close(self._pin)
+        self._pin = pin
+
+    def _position(self, book_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self._book_ids, book_id))
+        if i < len(self._book_ids) and self._book_ids[i] == book_id:
+            return i
+        return None
+
+    def vectorize(self, book: dict):
+        """(признаки, веса) нормированного TF-IDF вектора книги"""
+        buckets = Counter()
+        for token, count in text_features(book).items():
+            buckets[zlib.crc32(token.encode()) % self.n_features] += count
+        if not buckets:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32)
+        features = np.fromiter(buckets.keys(), np.int32, len(buckets))
+        tf = np.fromiter(buckets.values(), np.float32, len(buckets))
+        weights = (1 + np.log(tf)) * self._idf[features]
+        norm = np.linalg.norm(weights)
+        order = np.argsort(features)
+        return features[order], (weights / norm if norm else weights)[order]
+
+    # Построение и хранение
+
+    def build(self, repository: BookRepository, batch_size: int = 10000):
+        """Полное построение по хранилищу (пачками) и сохранение на диск"""
+        with self._merge_lock, self._lock:
+            try:
+                version = repository.changes_since(0, 1)["latest_version"]
+            except NotImplementedError:
+                version = 0
+
+            rows, cols, counts, ids = [], [], [], []
+            df = np.zeros(self.n_features, np.int64)
+            batch_rows, batch_cols, batch_counts = [], [], []
+
+            def flush_batch():
+                if not batch_cols:
+                    return
+                r = np.array(batch_rows, np.int64)
+                c = np.array(batch_cols, np.int32)
+                rows.append(r)
+                cols.append(c)
+                counts.append(np.array(batch_counts, np.float32))
+                df[:] += np.bincount(c, minlength=self.n_features)
+                batch_rows.clear()
+                batch_cols.clear()
+                batch_counts.clear()
+
+            for book in repository.scan(TEXT_COLUMNS, batch_size):
+                buckets = Counter()
+                for token, count in text_features(book).items():
+                    buckets[zlib.crc32(token.encode()) % self.n_features] += count
+                row = len(ids)
+                ids.append(book["id"])
+                for feature, count in buckets.items():
+                    batch_rows.append(row)
+                    batch_cols.append(feature)
+                    batch_counts.append(count)
+                if len(batch_cols) >= batch_size * 50:
+                    flush_batch()
+            flush_batch()
+
+            n = len(ids)
+            idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+            if rows:
+                r = np.concatenate(rows)
+                c = np.concatenate(cols)
+                weights = (1 + np.log(np.concatenate(counts))) * idf[c]
+                norms = np.sqrt(np.bincount(r, weights=weights**2, minlength=n))
+                weights = (weights / norms[r]).astype(np.float32)
+            else:
+                r = np.zeros(0, np.int64)
+                c = np.zeros(0, np.int32)
+                weights = np.zeros(0, np.float32)
+
+            order = np.argsort(np.array(ids, np.int64), kind="stable")
+            rank = np.empty(n, np.int64)
+            rank[order] = np.arange(n)
+            matrix = sparse.csc_matrix(
+                (weights, (rank[r], c)), shape=(n, self.n_features), dtype=np.float32
+            )
+            matrix.sort_indices()
+            self._set_base(
+                matrix.data,
+                matrix.indices.astype(np.int32),
+                matrix.indptr.astype(np.int64),
+                np.array(ids, np.int64)[order],
+                idf,
+            )
+            self._delta = {}
+            self.version = version
+            self.opened = True
+            self._last_sync = time.monotonic()
+            self.save()
+
+    def save(self):
+        """Запись текущей основной матрицы новым поколением"""
+        with self._lock:
+            arrays = {name: getattr(self, f"_{name}") for name in ARRAYS}
+            version = self.version
+        self._write(arrays, version)
+
+    def _write(self, arrays: dict, version: int):
+        """Атомарная запись: каталог нового поколения, затем указатель"""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        generation = f"gen-{time.time_ns()}"
+        target = os.path.join(self.path, generation)
+        os.makedirs(target)
+        # Недописанное поколение держим сами, чтобы его не удалил другой процесс
+        pin = os.open(
+            os.path.join(target, GENERATION_LOCK), os.O_RDONLY | os.O_CREAT, 0o644
+        )
+        try:
+            fcntl.flock(pin, fcntl.LOCK_SH)
+            for name, values in arrays.items():
+                np.save(os.path.join(target, f"{name}.npy"), values)
+            meta = {"version": version, "n_features": self.n_features}
+            with open(os.path.join(target, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            pointer = os.path.join(self.path, "CURRENT")
+            with open(pointer + f".{generation}.tmp", "w") as f:
+                f.write(generation)
+            os.replace(pointer + f".{generation}.tmp", pointer)
+        finally:
+            os.close(pin)
+        self._remove_generations_before(generation)
+
+    def _remove_generations_before(self, generation: str):
+        """Удаление поколений старше generation, которые никто не держит"""
+        published = _generation_ns(generation)
+        for name in os.listdir(self.path):
+            stamp = _generation_ns(name)
+            if stamp is None or stamp >= published:
+                continue
+            directory = os.path.join(self.path, name)
+            fd = _lock_generation(directory, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if fd is None:
+                continue  # отображено другим процессом или еще пишется
+            try:
+                shutil.rmtree(directory, ignore_errors=True)
+            finally:
+                os.close(fd)
+
+    def load(self) -> bool:
+        """Отображение сохраненной матрицы с диска; False - нечего грузить"""
+        if not self.path:
+            return False
+        for _ in range(3):
+            try:
+                with open(os.path.join(self.path, "CURRENT")) as f:
+                    source = os.path.join(self.path, f.read().strip())
+            except OSError:
+                return False
+            pin = _lock_generation(source, fcntl.LOCK_SH)
+            if pin is None:
+                continue  # поколение удалили после чтения указателя
+            try:
+                with open(os.path.join(source, "meta.json")) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                os.close(pin)
+                continue
+            break
+        else:
+            return False
+        if meta["n_features"] != self.n_features:
+            os.close(pin)
+            return False
+
+        def array(name):
+            return np.load(os.path.join(source, f"{name}.npy"), mmap_mode="r")
+
+        with self._merge_lock, self._lock:
+            self._set_base(*(array(name) for name in ARRAYS), pin=pin)
+            self._delta = {}
+            self.version = meta["version"]
+            self.opened = True
+        return True
+
+    def open(self, repository: BookRepository):
+        """Старт: загрузка с диска и догонка по журналу либо построение"""
+        if not self.load():
+            self.build(repository)
+            return
+        with self._lock:
+            try:
+                latest = repository.changes_since(0, 1)["latest_version"]
+            except NotImplementedError:
+                latest = self.version
+            # База моложе индекса (например, восстановлена из бэкапа) или
+            # индекс сохранен для другой базы
+            current = (
+                latest >= self.version
+                and self._apply_changes(repository)
+                and len(self) == repository.count()
+            )
+        if not current:
+            self.build(repository)
+
+    # Инкрементальные изменения
+
+    def upsert(self, book: dict):
+        with self._lock:
+            self._delta[book["id"]] = self.vectorize(book)
+            self._delta_matrix = None
+
+    def remove(self, book_id: int):
+        with self._lock:
+            self._delta[book_id] = None
+            self._delta_matrix = None
+
+    def sync(self, repository: BookRepository, force: bool = False):
+        """Применение изменений из журнала (не чаще sync_interval)"""
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        with self._lock:
+            applied = self._apply_changes(repository)
+        if not applied:
+            self.build(repository)
+
+    def _apply_changes(self, repository: BookRepository) -> bool:
+        """False - журнал очищен дальше нашей версии"""
+        try:
+            changes, version, truncated = read_changes(repository, self.version)
+        except NotImplementedError:
+            return True
+        if truncated:
+            return False
+        changed = {c["book_id"] for c in changes}
+        books = repository.get_books_by_ids(list(changed), TEXT_COLUMNS)
+        for book_id in changed:
+            if book_id in books:
+                self._delta[book_id] = self.vectorize(books[book_id])
+            else:
+                self._delta[book_id] = None
+        self._delta_matrix = None
+        self.version = version
+        return True
+
+    def merge_if_needed(self) -> Optional[dict]:
+        """Слияние, если дельта превысила merge_threshold (планировщик)"""
+        if not self.opened or len(self._delta) < self.merge_threshold:
+            return None
+        return {"merged": self.merge()}
+
+    def merge(self) -> int:
+        """Влить дельту в основную матрицу и сохранить ее; число строк дельты
+
+        Новая матрица собирается и пишется на диск без блокировки индекса:
+        поиск идет по старой матрице и дельте, блокировка берется только на
+        подмену. Изменения, пришедшие во время слияния, остаются в дельте.
+        """
+        with self._merge_lock:
+            with self._lock:
+                data, indices, indptr = self._data, self._indices, self._indptr
+                book_ids, idf = self._book_ids, self._idf
+                snapshot = dict(self._delta)
+                version = self.version
+
+            base = sparse.csc_matrix(
+                (data, indices, indptr), shape=(len(book_ids), self.n_features)
+            ).tocsr()
+            keep = np.ones(len(book_ids), dtype=bool)
+            for book_id in snapshot:
+                i = int(np.searchsorted(book_ids, book_id))
+                if i < len(book_ids) and book_ids[i] == book_id:
+                    keep[i] = False
+            added = [(i, row) for i, row in snapshot.items() if row is not None]
+            delta = self._rows_matrix([row for _, row in added])
+
+            ids = np.concatenate(
+                [
+                    np.asarray(book_ids)[keep],
+                    np.array([i for i, _ in added], np.int64),
+                ]
+            )
+            merged = sparse.vstack([base[keep], delta]).tocsr()
+            order = np.argsort(ids, kind="stable")
+            merged = merged[order].tocsc()
+            merged.sort_indices()
+            arrays = {
+                "data": merged.data.astype(np.float32),
+                "indices": merged.indices.astype(np.int32),
+                "indptr": merged.indptr.astype(np.int64),
+                "book_ids": ids[order],
+                "idf": np.array(idf),
+            }
+
+            with self._lock:
+                self._set_base(*(arrays[name] for name in ARRAYS))
+                for book_id, row in snapshot.items():
+                    if self._delta.get(book_id, False) is row:
+                        del self._delta[book_id]
+            self._write(arrays, version)
+            return len(snapshot)
+
+    def _rows_matrix(self, rows):
+        """CSR-матрица из списка (признаки, веса)"""
+        indptr = np.zeros(len(rows) + 1, np.int64)
+        if rows:
+            indptr[1:] = np.cumsum([len(features) for features, _ in rows])
+            indices = np.concatenate([features for features, _ in rows])
+            data = np.concatenate([weights for _, weights in rows])
+        else:
+            indices = np.zeros(0, np.int32)
+            data = np.zeros(0, np.float32)
+        return sparse.csr_matrix(
+            (data, indices, indptr), shape=(len(rows), self.n_features)
+        )
+
+    # Поиск
+
+    def _base_scores(self, features, weights):
+        """(позиции, косинусы) строк основной матрицы с общими признаками"""
+        indptr = self._indptr
+        starts = indptr[features]
+        ends = indptr[features + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        # Все постинги нужных столбцов одним вектором индексов
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        postings = np.arange(lengths.sum()) + offsets
+        rows = np.asarray(self._indices[postings])
+        products = np.asarray(self._data[postings]) * np.repeat(weights, lengths)
+        positions, inverse = np.unique(rows, return_inverse=True)
+        return positions, np.bincount(inverse, weights=products)
+
+    def similar(self, book: dict, limit: int = 10) -> List[Dict]:
+        """Похожие книги: [{"id", "score"}] по убыванию косинуса"""
+        with self._lock:
+            features, weights = self.vectorize(book)
+            if not len(features):
+                return []
+            positions, scores = self._base_scores(features, weights)
+            candidates = dict(
+                zip(np.asarray(self._book_ids)[positions].tolist(), scores.tolist())
+            )
+            for book_id in self._delta:
+                candidates.pop(book_id, None)
+
+            if self._delta_matrix is None:
+                live = [(i, row) for i, row in self._delta.items() if row is not None]
+                self._delta_matrix = (
+                    [i for i, _ in live],
+                    self._rows_matrix([row for _, row in live]),
+                )
+            delta_ids, delta_matrix = self._delta_matrix
+            if delta_ids:
+                query = np.zeros(self.n_features, np.float32)
+                query[features] = weights
+                for book_id, score in zip(delta_ids, delta_matrix @ query):
+                    if score > 0:
+                        candidates[book_id] = float(score)
+
+        candidates.pop(book["id"], None)
+        ids = np.fromiter(candidates.keys(), np.int64, len(candidates))
+        values = np.fromiter(candidates.values(), np.float64, len(candidates))
+        if len(ids) > limit:
+            top = np.argpartition(-values, limit)[:limit]
+            ids, values = ids[top], values[top]
+        order = np.lexsort((ids, -values))
+        return [{"id": int(ids[i]), "score": round(float(values[i]), 4)} for i in order]
+
+
+_index: Optional[SimilarIndex] = None
+
+
+def similar_available() -> bool:
+    return np is not None
+
+
+def get_similar_index() -> Optional[SimilarIndex]:
+    """Общий индекс похожих книг (None без numpy/scipy)"""
+    global _index
+    if _index is None and similar_available():
+        _index = SimilarIndex(settings.SIMILAR_INDEX_DIR or None)
+    return _index
@@ -0,0 +1,170 @@
+# app/crud/suggest.py
+import bisect
+import re
+import threading
+import time
+from typing import List, Optional
+
+from app.core.text import normalize
+from app.crud.books import BookRepository, read_changes
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Ограничения работы на один запрос (защита от запросов вроде "а")
+MAX_SCANNED_TOKENS = 2000
+MAX_CANDIDATES = 20000
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(normalize(text or ""))
+
+
+class SuggestIndex:
+    """Префиксный индекс по токенам названия и автора для подсказок
+
+    Отсортированный словарь токенов (поиск префикса через bisect) и
+    постинги токен -> множество ID книг. Индекс строится при старте и
+    обновляется точечно при записи, а изменения других процессов
+    подтягиваются из журнала изменений не чаще sync_interval.
+    """
+
+    def __init__(self, sync_interval: float = 1.0):
+        self.sync_interval = sync_interval
+        self.version = 0
+        self._vocabulary = []  # отсортированные уникальные токены
+        self._postings = {}  # токен -> set(ID)
+        self._books = {}  # ID -> (title, author, frozenset токенов)
+        self._last_sync = 0.0
+        self._building = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._books)
+
+    def build(self, repository: BookRepository):
+        """Полное построение индекса по хранилищу"""
+        with self._lock:
+            self._vocabulary = []
+            self._postings = {}
+            self._books = {}
+            self._building = True
+            try:
+                self.version = repository.changes_since(0, 1)["latest_version"]
+            except NotImplementedError:
+                self.version = 0
+            try:
+                for book in repository.scan(["id", "title", "author"]):
+                    self._add(book["id"], book["title"], book["author"])
+            finally:
+                # Словарь сортируется один раз, а не вставкой на каждый токен
+                self._building = False
+                self._vocabulary = sorted(self._postings)
+            self._last_sync = time.monotonic()
+
+    def _add(self, book_id: int, title: str, author: str):
+        tokens = frozenset(tokenize(title) + tokenize(author))
+        self._books[book_id] = (title, author, tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                if not self._building:
+                    bisect.insort(self._vocabulary, token)
+            postings.add(book_id)
+
+    def remove(self, book_id: int):
+        with self._lock:
+            entry = self._books.pop(book_id, None)
+            if entry is None:
+                return
+            for token in entry[2]:
+                postings = self._postings[token]
+                postings.discard(book_id)
+                if not postings:
+                    del self._postings[token]
+                    i = bisect.bisect_left(self._vocabulary, token)
+                    if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                        del self._vocabulary[i]
+
+    def upsert(self, book_id: int, title: str, author: str):
+        with self._lock:
+            entry = self._books.get(book_id)
+            if entry is not None and entry[0] == title and entry[1] == author:
+                return
+            self.remove(book_id)
+            self._add(book_id, title, author)
+
+    def sync(self, repository: BookRepository, force: bool = False):
+        """Применение изменений из журнала (не чаще sync_interval)"""
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        with self._lock:
+            self._apply_changes(repository)
+
+    def _apply_changes(self, repository: BookRepository):
+        try:
+            changes, version, truncated = read_changes(repository, self.version)
+        except NotImplementedError:
+            return
+        if truncated:
+            # Журнал уже очищен дальше нашей версии - строим заново
+            self.build(repository)
+            return
+        for change in changes:
+            book = change["book"]
+            if book is None:
+                self.remove(change["book_id"])
+            else:
+                self.upsert(book["id"], book["title"], book["author"])
+        self.version = version
+
+    def _prefix_matches(self, prefix: str):
+        """Токены словаря, начинающиеся с prefix, в лексикографическом порядке"""
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        vocabulary = self._vocabulary
+        end = min(len(vocabulary), i + MAX_SCANNED_TOKENS)
+        while i < end and vocabulary[i].startswith(prefix):
+            yield vocabulary[i]
+            i += 1
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        """Книги, у которых каждое слово запроса - префикс токена"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Кандидатов берем по самому длинному (обычно самому редкому) слову
+        anchor = max(terms, key=len)
+        others = [t for t in terms if t is not anchor]
+
+        with self._lock:
+            results = []
+            seen = set()
+            for token in self._prefix_matches(anchor):
+                for book_id in self._postings[token]:
+                    if book_id in seen:
+                        continue
+                    seen.add(book_id)
+                    if len(seen) > MAX_CANDIDATES:
+                        return results
+                    title, author, tokens = self._books[book_id]
+                    if all(any(t.startswith(o) for t in tokens) for o in others):
+                        results.append(
+                            {"id": book_id, "title": title, "author": author}
+                        )
+                        if len(results) >= limit:
+                            return results
+            return results
+
+
+_index: Optional[SuggestIndex] = None
+
+
+def get_suggest_index() -> SuggestIndex:
+    """Общий индекс подсказок приложения"""
+    global _index
+    if _index is None:
+        _index = SuggestIndex()
+    return _index
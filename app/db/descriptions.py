@@ -0,0 +1,165 @@
+# app/db/descriptions.py
+import math
+import sqlite3
+import zlib
+from typing import Optional
+
+# Описания лежат отдельно от books: строка книги остается узкой, и
+# сканы с фильтрами и COUNT(*) читают меньше страниц. Описание читается
+# только когда оно есть в ответе
+DESCRIPTIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS book_descriptions (
+        book_id INTEGER PRIMARY KEY,
+        data BLOB NOT NULL
+    )
+"""
+
+# Первый байт data - формат: как есть (UTF-8) или deflate со словарем
+FORMAT_RAW = 0
+FORMAT_DEFLATE = 1
+
+# Короче этого сжатие не окупает даже заголовка
+MIN_COMPRESS_BYTES = 64
+COMPRESS_LEVEL = 9
+
+# Общий словарь deflate (zdict): частые слова и обороты описаний. Короткие
+# тексты сжимаются в основном за счет ссылок на него. Словарь нельзя
+# менять без нового кода формата - им сжаты уже сохраненные описания.
+# Самое частое - в конце, до него ссылки короче
+DESCRIPTION_ZDICT = (
+    " издание издательство перевод переиздание иллюстрации комментарии"
+    " сборник рассказов повесть повести рассказы стихи стихотворения поэма"
+    " trilogy series novel story stories edition translated by the author"
+    " главный герой главная героиня судьба любовь война мир жизнь смерть"
+    " семья история истории времени время человек человека людей России"
+    " классика классической литературы литература русской писателя автора"
+    " впервые опубликован роман-эпопея роман о том, как в котором которая"
+    " которые который это его её их он она они был была были будет этот"
+    " для при без под над после через между также только когда где что"
+    " книга книги книгу роман романа романе и в на с по из к от не о до"
+).encode()
+
+
+def encode_description(text: str) -> bytes:
+    """Описание в формат хранения: deflate со словарем, если это короче"""
+    raw = text.encode()
+    if len(raw) >= MIN_COMPRESS_BYTES:
+        compressor = zlib.compressobj(
+            COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DESCRIPTION_ZDICT
+        )
+        packed = compressor.compress(raw) + compressor.flush()
+        if len(packed) < len(raw):
+            return bytes([FORMAT_DEFLATE]) + packed
+    return bytes([FORMAT_RAW]) + raw
+
+
+def decode_description(data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
+    if data[0] == FORMAT_DEFLATE:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=DESCRIPTION_ZDICT)
+        raw = decompressor.decompress(data[1:]) + decompressor.flush()
+    else:
+        raw = data[1:]
+    return bytes(raw).decode()
+
+
+def table_pages(conn, name: str) -> Optional[int]:
+    """Страниц таблицы или индекса по dbstat (None, если dbstat недоступен)"""
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM dbstat WHERE name = ?", (name,)
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def migrate_descriptions(conn, batch_size: int = 1000) -> Optional[dict]:
+    """Перенос books.description (старая схема) в сжатую book_descriptions
+
+    Одна транзакция: описания сжимаются пачками, колонка удаляется через
+    DROP COLUMN. DROP COLUMN переписывает строки на месте и оставляет
+    страницы books полупустыми, поэтому после него один раз выполняется
+    VACUUM. Возвращает отчет или None, если переносить нечего.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(books)")]
+    if "description" not in columns:
+        return None
+
+    pages_before = table_pages(conn, "books")
+    raw_bytes = stored_bytes = migrated = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(DESCRIPTIONS_TABLE)
+        cursor = conn.execute(
+            "SELECT id, description FROM books WHERE description IS NOT NULL"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            encoded = [(book_id, encode_description(text)) for book_id, text in rows]
+            conn.executemany(
+                "INSERT OR REPLACE INTO book_descriptions (book_id, data) "
+                "VALUES (?, ?)",
+                encoded,
+            )
+            migrated += len(rows)
+            raw_bytes += sum(len(text.encode()) for _, text in rows)
+            stored_bytes += sum(len(data) for _, data in encoded)
+        conn.execute("ALTER TABLE books DROP COLUMN description")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("VACUUM")
+    return {
+        "migrated": migrated,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "books_pages_before": pages_before,
+        "books_pages_after": table_pages(conn, "books"),
+    }
+
+
+def storage_report(conn) -> dict:
+    """Экономия от вынесенных сжатых описаний: на диске и в кэше страниц
+
+    scan_pages_saved - сколько страниц меньше читает полный скан books
+    (фильтры без индекса, COUNT(*)) по сравнению с описаниями в строке;
+    столько же страниц не вытесняет из кэша SQLite и ОС.
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    count = raw_bytes = stored_bytes = compressed = 0
+    for (data,) in conn.execute("SELECT data FROM book_descriptions"):
+        count += 1
+        stored_bytes += len(data)
+        raw_bytes += len(decode_description(data).encode())
+        compressed += data[0] == FORMAT_DEFLATE
+
+    books_pages = table_pages(conn, "books")
+    # Описания в строке заняли бы в books примерно столько же страниц
+    inline_pages = math.ceil(raw_bytes / page_size)
+    report = {
+        "page_size": page_size,
+        # Отрицательный cache_size - размер в КиБ
+        "cache_pages": (
+            cache_size if cache_size >= 0 else -cache_size * 1024 // page_size
+        ),
+        "descriptions": count,
+        "compressed": compressed,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "disk_bytes_saved": raw_bytes - stored_bytes,
+        "compression_ratio": round(raw_bytes / stored_bytes, 3)
+        if stored_bytes
+        else None,
+        "books_pages": books_pages,
+        "descriptions_pages": table_pages(conn, "book_descriptions"),
+        "scan_pages_saved": inline_pages,
+        "scan_bytes_saved": inline_pages * page_size,
+    }
+    if books_pages is not None:
+        report["inline_books_pages_estimate"] = books_pages + inline_pages
+    return report
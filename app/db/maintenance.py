@@ -0,0 +1,215 @@
+# app/db/maintenance.py
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.db.session import ConnectionFactory
+
+
+def wal_size(factory: ConnectionFactory) -> int:
+    """Размер файла -wal в байтах (0, если его нет)"""
+    try:
+        return os.path.getsize(f"{factory.path}-wal")
+    except OSError:
+        return 0
+
+
+def checkpoint(factory: ConnectionFactory, truncate_bytes: int) -> dict:
+    """PASSIVE-чекпойнт; TRUNCATE, если WAL вырос больше truncate_bytes
+
+    PASSIVE не ждет читателей и писателей, поэтому его можно делать часто.
+    TRUNCATE обнуляет файл WAL, но ждет завершения активных транзакций.
+    """
+    size = wal_size(factory)
+    mode = "TRUNCATE" if size > truncate_bytes else "PASSIVE"
+    conn = factory.connect()
+    try:
+        busy, wal_pages, checkpointed = conn.execute(
+            f"PRAGMA wal_checkpoint({mode})"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        "mode": mode,
+        "busy": bool(busy),
+        "wal_pages": wal_pages,
+        "checkpointed": checkpointed,
+        "wal_bytes_before": size,
+    }
+
+
+def incremental_vacuum(
+    factory: ConnectionFactory, pages: int, pause: float, max_steps: int = 1000
+) -> dict:
+    """Возврат свободных страниц шагами по pages с паузами между ними
+
+    Каждый шаг - короткая транзакция записи, так что запросы успевают
+    пройти между шагами, а не ждут один длинный VACUUM.
+    """
+    conn = factory.connect()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return {"freed_pages": 0, "steps": 0, "incremental": False}
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        start = freelist
+        steps = 0
+        while freelist > 0 and steps < max_steps:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            conn.commit()
+            steps += 1
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if freelist > 0 and pause > 0:
+                time.sleep(pause)
+    finally:
+        conn.close()
+    return {"freed_pages": start - freelist, "steps": steps, "incremental": True}
+
+
+def optimize(factory: ConnectionFactory) -> dict:
+    """Обновление статистики планировщика с ограничением работы ANALYZE"""
+    conn = factory.connect()
+    try:
+        conn.execute("PRAGMA analysis_limit = 400")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    finally:
+        conn.close()
+    return {"optimized": True}
+
+
+class MaintenanceTask:
+    """Периодическая задача обслуживания и ее статистика"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], dict]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Optional[str] = None
+        self.last_duration_ms = 0.0
+        self.max_duration_ms = 0.0
+        self.total_duration_ms = 0.0
+        self.last_result: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+    async def run_once(self):
+        started = time.perf_counter()
+        try:
+            # Блокирующая работа с SQLite - в потоке, не в цикле событий
+            self.last_result = await asyncio.to_thread(self.func)
+            self.last_error = None
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+        duration = (time.perf_counter() - started) * 1000
+        self.runs += 1
+        self.last_run = datetime.now().isoformat()
+        self.last_duration_ms = round(duration, 3)
+        self.max_duration_ms = round(max(self.max_duration_ms, duration), 3)
+        self.total_duration_ms = round(self.total_duration_ms + duration, 3)
+
+    async def loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "max_duration_ms": self.max_duration_ms,
+            "total_duration_ms": self.total_duration_ms,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+class MaintenanceScheduler:
+    """Фоновое обслуживание SQLite по расписанию
+
+    Чекпойнты WAL, инкрементальный VACUUM и ANALYZE выполняются в
+    фоновых задачах, а не в случайном запросе, поэтому не дают всплесков
+    задержки. Каждая задача - свой цикл asyncio с собственным интервалом.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, MaintenanceTask] = {}
+        self._handles: List[asyncio.Task] = []
+
+    def add(self, name: str, interval: float, func: Callable[[], dict]):
+        self.tasks[name] = MaintenanceTask(name, interval, func)
+
+    def start(self):
+        for task in self.tasks.values():
+            self._handles.append(asyncio.create_task(task.loop()))
+
+    async def stop(self):
+        for handle in self._handles:
+            handle.cancel()
+        await asyncio.gather(*self._handles, return_exceptions=True)
+        self._handles = []
+
+    async def run_all(self):
+        """Однократный прогон всех задач (тесты, ручной запуск)"""
+        for task in self.tasks.values():
+            await task.run_once()
+
+    def stats(self) -> dict:
+        return {name: task.stats() for name, task in self.tasks.items()}
+
+
+def _for_each(factories: List[ConnectionFactory], func: Callable, *args) -> dict:
+    """Результат func по каждой файловой базе (ключ - путь)"""
+    return {factory.path: func(factory, *args) for factory in factories}
+
+
+def create_maintenance_scheduler(repository, settings) -> MaintenanceScheduler:
+    """Планировщик для хранилища приложения по настройкам"""
+    scheduler = MaintenanceScheduler()
+    factories = [f for f in repository.connection_factories() if not f.is_memory]
+
+    def compact_change_log():
+        try:
+            deleted = repository.compact_changes(
+                settings.CHANGE_LOG_MAX_ENTRIES, settings.CHANGE_LOG_MAX_AGE_SECONDS
+            )
+        except NotImplementedError:
+            return None
+        return {"deleted": deleted}
+
+    scheduler.add(
+        "compact_change_log", settings.CHANGE_LOG_COMPACT_INTERVAL, compact_change_log
+    )
+    if not settings.MAINTENANCE_ENABLED or not factories:
+        return scheduler
+
+    if settings.SQLITE_JOURNAL_MODE.upper() == "WAL":
+        scheduler.add(
+            "wal_checkpoint",
+            settings.MAINTENANCE_CHECKPOINT_INTERVAL,
+            lambda: _for_each(
+                factories, checkpoint, settings.MAINTENANCE_WAL_TRUNCATE_BYTES
+            ),
+        )
+    scheduler.add(
+        "incremental_vacuum",
+        settings.MAINTENANCE_VACUUM_INTERVAL,
+        lambda: _for_each(
+            factories,
+            incremental_vacuum,
+            settings.MAINTENANCE_VACUUM_PAGES,
+            settings.MAINTENANCE_VACUUM_PAUSE,
+        ),
+    )
+    scheduler.add(
+        "optimize",
+        settings.MAINTENANCE_ANALYZE_INTERVAL,
+        lambda: _for_each(factories, optimize),
+    )
+    return scheduler
@@ -0,0 +1,305 @@
+# app/db/session.py
+import os
+import sqlite3
+from typing import Optional, Sequence
+
+from app.core.text import normalize_name
+from app.db.descriptions import DESCRIPTIONS_TABLE, migrate_descriptions
+
+# Типы хранилищ, которые можно выбрать через DATABASE_URL
+BACKEND_SQLITE_FILE = "sqlite"
+BACKEND_SQLITE_MEMORY = "sqlite-memory"
+BACKEND_MEMORY = "memory"
+
+# Имя общей in-memory базы SQLite (shared cache)
+SHARED_MEMORY_URI = "file:smart_library?mode=memory&cache=shared"
+
+# Справочник авторов: книги ссылаются на него по author_id, name_norm -
+# имя без регистра и диакритики для поиска, book_count ведут триггеры
+AUTHORS_TABLE = """
+    CREATE TABLE IF NOT EXISTS authors (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        name_norm TEXT NOT NULL,
+        book_count INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+BOOKS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author_id INTEGER NOT NULL REFERENCES authors(id),
+        isbn TEXT UNIQUE,
+        year INTEGER CHECK(year >= 1000 AND year <= 2100),
+        is_available BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SCHEMA_STATEMENTS = [
+    AUTHORS_TABLE,
+    "CREATE INDEX IF NOT EXISTS idx_authors_name_norm ON authors(name_norm, name)",
+    BOOKS_TABLE.format(name="books"),
+    # Индексы для производительности
+    "CREATE INDEX IF NOT EXISTS idx_books_author_id ON books(author_id)",
+    "CREATE INDEX IF NOT EXISTS idx_books_year ON books(year)",
+    # Индексы сортировок списка (к ключу неявно добавляется id)
+    "CREATE INDEX IF NOT EXISTS idx_books_title ON books(title COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_books_updated ON books(updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_books_available ON books(is_available)",
+    # Покрывающий индекс для компактного списка: порядок created_at DESC, id DESC
+    # и все поля books, поэтому узкие запросы не читают таблицу
+    """
+    CREATE INDEX IF NOT EXISTS idx_books_list ON books(
+        created_at, id, title, author_id, isbn, year, is_available, updated_at
+    )
+    """,
+    # Число книг автора; автор без книг удаляется из справочника
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_authors_insert AFTER INSERT ON books
+    BEGIN
+        UPDATE authors SET book_count = book_count + 1 WHERE id = NEW.author_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_authors_update AFTER UPDATE OF author_id ON books
+    WHEN OLD.author_id != NEW.author_id
+    BEGIN
+        UPDATE authors SET book_count = book_count + 1 WHERE id = NEW.author_id;
+        UPDATE authors SET book_count = book_count - 1 WHERE id = OLD.author_id;
+        DELETE FROM authors WHERE id = OLD.author_id AND book_count = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_authors_delete AFTER DELETE ON books
+    BEGIN
+        UPDATE authors SET book_count = book_count - 1 WHERE id = OLD.author_id;
+        DELETE FROM authors WHERE id = OLD.author_id AND book_count = 0;
+    END
+    """,
+    # Сжатые описания (app/db/descriptions.py) удаляются вместе с книгой
+    DESCRIPTIONS_TABLE,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_descriptions_delete AFTER DELETE ON books
+    BEGIN
+        DELETE FROM book_descriptions WHERE book_id = OLD.id;
+    END
+    """,
+    # Журнал изменений для ленты /books/changes: version растет монотонно
+    """
+    CREATE TABLE IF NOT EXISTS book_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_books_insert AFTER INSERT ON books
+    BEGIN
+        INSERT INTO book_changes (book_id, op) VALUES (NEW.id, 'insert');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_books_update AFTER UPDATE ON books
+    BEGIN
+        INSERT INTO book_changes (book_id, op) VALUES (NEW.id, 'update');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_books_delete AFTER DELETE ON books
+    BEGIN
+        INSERT INTO book_changes (book_id, op) VALUES (OLD.id, 'delete');
+    END
+    """,
+    # Счетчики просмотров: пишутся пачками из памяти (write-behind)
+    """
+    CREATE TABLE IF NOT EXISTS book_stats (
+        book_id INTEGER PRIMARY KEY,
+        views INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_book_stats_views ON book_stats(views)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_book_stats_delete AFTER DELETE ON books
+    BEGIN
+        DELETE FROM book_stats WHERE book_id = OLD.id;
+    END
+    """,
+    # Версия схемы (одна строка), см. SCHEMA_VERSION
+    """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+# Версия схемы: увеличивать при любом изменении SCHEMA_STATEMENTS или
+# миграций. Если база уже на этой версии, init_schema не выполняет DDL
+SCHEMA_VERSION = 1
+
+
+def parse_database_url(url: str):
+    """Разбор DATABASE_URL в пару (тип хранилища, путь к файлу)
+
+    Поддерживаемые форматы:
+    * sqlite:///./library.db, sqlite:////abs/path.db - файл SQLite
+    * sqlite://, sqlite:///:memory: - общая in-memory база SQLite
+    * memory:// - хранилище на чистом Python
+    """
+    if url.startswith("memory://"):
+        return BACKEND_MEMORY, None
+
+    if not url.startswith("sqlite://"):
+        raise ValueError(f"Неподдерживаемый DATABASE_URL: {url}")
+
+    path = url[len("sqlite://") :]
+    if path in ("", "/", "/:memory:"):
+        return BACKEND_SQLITE_MEMORY, None
+
+    # sqlite:///relative.db -> relative.db, sqlite:////abs.db -> /abs.db
+    path = path[1:]
+    return BACKEND_SQLITE_FILE, os.path.normpath(path)
+
+
+class ConnectionFactory:
+    """Фабрика соединений SQLite для файловой или общей in-memory базы
+
+    pragmas выполняются на каждом новом соединении (например,
+    wal_autocheckpoint=0, когда чекпойнты делает планировщик обслуживания).
+    """
+
+    def __init__(self, path: Optional[str] = None, pragmas: Sequence[str] = ()):
+        self.path = path
+        self.pragmas = list(pragmas)
+        self._keeper = None
+        if path is None:
+            # In-memory база живет, пока открыто хотя бы одно соединение
+            self._keeper = self._raw_connect()
+
+    @property
+    def is_memory(self) -> bool:
+        return self.path is None
+
+    def _raw_connect(self):
+        if self.path is None:
+            return sqlite3.connect(SHARED_MEMORY_URI, uri=True)
+        return sqlite3.connect(self.path)
+
+    def connect(self):
+        """Новое соединение с row_factory = sqlite3.Row"""
+        conn = self._raw_connect()
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def close(self):
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+
+def migrate_authors(conn) -> bool:
+    """Перенос авторов из books.author (старая схема) в справочник authors
+
+    Таблица books пересобирается одной транзакцией: ID, даты и счетчик
+    AUTOINCREMENT сохраняются, журнал изменений не пополняется. Возвращает
+    True, если миграция была нужна.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(books)")]
+    if "author" not in columns:
+        return False
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(AUTHORS_TABLE)
+        counts = conn.execute(
+            "SELECT author, COUNT(*) FROM books GROUP BY author"
+        ).fetchall()
+        conn.executemany(
+            "INSERT INTO authors (name, name_norm, book_count) VALUES (?, ?, ?)",
+            [(name, normalize_name(name), count) for name, count in counts],
+        )
+        seq = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'books'"
+        ).fetchall()
+        conn.execute(BOOKS_TABLE.format(name="books_new"))
+        conn.execute(
+            """
+            INSERT INTO books_new (
+                id, title, author_id, isbn, year,
+                is_available, created_at, updated_at
+            )
+            SELECT
+                b.id, b.title, a.id, b.isbn, b.year,
+                b.is_available, b.created_at, b.updated_at
+            FROM books b JOIN authors a ON a.name = b.author
+            """
+        )
+        # Вместе с таблицей удаляются ее индексы и триггеры - их заново
+        # создает init_schema
+        conn.execute("DROP TABLE books")
+        conn.execute("ALTER TABLE books_new RENAME TO books")
+        if seq:
+            updated = conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'books'",
+                (seq[0][0],),
+            ).rowcount
+            if not updated:  # все книги были удалены
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('books', ?)",
+                    (seq[0][0],),
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def schema_version(conn) -> int:
+    """Записанная в базе версия схемы (0 - новая база или старая без версии)"""
+    try:
+        row = conn.execute("SELECT version FROM schema_version").fetchone()
+    except sqlite3.OperationalError:  # таблицы еще нет
+        return 0
+    return row[0] if row else 0
+
+
+def init_schema(conn, journal_mode: Optional[str] = None) -> bool:
+    """Создание таблиц и индексов (идемпотентно)
+
+    Если база уже на SCHEMA_VERSION, DDL и проверки миграций не
+    выполняются. Возвращает True, если схема создавалась или обновлялась.
+    """
+    cursor = conn.cursor()
+    # Для новой базы включаем инкрементальный VACUUM; существующая
+    # перейдет на него после полного VACUUM (задача vacuum)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    if journal_mode:
+        # PRAGMA возвращает строку; незавершенный запрос мешает миграции
+        cursor.execute(f"PRAGMA journal_mode = {journal_mode}").fetchall()
+    if schema_version(conn) == SCHEMA_VERSION:
+        return False
+
+    # Сначала описания: пересборка books в migrate_authors их уже не копирует
+    migrate_descriptions(conn)
+    migrate_authors(conn)
+    for statement in SCHEMA_STATEMENTS:
+        cursor.execute(statement)
+    cursor.execute(
+        """
+        INSERT INTO schema_version (id, version) VALUES (1, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            version = excluded.version, updated_at = CURRENT_TIMESTAMP
+    """,
+        (SCHEMA_VERSION,),
+    )
+    conn.commit()
+    return True
@@ -0,0 +1,335 @@
+# app/jobs/manager.py
+import itertools
+import json
+import queue
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from app.db.session import ConnectionFactory, parse_database_url
+
+# Статусы задач
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Колонки списка задач: params (у импорта - весь список книг) только в
+# карточке задачи
+LIST_COLUMNS = (
+    "id, type, priority, status, progress, message, result, error, "
+    "created_at, started_at, finished_at"
+)
+
+JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        params TEXT NOT NULL DEFAULT '{}',
+        priority INTEGER NOT NULL DEFAULT 5,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+"""
+
+
+class JobCancelled(Exception):
+    """Задача отменена во время выполнения"""
+
+
+class QueueFullError(Exception):
+    """Очередь задач заполнена"""
+
+
+class JobContext:
+    """То, что видит функция задачи: параметры, прогресс, отмена"""
+
+    def __init__(self, manager: "JobManager", job_id: int, params: dict):
+        self.manager = manager
+        self.job_id = job_id
+        self.params = params
+        self.cancel_event = threading.Event()
+
+    def check_cancelled(self):
+        """Кооперативная отмена: вызывать между шагами длинной задачи"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        self.check_cancelled()
+        self.manager.store.update(
+            self.job_id, progress=max(0.0, min(1.0, fraction)), message=message
+        )
+
+
+class JobStore:
+    """Состояние задач в SQLite"""
+
+    def __init__(self, factory: ConnectionFactory):
+        self.factory = factory
+        conn = self.factory.connect()
+        try:
+            conn.execute(JOBS_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        if "params" in job:
+            job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, job_type: str, params: dict, priority: int) -> dict:
+        conn = self.factory.connect()
+        try:
+            cursor = conn.execute(
+                "INSERT INTO jobs (type, params, priority, status) VALUES (?, ?, ?, ?)",
+                (job_type, json.dumps(params), priority, QUEUED),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (cursor.lastrowid,)
+            ).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        return self._to_dict(row)
+
+    def get(self, job_id: int) -> Optional[dict]:
+        conn = self.factory.connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 100,
+        job_type: Optional[str] = None,
+    ) -> List[dict]:
+        query = f"SELECT {LIST_COLUMNS} FROM jobs WHERE 1=1"
+        params = []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if job_type:
+            query += " AND type = ?"
+            params.append(job_type)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        conn = self.factory.connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: int, only_if_status=None, **fields) -> bool:
+        """Обновление полей; only_if_status - условие на текущий статус"""
+        assignments = []
+        values = []
+        for name, value in fields.items():
+            if name in ("started_at", "finished_at") and value is True:
+                assignments.append(f"{name} = CURRENT_TIMESTAMP")
+                continue
+            if name == "result":
+                value = json.dumps(value, ensure_ascii=False)
+            assignments.append(f"{name} = ?")
+            values.append(value)
+        query = f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?"
+        values.append(job_id)
+        if only_if_status is not None:
+            statuses = (
+                (only_if_status,) if isinstance(only_if_status, str) else only_if_status
+            )
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            values.extend(statuses)
+        conn = self.factory.connect()
+        try:
+            updated = conn.execute(query, values).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return updated > 0
+
+    def recover(self) -> List[dict]:
+        """После перезапуска: прерванные задачи - в failed, очередь - заново"""
+        conn = self.factory.connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, "
+                "finished_at = CURRENT_TIMESTAMP WHERE status = ?",
+                (FAILED, "Прервана перезапуском сервиса", RUNNING),
+            )
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id", (QUEUED,)
+            ).fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+        return [self._to_dict(row) for row in rows]
+
+
+class JobManager:
+    """Пул потоков с ограниченной очередью приоритетов
+
+    Меньшее значение priority выполняется раньше (0 - самый срочный).
+    Потоки, а не процессы: задачи в основном ждут SQLite, который
+    отпускает GIL, а прогресс и отмена остаются простыми.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, queue_size: int = 100):
+        self.store = store
+        self.workers = workers
+        self.handlers: Dict[str, Callable] = {}
+        self._queue = queue.PriorityQueue(maxsize=queue_size)
+        self._sequence = itertools.count()
+        self._running: Dict[int, JobContext] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def register(self, job_type: str, handler: Callable):
+        """handler(ctx: JobContext) -> результат, сериализуемый в JSON"""
+        self.handlers[job_type] = handler
+
+    def start(self):
+        for job in self.store.recover():
+            try:
+                self._enqueue(job)
+            except QueueFullError:
+                pass
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            for ctx in self._running.values():
+                ctx.cancel_event.set()
+        # Задачи из очереди остаются queued в БД и вернутся при старте
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            # Пустая задача с наивысшим приоритетом останавливает поток
+            self._queue.put((-1, next(self._sequence), None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _enqueue(self, job: dict):
+        try:
+            self._queue.put_nowait((job["priority"], next(self._sequence), job["id"]))
+        except queue.Full:
+            self.store.update(
+                job["id"],
+                status=FAILED,
+                error="Очередь задач заполнена",
+                finished_at=True,
+            )
+            raise QueueFullError()
+
+    def submit(self, job_type: str, params: dict, priority: int = 5) -> dict:
+        if job_type not in self.handlers:
+            raise ValueError(f"Неизвестный тип задачи: {job_type}")
+        if self._queue.full():
+            raise QueueFullError()
+        job = self.store.create(job_type, params, priority)
+        self._enqueue(job)
+        return job
+
+    def cancel(self, job_id: int) -> Optional[dict]:
+        """Отмена: из очереди - сразу, выполняющейся - по check_cancelled"""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return job
+        if self.store.update(
+            job_id, only_if_status=QUEUED, status=CANCELLED, finished_at=True
+        ):
+            return self.store.get(job_id)
+        with self._lock:
+            ctx = self._running.get(job_id)
+        if ctx is not None:
+            ctx.cancel_event.set()
+        return self.store.get(job_id)
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: int):
+        job = self.store.get(job_id)
+        # Задачу могли отменить, пока она стояла в очереди
+        if job is None or not self.store.update(
+            job_id, only_if_status=QUEUED, status=RUNNING, started_at=True
+        ):
+            return
+
+        ctx = JobContext(self, job_id, job["params"])
+        with self._lock:
+            self._running[job_id] = ctx
+        try:
+            result = self.handlers[job["type"]](ctx)
+            self.store.update(
+                job_id, status=SUCCEEDED, progress=1.0, result=result, finished_at=True
+            )
+        except JobCancelled:
+            self.store.update(job_id, status=CANCELLED, finished_at=True)
+        except Exception as e:
+            self.store.update(
+                job_id,
+                status=FAILED,
+                error=f"{e}\n{traceback.format_exc(limit=5)}",
+                finished_at=True,
+            )
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def wait_idle(self):
+        """Ожидание опустошения очереди (тесты, бенчмарки)"""
+        self._queue.join()
+
+
+def create_job_store(database_url: str) -> JobStore:
+    """Хранилище задач по URL вида sqlite:///./jobs.db"""
+    _, path = parse_database_url(database_url)
+    return JobStore(ConnectionFactory(path))
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> Optional[JobManager]:
+    """Менеджер задач приложения (None до запуска)"""
+    return _manager
+
+
+def set_job_manager(manager: Optional[JobManager]):
+    global _manager
+    _manager = manager
@@ -0,0 +1,271 @@
+# app/jobs/tasks.py
+import json
+import os
+import sqlite3
+from collections import Counter
+
+from pydantic import ValidationError
+
+from app.core.compression import clear_compressed_caches
+from app.core.config import settings
+from app.crud.books import get_book_repository
+from app.crud.isbn import canonical_isbn, get_isbn_filter
+from app.crud.popularity import get_popularity_tracker
+from app.crud.suggest import get_suggest_index
+from app.db.backup import backup_database, restore_database
+from app.db.descriptions import storage_report
+from app.jobs.manager import JobContext, JobManager
+from app.schemas.book import BookCreate
+
+# Как часто (в строках) сообщать прогресс и проверять отмену
+PROGRESS_EVERY = 1000
+
+
+def vacuum_job(ctx: JobContext):
+    """VACUUM файла базы"""
+    ctx.progress(0.0, "VACUUM")
+    get_book_repository().vacuum()
+    return {"vacuumed": True}
+
+
+def _rebuild_memory_indexes(ctx: JobContext, repository, start: float):
+    """Полное перестроение всех индексов в памяти (прогресс от start до 1)"""
+    stages = [
+        ("Индекс подсказок", get_suggest_index()),
+        ("Фильтр ISBN", get_isbn_filter()),
+    ]
+    if settings.DEDUP_CHECK_ON_INSERT:
+        from app.crud.dedup import get_duplicate_index
+
+        stages.append(("Индекс дубликатов", get_duplicate_index()))
+    from app.crud.similar import get_similar_index
+
+    stages.append(("Индекс похожих книг", get_similar_index()))
+    stages = [(message, index) for message, index in stages if index is not None]
+    for k, (message, index) in enumerate(stages):
+        ctx.progress(start + (1 - start) * k / len(stages), message)
+        index.build(repository)
+
+
+def rebuild_indexes_job(ctx: JobContext):
+    """REINDEX/ANALYZE и перестроение индексов в памяти"""
+    repository = get_book_repository()
+    ctx.progress(0.0, "REINDEX и ANALYZE")
+    repository.rebuild_indexes()
+    _rebuild_memory_indexes(ctx, repository, 0.4)
+    return {"books": repository.count()}
+
+
+def export_job(ctx: JobContext):
+    """Выгрузка каталога в NDJSON (по строке на книгу)"""
+    repository = get_book_repository()
+    total = max(repository.count(), 1)
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.EXPORT_DIR, f"export-{ctx.job_id}.ndjson")
+
+    rows = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for book in repository.scan(ctx.params.get("fields")):
+            f.write(json.dumps(book, ensure_ascii=False) + "\n")
+            rows += 1
+            if rows % PROGRESS_EVERY == 0:
+                ctx.progress(rows / total, f"Выгружено {rows}")
+    return {"path": path, "rows": rows}
+
+
+def import_job(ctx: JobContext):
+    """Импорт книг из params["books"]; дубликаты ISBN пропускаются"""
+    repository = get_book_repository()
+    isbn_filter = get_isbn_filter()
+    books = ctx.params.get("books", [])
+    created = duplicates = 0
+    errors = []
+
+    # Одним пакетом отсекаем уже существующие ISBN (фильтр Блума + IN)
+    isbns = [b.get("isbn") for b in books if isinstance(b, dict) and b.get("isbn")]
+    existing = isbn_filter.find(repository, isbns) if isbns else {}
+    # ISBN-13 уже взятых в этом пакете книг: ISBN-10 и ISBN-13 - одна книга
+    seen = set()
+
+    for i, data in enumerate(books):
+        # Прогресс и отмена - по обработанным строкам, включая отклоненные
+        if i and i % PROGRESS_EVERY == 0:
+            ctx.progress(i / len(books), f"Обработано {i}")
+        try:
+            book = BookCreate(**data)
+        except (TypeError, ValidationError) as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        if book.isbn:
+            if existing.get(book.isbn):
+                duplicates += 1
+                continue
+            book.isbn = canonical_isbn(book.isbn)
+            if book.isbn in seen:
+                duplicates += 1
+                continue
+            seen.add(book.isbn)
+        try:
+            created_book = repository.create_book(book.model_dump())
+        except sqlite3.IntegrityError:
+            duplicates += 1
+            continue
+        created += 1
+        get_suggest_index().upsert(
+            created_book["id"], created_book["title"], created_book["author"]
+        )
+        if created_book["isbn"]:
+            isbn_filter.add(created_book["isbn"])
+
+    return {
+        "created": created,
+        "duplicates": duplicates,
+        "errors": errors[:100],
+        "error_count": len(errors),
+    }
+
+
+def recompute_stats_job(ctx: JobContext):
+    """Агрегаты каталога: по годам, доступности и авторам"""
+    repository = get_book_repository()
+    total = max(repository.count(), 1)
+    by_year = Counter()
+    by_author = Counter()
+    available = 0
+    rows = 0
+    for book in repository.scan(["author", "year", "is_available"]):
+        by_year[book["year"]] += 1
+        by_author[book["author"]] += 1
+        available += book["is_available"]
+        rows += 1
+        if rows % PROGRESS_EVERY == 0:
+            ctx.progress(rows / total, f"Обработано {rows}")
+    return {
+        "total": rows,
+        "available": available,
+        "by_year": {str(year): n for year, n in sorted(by_year.items())},
+        "top_authors": by_author.most_common(20),
+    }
+
+
+def _snapshot_factories():
+    """Файловые базы хранилища (по одной на шард)"""
+    factories = [
+        f for f in get_book_repository().connection_factories() if not f.is_memory
+    ]
+    if not factories:
+        raise ValueError("Бэкап доступен только для файловой базы SQLite")
+    return factories
+
+
+def backup_job(ctx: JobContext):
+    """Онлайн-снимок базы (по файлу на шард), params: compress"""
+    factories = _snapshot_factories()
+    compress = bool(ctx.params.get("compress", settings.BACKUP_COMPRESS))
+    suffix = ".db.gz" if compress else ".db"
+    files = []
+    for k, factory in enumerate(factories):
+        shard = f".shard{k}" if len(factories) > 1 else ""
+        path = os.path.join(settings.BACKUP_DIR, f"backup-{ctx.job_id}{shard}{suffix}")
+
+        def on_step(remaining, total, k=k):
+            # Отмена проверяется на каждом шаге, прогресс пишется реже
+            ctx.check_cancelled()
+            copied = total - remaining
+            if copied % (settings.BACKUP_STEP_PAGES * 16) < settings.BACKUP_STEP_PAGES:
+                done = copied / total if total else 1.0
+                ctx.progress(
+                    (k + done) / len(factories), f"Скопировано страниц: {copied}"
+                )
+
+        files.append(
+            backup_database(
+                factory,
+                path,
+                pages=settings.BACKUP_STEP_PAGES,
+                pause=settings.BACKUP_STEP_PAUSE,
+                compress=compress,
+                progress=on_step,
+            )
+        )
+    result = {"files": files}
+    if len(files) == 1:
+        result["path"] = files[0]["path"]
+        result["media_type"] = (
+            "application/gzip" if compress else "application/x-sqlite3"
+        )
+        result["filename"] = os.path.basename(files[0]["path"])
+    return result
+
+
+def restore_job(ctx: JobContext):
+    """Восстановление из снимка задачи backup, params: backup_job_id"""
+    backup = ctx.manager.store.get(ctx.params.get("backup_job_id"))
+    if backup is None or backup["type"] != "backup" or not backup["result"]:
+        raise ValueError("Нужен backup_job_id успешной задачи backup")
+    factories = _snapshot_factories()
+    files = backup["result"]["files"]
+    if len(files) != len(factories):
+        raise ValueError(
+            f"Снимок из {len(files)} файлов, а база из {len(factories)} шардов"
+        )
+
+    restored = []
+    for k, (factory, snapshot) in enumerate(zip(factories, files)):
+        ctx.progress(0.5 * k / len(factories), f"Восстановление {snapshot['path']}")
+        restored.append(restore_database(factory, snapshot["path"]))
+
+    # Снимок мог быть сделан до миграции схемы; индексы в памяти
+    # строились по прежнему содержимому, а версия журнала снимка меньше
+    # версии индексов
+    repository = get_book_repository()
+    repository.init_schema()
+    # Номера версий журнала пойдут заново: ключи кэша сжатых тел устарели
+    clear_compressed_caches()
+    get_popularity_tracker().reset(repository)
+    _rebuild_memory_indexes(ctx, repository, 0.5)
+    return {"files": restored, "books": repository.count()}
+
+
+def find_duplicates_job(ctx: JobContext):
+    """Группы почти одинаковых книг (MinHash/LSH по названию и автору)"""
+    from app.crud.dedup import MinHasher, find_duplicates
+
+    threshold = float(ctx.params.get("threshold", settings.DEDUP_THRESHOLD))
+    groups = find_duplicates(
+        get_book_repository(), MinHasher(), threshold, progress=ctx.progress
+    )
+    return {
+        "threshold": threshold,
+        "group_count": len(groups),
+        "groups": groups[: settings.DEDUP_MAX_GROUPS],
+    }
+
+
+def storage_report_job(ctx: JobContext):
+    """Экономия от сжатых описаний: байты на диске и страницы скана books"""
+    factories = get_book_repository().connection_factories()
+    if not factories:
+        raise ValueError("Отчет доступен только для баз SQLite")
+    reports = {}
+    for k, factory in enumerate(factories):
+        ctx.progress(k / len(factories), f"База {k + 1} из {len(factories)}")
+        conn = factory.connect()
+        try:
+            reports[factory.path or ":memory:"] = storage_report(conn)
+        finally:
+            conn.close()
+    return {"databases": reports}
+
+
+def register_default_jobs(manager: JobManager):
+    """Встроенные типы задач"""
+    manager.register("vacuum", vacuum_job)
+    manager.register("rebuild_indexes", rebuild_indexes_job)
+    manager.register("export", export_job)
+    manager.register("import", import_job)
+    manager.register("recompute_stats", recompute_stats_job)
+    manager.register("backup", backup_job)
+    manager.register("restore", restore_job)
+    manager.register("find_duplicates", find_duplicates_job)
+    manager.register("storage_report", storage_report_job)
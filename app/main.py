@@ -1,15 +1,36 @@
-import sqlite3
+import asyncio
+import logging
+import time
 from datetime import datetime
 
-import uvicorn
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.api.v1.endpoints import books
+from app.api.v1.endpoints import authors, books, jobs
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.startup import Warmup, warm_queries, warm_storage_pages
+from app.crud.books import get_book_repository
+from app.crud.isbn import get_isbn_filter
+from app.crud.popularity import get_popularity_tracker
+from app.crud.suggest import get_suggest_index
+from app.db.maintenance import create_maintenance_scheduler
+from app.jobs.manager import (
+    JobManager,
+    create_job_store,
+    get_job_manager,
+    set_job_manager,
+)
+from app.jobs.tasks import register_default_jobs
 from app.schemas.response import ErrorCodes, ErrorResponse
 
+logger = logging.getLogger(__name__)
+
 # Создаем приложение
 app = FastAPI(
     title="Smart Library API",
@@ -28,7 +49,33 @@ app = FastAPI(
     },
 )
 
-# Настройка CORS
+# Сжатие ответов (gzip/zstd) с кэшем сжатых тел
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    cache_bytes=settings.COMPRESSION_CACHE_BYTES,
+    # Ответы каталога зависят только от книг; популярное (просмотры),
+    # дубликаты (результат задачи) и лента изменений - нет
+    version=lambda: get_book_repository().data_version(),
+    version_ttl=settings.COMPRESSION_VERSION_TTL,
+    cache_paths=("/api/v1/books", "/api/v1/authors"),
+    cache_exclude=(
+        "/api/v1/books/popular",
+        "/api/v1/books/duplicates",
+        "/api/v1/books/changes",
+    ),
+)
+
+# Admission control снаружи сжатия: лишние запросы получают 429/503 до
+# сжатия и до эндпоинта
+app.state.admission = AdmissionController.from_settings(settings)
+app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+
+# Настройка CORS (снаружи admission control, чтобы заголовки CORS были и у
+# отказов 429/503). Еще снаружи - только add_security_headers
+# (зарегистрирован ниже)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # В продакшене указать конкретные домены
@@ -40,37 +87,64 @@ app.add_middleware(
 
 
 # Инициализация базы данных
-def init_db():
-    """Инициализация базы данных"""
-    conn = sqlite3.connect("library.db")
-    cursor = conn.cursor()
-
-    # Создаем таблицу книг
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT UNIQUE,
-            year INTEGER CHECK(year >= 1000 AND year <= 2100),
-            description TEXT,
-            is_available BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """
-    )
-
-    # Создаем индексы для производительности
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_author ON books(author)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_books_year ON books(year)")
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_books_available ON books(is_available)"
-    )
-
-    conn.commit()
-    conn.close()
+def init_db() -> bool:
+    """Инициализация базы данных (DDL - только если схема устарела)"""
+    return get_book_repository().init_schema()
+
+
+def build_duplicate_index():
+    if not settings.DEDUP_CHECK_ON_INSERT:
+        return None
+    # NumPy импортируется здесь, а не при импорте приложения
+    from app.crud.dedup import get_duplicate_index
+
+    duplicates = get_duplicate_index()
+    if duplicates is None:
+        return None
+    duplicates.build(get_book_repository())
+    return {"books": len(duplicates)}
+
+
+def open_similar_index():
+    # NumPy и SciPy импортируются здесь, а не при импорте приложения
+    from app.crud.similar import get_similar_index
+
+    similar = get_similar_index()
+    if similar is None:
+        return None
+    similar.open(get_book_repository())
+    return {"books": len(similar)}
+
+
+def merge_similar_index():
+    """Слияние дельты индекса похожих книг (задача обслуживания, в потоке)"""
+    from app.crud.similar import get_similar_index
+
+    similar = get_similar_index()
+    return similar.merge_if_needed() if similar is not None else None
+
+
+def warmup_stages():
+    """Этапы прогрева: индексы в памяти, затем страницы и горячие запросы"""
+    repository = get_book_repository()
+    stages = [
+        ("suggest_index", lambda: get_suggest_index().build(repository)),
+        ("isbn_filter", lambda: get_isbn_filter().ensure_built(repository)),
+        ("duplicate_index", build_duplicate_index),
+        ("similar_index", open_similar_index),
+    ]
+    if settings.WARMUP_ENABLED:
+        stages += [
+            (
+                "pages",
+                lambda: warm_storage_pages(repository, settings.WARMUP_MAX_SECONDS),
+            ),
+            (
+                "queries",
+                lambda: warm_queries(repository, settings.DEFAULT_PAGE_SIZE),
+            ),
+        ]
+    return stages
 
 
 # Глобальные обработчики ошибок
@@ -83,23 +157,50 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             success=False,
             error="Ошибка валидации данных",
             code=ErrorCodes.VALIDATION_ERROR,
-            details={"errors": exc.errors()},
+            # В ctx ошибок model_validator лежит само исключение
+            details={"errors": jsonable_encoder(exc.errors())},
         ).dict(),
         media_type="application/json; charset=utf-8",
     )
 
 
+# Коды ошибок для HTTP статусов
+HTTP_ERROR_CODES = {
+    400: ErrorCodes.VALIDATION_ERROR,
+    401: ErrorCodes.UNAUTHORIZED,
+    403: ErrorCodes.FORBIDDEN,
+    404: ErrorCodes.NOT_FOUND,
+    409: ErrorCodes.CONFLICT,
+    422: ErrorCodes.VALIDATION_ERROR,
+    429: ErrorCodes.RATE_LIMITED,
+    503: ErrorCodes.OVERLOADED,
+}
+
+
 @app.exception_handler(HTTPException)
 async def not_found_exception_handler(request: Request, exc):
-    """Обработчик 404 ошибок"""
+    """Обработчик HTTP ошибок (404, 409 и т.д.)"""
+    if exc.status_code == 404:
+        return JSONResponse(
+            status_code=404,
+            content=ErrorResponse(
+                success=False,
+                error="Ресурс не найден",
+                code=ErrorCodes.NOT_FOUND,
+                details={"path": request.url.path},
+            ).dict(),
+            media_type="application/json; charset=utf-8",
+        )
+
     return JSONResponse(
-        status_code=404,
+        status_code=exc.status_code,
         content=ErrorResponse(
             success=False,
-            error="Ресурс не найден",
-            code=ErrorCodes.NOT_FOUND,
+            error=str(exc.detail),
+            code=HTTP_ERROR_CODES.get(exc.status_code, ErrorCodes.INTERNAL_ERROR),
             details={"path": request.url.path},
         ).dict(),
+        headers=getattr(exc, "headers", None),
         media_type="application/json; charset=utf-8",
     )
 
@@ -121,6 +222,8 @@ async def generic_exception_handler(request: Request, exc: Exception):
 
 # Подключаем роутеры API v1
 app.include_router(books.router, prefix="/api/v1/books", tags=["books"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(authors.router, prefix="/api/v1/authors", tags=["authors"])
 
 
 # Системные endpoints
@@ -135,7 +238,10 @@ async def root():
         "endpoints": {
             "documentation": "/docs",
             "api_v1_books": "/api/v1/books",
+            "api_v1_jobs": "/api/v1/jobs",
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
         },
     }
     # Используем JSONResponse с правильной кодировкой
@@ -143,29 +249,11 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Проверка здоровья приложения и базы данных"""
     try:
-        conn = sqlite3.connect("library.db")
-        cursor = conn.cursor()
-
-        # Проверяем что таблица существует
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='books'"
-        )
-        table_exists = cursor.fetchone()
-
-        if table_exists:
-            # Получаем количество книг
-            cursor.execute("SELECT COUNT(*) FROM books")
-            result = cursor.fetchone()  # Это кортеж, например (5,)
-            book_count = result[0]
-            db_status = "healthy"
-        else:
-            book_count = 0
-            db_status = "healthy (no books table yet)"
-
-        conn.close()
+        book_count = get_book_repository().count()
+        db_status = "healthy"
 
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
@@ -182,6 +270,45 @@ async def health_check():
     return JSONResponse(content=content, media_type="application/json; charset=utf-8")
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: 503, пока идет прогрев после старта"""
+    warmup = getattr(app.state, "warmup", None)
+    ready = warmup is not None and warmup.ready
+    content = {
+        "success": ready,
+        "status": "ready" if ready else "warming_up",
+        "warmup": warmup.stats() if warmup else None,
+        "timestamp": datetime.now().isoformat(),
+    }
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content=content,
+        media_type="application/json; charset=utf-8",
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Служебные метрики: обслуживание базы, admission control и старт"""
+    scheduler = getattr(app.state, "maintenance", None)
+    warmup = getattr(app.state, "warmup", None)
+    content = {
+        "success": True,
+        "data": {
+            "maintenance": scheduler.stats() if scheduler else {},
+            "admission": app.state.admission.stats(),
+            "startup": {
+                "duration_ms": getattr(app.state, "startup_ms", None),
+                "schema_changed": getattr(app.state, "schema_changed", None),
+                "warmup": warmup.stats() if warmup else None,
+            },
+        },
+        "timestamp": datetime.now().isoformat(),
+    }
+    return JSONResponse(content=content, media_type="application/json; charset=utf-8")
+
+
 # Middleware для добавления заголовков и обработки кодировки
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
@@ -209,17 +336,70 @@ async def add_security_headers(request: Request, call_next):
 @app.on_event("startup")
 async def startup_event():
     """Действия при запуске приложения"""
-    init_db()
-    print("=" * 60)
-    print("🚀 Smart Library API запущен!")
-    print("📚 Версия API: 1.0")
-    print("📍 Адрес: http://localhost:8000")
-    print("📖 Документация: http://localhost:8000/docs")
-    print("🔧 OpenAPI спецификация: http://localhost:8000/api/v1/openapi.json")
-    print("=" * 60)
+    started = time.perf_counter()
+    # Эндпоинты с SQLite работают в пуле потоков: он не меньше суммы слотов
+    # admission control, чтобы параллелизм ограничивали лимиты классов
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, app.state.admission.capacity())
+    app.state.schema_changed = init_db()
+    popularity = get_popularity_tracker()
+    popularity.load(get_book_repository())
+    app.state.maintenance = create_maintenance_scheduler(
+        get_book_repository(), settings
+    )
+    app.state.maintenance.add(
+        "flush_views",
+        settings.POPULARITY_FLUSH_INTERVAL,
+        lambda: popularity.flush(get_book_repository()),
+    )
+    app.state.maintenance.add(
+        "similar_merge", settings.SIMILAR_MERGE_INTERVAL, merge_similar_index
+    )
+    app.state.maintenance.start()
+
+    job_manager = JobManager(
+        create_job_store(settings.JOBS_DATABASE_URL),
+        workers=settings.JOBS_WORKERS,
+        queue_size=settings.JOBS_QUEUE_SIZE,
+    )
+    register_default_jobs(job_manager)
+    job_manager.start()
+    set_job_manager(job_manager)
+
+    app.state.warmup = Warmup(warmup_stages())
+    if settings.WARMUP_BACKGROUND:
+        # Порт открывается сразу (/health отвечает), /ready - после прогрева.
+        # Построение индексов держит их блокировки, но эндпоинты, которые их
+        # ждут, работают в пуле потоков, а не в цикле событий
+        asyncio.get_running_loop().run_in_executor(None, app.state.warmup.run)
+    else:
+        app.state.warmup.run()
+    app.state.startup_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    logger.info(
+        "Smart Library API %s запущен: документация /docs, OpenAPI "
+        "/api/v1/openapi.json; старт %.0f мс, схема %s",
+        app.version,
+        app.state.startup_ms,
+        "обновлена" if app.state.schema_changed else "актуальна",
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Действия при остановке приложения"""
+    await app.state.maintenance.stop()
+    # Последний сброс, чтобы не терять просмотры при штатной остановке
+    get_popularity_tracker().flush(get_book_repository())
+    job_manager = get_job_manager()
+    if job_manager is not None:
+        job_manager.stop()
+        set_job_manager(None)
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "app.main:app", host="0.0.0.0", port=8000, reload=True, log_level="info"
     )
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+from app.schemas.response import PaginationInfo
+
+
+class AuthorResponse(BaseModel):
+    name: str
+    book_count: int
+
+
+class AuthorListResponse(BaseModel):
+    success: bool = True
+    data: List[AuthorResponse]
+    pagination: PaginationInfo
+    timestamp: datetime
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 # from app.schemas.response import PaginationInfo
 
@@ -28,6 +28,69 @@ class BookUpdate(BaseModel):
     is_available: Optional[bool] = None
 
 
+class BookFilter(BaseModel):
+    """Набор фильтров для списка книг"""
+
+    author: Optional[str] = None
+    title: Optional[str] = None
+    year: Optional[int] = Field(None, ge=1000, le=2100)
+    year_from: Optional[int] = Field(None, ge=1000, le=2100)
+    year_to: Optional[int] = Field(None, ge=1000, le=2100)
+    updated_since: Optional[datetime] = None
+    search: Optional[str] = None
+    available_only: bool = False
+
+
+class AvailabilityBatch(BaseModel):
+    """Пакетная выдача/возврат книг"""
+
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+    atomic: bool = Field(
+        default=False, description="Применить только если прошли все ID"
+    )
+
+
+class BulkSelection(BaseModel):
+    """Книги пакетной операции: список ID или фильтры списка книг"""
+
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    filters: Optional[BookFilter] = None
+    dry_run: bool = Field(
+        default=False, description="Только посчитать книги, ничего не меняя"
+    )
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.ids is None) == (self.filters is None):
+            raise ValueError("Нужен ровно один из ids и filters")
+        if self.filters is not None and not self.filters.model_dump(
+            exclude_defaults=True
+        ):
+            raise ValueError("Пустые filters выбрали бы весь каталог")
+        return self
+
+
+class BulkUpdate(BulkSelection):
+    """Пакетное изменение: одни и те же поля у всех выбранных книг"""
+
+    fields: BookUpdate
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        fields = self.fields.model_dump(exclude_none=True)
+        if not fields:
+            raise ValueError("Нужно хотя бы одно поле для изменения")
+        if "isbn" in fields:
+            raise ValueError("ISBN уникален и не меняется пакетно")
+        return self
+
+
+class IsbnBatch(BaseModel):
+    """Пакетный поиск книг по ISBN"""
+
+    isbns: List[str] = Field(..., min_length=1, max_length=1000)
+
+
 class BookResponse(BookBase):
     id: int
     created_at: datetime
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+
+class JobCreate(BaseModel):
+    type: str = Field(..., min_length=1, max_length=64)
+    params: dict = Field(default_factory=dict)
+    priority: int = Field(default=5, ge=0, le=9, description="0 - самый срочный")
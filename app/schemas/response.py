@@ -12,6 +12,8 @@ class ErrorCodes(str, Enum):
     UNAUTHORIZED = "UNAUTHORIZED"
     FORBIDDEN = "FORBIDDEN"
     CONFLICT = "CONFLICT"
+    RATE_LIMITED = "RATE_LIMITED"
+    OVERLOADED = "OVERLOADED"
 
 
 class ErrorResponse(BaseModel):
@@ -32,6 +34,20 @@ class PaginationInfo(BaseModel):
     prev_page: Optional[int] = None
 
 
+def pagination(total: int, skip: int, limit: int) -> dict:
+    """Поля PaginationInfo для страницы skip/limit из total записей"""
+    return {
+        "total": total,
+        "page": (skip // limit) + 1 if limit > 0 else 1,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit if limit > 0 else 1,
+        "has_next": skip + limit < total,
+        "has_prev": skip > 0,
+        "next_page": skip + limit if skip + limit < total else None,
+        "prev_page": skip - limit if skip > 0 else None,
+    }
+
+
 class BookListResponse(BaseModel):
     success: bool = True
     data: List[Any]
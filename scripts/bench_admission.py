@@ -0,0 +1,99 @@
+"""Нагрузочный тест admission control: ответы, задержки и счетчики /metrics
+
+Запуск (сервис уже запущен):
+python scripts/bench_admission.py [--url http://localhost:8000] [--clients 64]
+    [--seconds 10] [--writes 0.1] [--searches 0.3]
+
+Клиенты в цикле шлют смесь чтений, поисковых запросов и записей. В конце
+печатаются коды ответов, перцентили задержки по классам и счетчики
+admission control из /metrics - по ним подбираются ADMISSION_*_LIMIT,
+ADMISSION_QUEUE_TIMEOUT и RATE_LIMIT_*. Все клиенты идут с одного адреса,
+поэтому для проверки слотов лимит частоты стоит отключить
+(RATE_LIMIT_PER_SECOND=0) или передать --forwarded при
+ADMISSION_TRUST_FORWARDED=True.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+
+import httpx
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return "нет данных"
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]  # noqa: E731
+    return f"n={len(samples)} p50={p(0.5):.1f}ms p99={p(0.99):.1f}ms"
+
+
+async def client_loop(http, number, args, deadline, latencies, statuses):
+    headers = {"X-Forwarded-For": f"10.0.0.{number}"} if args.forwarded else {}
+    while time.monotonic() < deadline:
+        roll = random.random()
+        if roll < args.writes:
+            kind = "write"
+            request = http.post(
+                "/api/v1/books/",
+                json={
+                    "title": f"Bench {random.random()}",
+                    "author": "Bench",
+                    "year": 2000,
+                },
+                headers=headers,
+            )
+        elif roll < args.writes + args.searches:
+            kind = "search"
+            request = http.get(
+                "/api/v1/books/",
+                params={"search": random.choice("абвгдежз"), "limit": 20},
+                headers=headers,
+            )
+        else:
+            kind = "read"
+            request = http.get("/api/v1/books/", params={"limit": 20}, headers=headers)
+
+        started = time.perf_counter()
+        response = await request
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] += 1
+        if response.status_code in (429, 503):
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def run(args):
+    latencies = collections.defaultdict(list)
+    statuses = collections.Counter()
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as http:
+        deadline = time.monotonic() + args.seconds
+        await asyncio.gather(
+            *(
+                client_loop(http, i, args, deadline, latencies, statuses)
+                for i in range(args.clients)
+            )
+        )
+        metrics = (await http.get("/metrics")).json()["data"]["admission"]
+
+    print(f"Ответы: {dict(sorted(statuses.items()))}")
+    for kind, samples in sorted(latencies.items()):
+        print(f"{kind:7} {percentiles(samples)}")
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writes", type=float, default=0.1)
+    parser.add_argument("--searches", type=float, default=0.3)
+    parser.add_argument("--forwarded", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Бенчмарк онлайн-бэкапа: скорость копирования и задержка живых запросов
+
+Запуск: python scripts/bench_backup.py [--books 50000] [--pages 256] [--pause 0.01]
+
+Во время бэкапа поток-читатель непрерывно выполняет get_book и
+list_books; сравниваются перцентили задержки без бэкапа и во время него.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crud.books import create_repository  # noqa: E402
+from app.db.backup import backup_database  # noqa: E402
+from app.schemas.book import BookFilter  # noqa: E402
+
+
+def fill(repo, count):
+    for i in range(count):
+        repo.create_book(
+            {
+                "title": f"Book {i}",
+                "author": f"Author {i % 1000}",
+                "isbn": None,
+                "year": 1900 + i % 120,
+                "description": "Описание книги " * 40,
+                "is_available": True,
+            }
+        )
+
+
+def measure_reads(repo, max_id, stop: threading.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        repo.get_book(random.randint(1, max_id))
+        repo.list_books(BookFilter(), 0, 20)
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return "нет данных"
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]  # noqa: E731
+    return (
+        f"n={len(samples)} p50={p(0.5):.3f}ms p99={p(0.99):.3f}ms "
+        f"max={samples[-1]:.3f}ms mean={statistics.mean(samples):.3f}ms"
+    )
+
+
+def run_phase(repo, max_id, seconds=None, action=None):
+    stop = threading.Event()
+    samples = []
+    reader = threading.Thread(target=measure_reads, args=(repo, max_id, stop, samples))
+    reader.start()
+    result = None
+    try:
+        if action is None:
+            time.sleep(seconds)
+        else:
+            result = action()
+    finally:
+        stop.set()
+        reader.join()
+    return samples, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--pages", type=int, default=256)
+    parser.add_argument("--pause", type=float, default=0.01)
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = create_repository(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        repo.init_schema()
+        print(f"Заполнение: {args.books} книг...")
+        fill(repo, args.books)
+
+        baseline, _ = run_phase(repo, args.books, seconds=2.0)
+        print(f"Без бэкапа:   {percentiles(baseline)}")
+
+        dest = os.path.join(tmp, "snap.db.gz" if args.compress else "snap.db")
+        during, result = run_phase(
+            repo,
+            args.books,
+            action=lambda: backup_database(
+                repo.factory, dest, args.pages, args.pause, args.compress
+            ),
+        )
+        print(f"Во время:     {percentiles(during)}")
+
+        mb = result["bytes"] / 1024 / 1024
+        seconds = result["duration_ms"] / 1000
+        print(
+            f"Бэкап: {mb:.1f} MiB за {seconds:.2f} s ({mb / seconds:.1f} MiB/s), "
+            f"шагов {result['steps']}, на диске {result['stored_bytes'] / 1024:.0f} KiB"
+        )
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Бенчмарк старта: время до готовности и задержка первых запросов
+
+Запуск: python scripts/bench_startup.py [--books 20000] [--requests 20] [--runs 1]
+    [--background]
+
+Сервис запускается через uvicorn на временной базе дважды: без прогрева
+(WARMUP_ENABLED=False) и с ним. Перед каждым запуском файл базы
+вытесняется из кэша ОС (posix_fadvise), как после перезагрузки машины.
+Печатаются время до открытия порта (/health) и до готовности (/ready),
+а также первая и медианная задержка горячих запросов. С --background
+прогрев идет в фоне (WARMUP_BACKGROUND=True): порт открывается раньше,
+/ready - после прогрева.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.crud.books import create_repository  # noqa: E402
+
+HOT_REQUESTS = [
+    ("list", "/api/v1/books/?limit=20"),
+    ("list_title", "/api/v1/books/?limit=20&sort=title"),
+    ("filter", "/api/v1/books/?limit=20&year_from=1950&year_to=1960"),
+    ("authors", "/api/v1/authors/?limit=20"),
+    ("book", "/api/v1/books/1"),
+]
+
+
+def fill(path, count):
+    repo = create_repository(f"sqlite:///{path}")
+    repo.init_schema()
+    for i in range(count):
+        repo.create_book(
+            {
+                "title": f"Book {i}",
+                "author": f"Author {i % 1000}",
+                "isbn": None,
+                "year": 1900 + i % 120,
+                "description": "Описание книги " * 40,
+                "is_available": True,
+            }
+        )
+    repo.close()
+
+
+def evict(path):
+    """Вытеснение файлов базы из кэша страниц ОС"""
+    for name in (path, path + "-wal"):
+        if not os.path.exists(name):
+            continue
+        fd = os.open(name, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def wait_for(http, path, started, timeout=60):
+    while time.perf_counter() - started < timeout:
+        try:
+            if http.get(path).status_code == 200:
+                return (time.perf_counter() - started) * 1000
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} не ответил за {timeout} с")
+
+
+def measure(workdir, db_path, port, warmup, background, requests):
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        JOBS_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'jobs.db')}",
+        SIMILAR_INDEX_DIR=os.path.join(workdir, "similar"),
+        WARMUP_ENABLED=str(warmup),
+        WARMUP_BACKGROUND=str(background),
+        RATE_LIMIT_PER_SECOND="0",
+    )
+    evict(db_path)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as http:
+            health_ms = wait_for(http, "/health", started)
+            ready_ms = wait_for(http, "/ready", started)
+            latencies = {}
+            for name, path in HOT_REQUESTS:
+                samples = []
+                for _ in range(requests):
+                    request_started = time.perf_counter()
+                    http.get(path).raise_for_status()
+                    samples.append((time.perf_counter() - request_started) * 1000)
+                latencies[name] = (samples[0], statistics.median(samples[1:]))
+            startup = http.get("/metrics").json()["data"]["startup"]
+    finally:
+        server.terminate()
+        server.wait()
+    return health_ms, ready_ms, latencies, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--background", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        fill(db_path, args.books)
+        print(f"База: {args.books} книг, {os.path.getsize(db_path) // 1024} КиБ")
+
+        for warmup in (False, True) * args.runs:
+            health_ms, ready_ms, latencies, startup = measure(
+                workdir, db_path, args.port, warmup, args.background, args.requests
+            )
+            print(f"\nWARMUP_ENABLED={warmup}")
+            print(
+                f"  порт открыт: {health_ms:.0f} мс, готов: {ready_ms:.0f} мс, "
+                f"startup {startup['duration_ms']:.0f} мс, "
+                f"DDL: {startup['schema_changed']}"
+            )
+            for name, stage in startup["warmup"]["stages"].items():
+                print(f"  этап {name:15} {stage['duration_ms']:7.0f} мс")
+            for name, (first, median) in latencies.items():
+                print(f"  {name:11} первый {first:7.2f} мс, медиана {median:6.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,23 @@ import sqlite3
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.config import settings
+from app.crud.books import create_repository
 from app.main import app
 
 
+@pytest.fixture(scope="session", autouse=True)
+def data_dirs(tmp_path_factory):
+    """Файлы приложения (задачи, индекс, выгрузки, копии) - во временном каталоге"""
+    root = tmp_path_factory.mktemp("app-data")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "JOBS_DATABASE_URL", f"sqlite:///{root / 'jobs.db'}")
+        mp.setattr(settings, "SIMILAR_INDEX_DIR", str(root / "similar"))
+        mp.setattr(settings, "EXPORT_DIR", str(root / "exports"))
+        mp.setattr(settings, "BACKUP_DIR", str(root / "backups"))
+        yield root
+
+
 @pytest.fixture(scope="session")
 def test_db():
     """Создаем тестовую базу данных"""
@@ -100,3 +114,19 @@ def sample_book_data():
         "description": "Sample description",
         "is_available": True,
     }
+
+
+@pytest.fixture(params=["file", "sqlite-memory", "memory", "sharded"])
+def repository(request, tmp_path):
+    """Пустое хранилище каждого типа"""
+    urls = {
+        "file": f"sqlite:///{tmp_path / 'repo.db'}",
+        "sqlite-memory": "sqlite:///:memory:",
+        "memory": "memory://",
+        "sharded": f"sqlite:///{tmp_path / 'repo.db'}",
+    }
+    shards = 3 if request.param == "sharded" else 1
+    repo = create_repository(urls[request.param], shards=shards)
+    repo.init_schema()
+    yield repo
+    repo.close()
@@ -0,0 +1,151 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import (
+    READ,
+    SEARCH,
+    WRITE,
+    AdmissionController,
+    AdmissionMiddleware,
+    ConcurrencyLimit,
+    TokenBuckets,
+    classify,
+)
+
+
+def make_client(limits=None, rate=0, burst=1, clock=None):
+    """Мини-приложение с admission control"""
+    app = FastAPI()
+    controller = AdmissionController(
+        limits or {READ: 10, SEARCH: 10, WRITE: 10},
+        rate,
+        burst,
+        queue_timeout=0.05,
+        max_queue=1,
+        clock=clock or (lambda: 0.0),
+    )
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @app.get("/api/v1/books/")
+    async def books():
+        return {"success": True}
+
+    @app.post("/api/v1/books/")
+    async def create():
+        return {"success": True}
+
+    @app.get("/health")
+    async def health():
+        return {"success": True}
+
+    return TestClient(app), controller
+
+
+def test_classify():
+    """Тест классов запросов"""
+    assert classify("GET", "/api/v1/books/", b"skip=10&year=2000") == READ
+    assert classify("GET", "/api/v1/books/", b"search=war") == SEARCH
+    assert classify("GET", "/api/v1/books/", b"title=") == READ
+    assert classify("GET", "/api/v1/books/5/similar", b"") == SEARCH
+    assert classify("POST", "/api/v1/books/by-isbn", b"") == READ
+    assert classify("PATCH", "/api/v1/books/bulk", b"") == WRITE
+    assert classify("GET", "/api/v1/books/changes", b"wait=30") is None
+
+
+def test_token_buckets():
+    """Тест token bucket: всплеск burst, затем rate в секунду"""
+    now = [0.0]
+    buckets = TokenBuckets(rate=2, burst=3, max_clients=2, clock=lambda: now[0])
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a") == 0.5
+    now[0] = 0.5
+    assert buckets.take("a") == 0
+    assert buckets.take("b") == 0
+
+    # Вытесняется давно не приходивший клиент
+    buckets.take("c")
+    assert len(buckets) == 2
+    assert buckets.take("a") == 0
+
+
+def test_concurrency_limit():
+    """Слот передается ждущему по очереди, лишние получают отказ"""
+
+    async def scenario():
+        limit = ConcurrencyLimit(limit=1, max_queue=1)
+        assert await limit.acquire(1)
+        waiting = asyncio.ensure_future(limit.acquire(1))
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        assert not await limit.acquire(1)  # очередь заполнена
+        limit.release()
+        assert await waiting
+        assert limit.active == 1
+
+        assert not await limit.acquire(0.01)  # бюджет ожидания истек
+        assert limit.queued == 0
+        limit.release()
+        assert limit.active == 0
+        return limit.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["admitted"], stats["shed"], stats["max_queued"]) == (2, 2, 1)
+
+
+def test_rate_limit_response():
+    """429 с Retry-After сверх лимита частоты, остальные пути не ограничены"""
+    client, controller = make_client(rate=1, burst=2)
+    assert client.get("/api/v1/books/").status_code == 200
+    assert client.post("/api/v1/books/").status_code == 200
+
+    response = client.get("/api/v1/books/")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["code"] == "RATE_LIMITED"
+    assert client.get("/health").status_code == 200
+    assert controller.stats()["rate_limited"] == 1
+
+
+def test_load_shedding_response():
+    """503 с Retry-After, когда слот класса не освобождается вовремя"""
+    client, controller = make_client(limits={READ: 1, SEARCH: 1, WRITE: 0})
+    response = client.post("/api/v1/books/")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["code"] == "OVERLOADED"
+    assert client.get("/api/v1/books/").status_code == 200
+
+    stats = controller.stats()["classes"]
+    assert (stats[WRITE]["shed"], stats[READ]["admitted"]) == (1, 1)
+    assert stats[READ]["active"] == 0
+
+
+def test_metrics_include_admission(test_client):
+    """Счетчики admission control доступны через /metrics"""
+    test_client.get("/api/v1/books/?search=test")
+    admission = test_client.get("/metrics").json()["data"]["admission"]
+    assert admission["classes"][SEARCH]["admitted"] >= 1
+    assert set(admission["classes"]) == {READ, SEARCH, WRITE}
+
+
+def test_rejections_have_cors_headers(test_client, monkeypatch):
+    """CORS снаружи admission control: браузер видит 429/503"""
+    monkeypatch.setattr(test_client.app.state.admission, "check_rate", lambda s: 1.0)
+    response = test_client.get(
+        "/api/v1/books/", headers={"Origin": "https://example.com"}
+    )
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "*"
+
+
+def test_database_endpoints_run_in_threadpool(test_client):
+    """Эндпоинты с SQLite - обычные def: слот admission = поток с запросом"""
+    coroutines = [
+        route.path
+        for route in test_client.app.routes
+        if route.path.startswith(("/api/v1/books", "/api/v1/authors", "/api/v1/jobs"))
+        and asyncio.iscoroutinefunction(getattr(route, "endpoint", None))
+    ]
+    assert coroutines == ["/api/v1/books/changes"]
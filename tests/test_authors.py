@@ -0,0 +1,153 @@
+import sqlite3
+
+import pytest
+
+from app.crud.books import create_repository
+from app.db.session import ConnectionFactory, init_schema
+from app.schemas.book import BookFilter
+
+BOOKS = [
+    ("Война и мир", "Лев Толстой"),
+    ("Анна Каренина", "Лев Толстой"),
+    ("Детство", "Лев Толстой"),
+    ("Бесы", "Фёдор Достоевский"),
+    ("Идиот", "Фёдор Достоевский"),
+    ("Мастер и Маргарита", "Михаил Булгаков"),
+    ("Хаджи-Мурат", "лев толстой"),
+]
+
+
+@pytest.fixture
+def repository(repository):
+    """Хранилище каждого типа с книгами BOOKS"""
+    for title, author in BOOKS:
+        repository.create_book(
+            {"title": title, "author": author, "isbn": None, "year": 1900}
+        )
+    return repository
+
+
+def test_list_authors(repository):
+    """Авторы по алфавиту с числом книг, поиск по началу имени"""
+    authors, total = repository.list_authors(None, 0, 10)
+    assert total == 4
+    assert authors == [
+        {"name": "Лев Толстой", "book_count": 3},
+        {"name": "лев толстой", "book_count": 1},
+        {"name": "Михаил Булгаков", "book_count": 1},
+        {"name": "Фёдор Достоевский", "book_count": 2},
+    ]
+
+    # Без учета регистра и диакритики
+    authors, total = repository.list_authors("федор", 0, 10)
+    assert (authors, total) == ([{"name": "Фёдор Достоевский", "book_count": 2}], 1)
+    authors, total = repository.list_authors("ЛЕВ ", 1, 1)
+    assert (authors, total) == ([{"name": "лев толстой", "book_count": 1}], 2)
+    assert repository.list_authors("лев т", 0, 10)[1] == 2
+    assert repository.list_authors("толстой", 0, 10)[1] == 0
+
+
+def test_author_counts_follow_books(repository):
+    """Счетчики меняются вместе с книгами, автор без книг исчезает"""
+    books, _ = repository.list_books(BookFilter(author="булгаков"), 0, 10)
+    assert [b["title"] for b in books] == ["Мастер и Маргарита"]
+
+    updated = repository.update_book(books[0]["id"], {"author": "Лев Толстой"})
+    assert updated["author"] == "Лев Толстой"
+    assert repository.list_authors("михаил", 0, 10) == ([], 0)
+    assert repository.list_authors("лев толстой", 0, 1)[0] == [
+        {"name": "Лев Толстой", "book_count": 4}
+    ]
+
+    for book in repository.list_books(BookFilter(author="Достоевский"), 0, 10)[0]:
+        repository.delete_book(book["id"])
+    assert repository.list_authors("ф", 0, 10) == ([], 0)
+
+    books, total = repository.list_books(BookFilter(search="толстой"), 0, 10)
+    assert total == 5
+    assert {b["author"] for b in books} == {"Лев Толстой", "лев толстой"}
+
+
+def test_migration_from_author_column(tmp_path):
+    """База со старой схемой (books.author TEXT) переносится в authors"""
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE,
+            year INTEGER CHECK(year >= 1000 AND year <= 2100),
+            description TEXT,
+            is_available BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    conn.execute("CREATE INDEX idx_books_author ON books(author)")
+    conn.executemany(
+        "INSERT INTO books (title, author, isbn, year) VALUES (?, ?, ?, ?)",
+        [(title, author, None, 1900) for title, author in BOOKS]
+        + [("Удаленная", "Никто", None, 1900)],
+    )
+    conn.execute("DELETE FROM books WHERE title = 'Удаленная'")
+    conn.commit()
+    conn.close()
+
+    factory = ConnectionFactory(path)
+    conn = factory.connect()
+    try:
+        init_schema(conn, "WAL")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(books)")]
+        assert "author" not in columns and "author_id" in columns
+        assert conn.execute("SELECT COUNT(*) FROM book_changes").fetchone()[0] == 0
+        init_schema(conn)  # повторный запуск ничего не меняет
+    finally:
+        conn.close()
+
+    repo = create_repository(f"sqlite:///{path}")
+    repo.init_schema()
+    assert repo.get_book(1)["author"] == "Лев Толстой"
+    assert repo.list_authors(None, 0, 10)[1] == 4
+    # Счетчик AUTOINCREMENT сохранен: ID удаленной книги не выдается снова
+    book = repo.create_book({"title": "Новая", "author": "Никто", "year": 2000})
+    assert book["id"] == len(BOOKS) + 2
+
+
+def test_authors_endpoint(test_client, sample_book_data):
+    """GET /api/v1/authors с поиском по началу имени и пагинацией"""
+    for i in range(3):
+        test_client.post(
+            "/api/v1/books/",
+            json=dict(sample_book_data, isbn=None, author="Ёжиков Автор", title=str(i)),
+        )
+
+    response = test_client.get("/api/v1/authors/?q=ежиков&limit=1")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"] == [{"name": "Ёжиков Автор", "book_count": 3}]
+    assert body["pagination"]["total"] == 1
+    assert body["pagination"]["has_next"] is False
+
+    books = test_client.get("/api/v1/books/?author=ежиков").json()["data"]
+    assert len(books) == 3
+    assert all(book["author"] == "Ёжиков Автор" for book in books)
+
+
+def test_authors_schema_and_pagination(test_client):
+    """Схема OpenAPI списка авторов и пагинация как у списка книг"""
+    schema = test_client.get("/api/v1/openapi.json").json()
+    ok = schema["paths"]["/api/v1/authors/"]["get"]["responses"]["200"]
+    ref = ok["content"]["application/json"]["schema"]["$ref"]
+    assert ref.endswith("/AuthorListResponse")
+    item = schema["components"]["schemas"]["AuthorResponse"]
+    assert set(item["properties"]) == {"name", "book_count"}
+
+    query = "?skip=1&limit=1"
+    authors = test_client.get(f"/api/v1/authors/{query}").json()["pagination"]
+    books = test_client.get(f"/api/v1/books/{query}").json()["pagination"]
+    assert authors["prev_page"] == books["prev_page"] == 0
+    assert authors["page"] == books["page"] == 2
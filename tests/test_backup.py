@@ -0,0 +1,137 @@
+import gzip
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.crud.books import create_repository
+from app.db.backup import backup_database, restore_database
+from app.schemas.book import BookFilter
+
+
+def make_book(i):
+    return {
+        "title": f"Book {i}",
+        "author": "Author",
+        "isbn": None,
+        "year": 2000,
+        "description": "x" * 1000,
+        "is_available": True,
+    }
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = create_repository(f"sqlite:///{tmp_path / 'live.db'}")
+    repo.init_schema()
+    for i in range(200):
+        repo.create_book(make_book(i))
+    yield repo
+    repo.close()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_backup_and_restore(repo, tmp_path, compress):
+    """Снимок в несколько шагов и восстановление из него"""
+    path = str(tmp_path / ("snap.db.gz" if compress else "snap.db"))
+    result = backup_database(repo.factory, path, pages=4, pause=0, compress=compress)
+    assert result["steps"] > 1
+    assert result["compressed"] == compress
+    if compress:
+        assert result["stored_bytes"] < result["bytes"]
+        with gzip.open(path) as f:
+            assert f.read(16) == b"SQLite format 3\x00"
+
+    first = repo.list_books(BookFilter(), 0, 1)[0][0]
+    repo.delete_book(first["id"])
+    repo.create_book(make_book(1000))
+    assert repo.count() == 200
+
+    restore_database(repo.factory, path)
+    assert repo.count() == 200
+    assert repo.get_book(first["id"])["title"] == first["title"]
+
+
+def test_backup_is_consistent_under_writes(repo, tmp_path):
+    """Запись во время копирования не ломает снимок"""
+    stop = threading.Event()
+
+    def writer():
+        i = 10000
+        while not stop.is_set():
+            repo.create_book(make_book(i))
+            i += 1
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        path = str(tmp_path / "snap.db")
+        backup_database(repo.factory, path, pages=2, pause=0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    snapshot = create_repository(f"sqlite:///{path}")
+    conn = snapshot.factory.connect()
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        conn.close()
+    assert 200 <= snapshot.count() <= repo.count()
+
+
+def test_backup_abort_removes_partial_file(repo, tmp_path):
+    """Исключение из progress прерывает копирование"""
+
+    def cancel(remaining, total):
+        raise RuntimeError("cancel")
+
+    path = tmp_path / "snap.db"
+    with pytest.raises(RuntimeError):
+        backup_database(repo.factory, str(path), pages=1, pause=0, progress=cancel)
+    assert list(tmp_path.glob("snap.db*")) == []
+
+
+def test_backup_job_endpoint(test_client, tmp_path, monkeypatch):
+    """Снимок через задачу backup и его скачивание"""
+    monkeypatch.setattr(settings, "BACKUP_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    admin = {"X-Admin-Token": "secret"}
+    job = {"type": "backup", "params": {"compress": True}}
+
+    assert test_client.post("/api/v1/jobs/", json=job).status_code == 403
+    response = test_client.post("/api/v1/jobs/", json=job, headers=admin)
+    assert response.status_code == 202
+    job_id = response.json()["data"]["id"]
+
+    for _ in range(200):
+        job = test_client.get(f"/api/v1/jobs/{job_id}").json()["data"]
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded", job["error"]
+
+    download = f"/api/v1/jobs/{job_id}/download"
+    assert test_client.get(download).status_code == 403
+    response = test_client.get(download, headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(response.content)[:15] == b"SQLite format 3"
+
+
+def test_restore_requires_admin_token(test_client, monkeypatch):
+    """Restore без ADMIN_TOKEN запрещен, с токеном - только с верным заголовком"""
+    job = {"type": "restore", "params": {"backup_job_id": 10**9}}
+    assert test_client.post("/api/v1/jobs/", json=job).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "wrong"}
+    response = test_client.post("/api/v1/jobs/", json=job, headers=headers)
+    assert response.status_code == 403
+    assert response.json()["code"] == "FORBIDDEN"
+
+    headers = {"X-Admin-Token": "secret"}
+    response = test_client.post("/api/v1/jobs/", json=job, headers=headers)
+    assert response.status_code == 202
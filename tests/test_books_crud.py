@@ -1,3 +1,8 @@
+import time
+
+from app.crud.isbn import canonical_isbn
+
+
 def test_create_book(test_client, sample_book_data):
     """Тест создания книги"""
     response = test_client.post("/api/v1/books/", json=sample_book_data)
@@ -64,8 +69,8 @@ def test_update_book(test_client):
     assert data["data"]["title"] == "New Title"
     assert data["data"]["author"] == "New Author"
     assert data["data"]["year"] == 2024
-    # Старые поля должны остаться
-    assert data["data"]["isbn"] == "2222222222"
+    # Старые поля должны остаться (ISBN хранится в форме ISBN-13)
+    assert data["data"]["isbn"] == canonical_isbn("2222222222")
 
 
 def test_delete_book(test_client):
@@ -174,7 +179,7 @@ def test_pagination(test_client):
         book_data = {
             "title": f"Book {i}",
             "author": f"Author {i}",
-            "isbn": f"77777777{i:02d}",
+            "isbn": f"7777777{i:02d}7",
             "year": 2000 + i,
             "description": f"Description {i}",
             "is_available": True,
@@ -207,3 +212,317 @@ def test_pagination(test_client):
 
     assert len(data["data"]) == 0
     assert data["pagination"]["has_next"] is False
+
+
+def test_checkout_and_return_book(test_client):
+    """Тест выдачи и возврата книги"""
+    book_data = {
+        "title": "Circulating Book",
+        "author": "Author",
+        "isbn": "8888888888",
+        "year": 2023,
+        "is_available": True,
+    }
+    create_response = test_client.post("/api/v1/books/", json=book_data)
+    book_id = create_response.json()["data"]["id"]
+
+    response = test_client.post(f"/api/v1/books/{book_id}/checkout")
+    assert response.status_code == 200
+    assert response.json()["data"] == {"id": book_id, "is_available": False}
+
+    # Повторная выдача - конфликт
+    response = test_client.post(f"/api/v1/books/{book_id}/checkout")
+    assert response.status_code == 409
+    assert response.json()["code"] == "CONFLICT"
+
+    response = test_client.post(f"/api/v1/books/{book_id}/return")
+    assert response.status_code == 200
+    assert response.json()["data"]["is_available"] is True
+
+    response = test_client.post(f"/api/v1/books/{book_id}/return")
+    assert response.status_code == 409
+
+    response = test_client.post("/api/v1/books/999999/checkout")
+    assert response.status_code == 404
+
+
+def test_checkout_batch(test_client):
+    """Тест пакетной выдачи книг"""
+    ids = []
+    for i in range(3):
+        book_data = {
+            "title": f"Batch Book {i}",
+            "author": "Author",
+            "isbn": f"8888888{i:02d}8",
+            "year": 2023,
+            "is_available": i != 2,
+        }
+        ids.append(
+            test_client.post("/api/v1/books/", json=book_data).json()["data"]["id"]
+        )
+
+    # Атомарный режим: одна книга уже выдана - ничего не меняется
+    response = test_client.post(
+        "/api/v1/books/checkout", json={"ids": ids, "atomic": True}
+    )
+    assert response.status_code == 409
+    assert test_client.get(f"/api/v1/books/{ids[0]}").json()["data"]["is_available"]
+
+    response = test_client.post("/api/v1/books/checkout", json={"ids": ids + [999999]})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["updated"] == ids[:2]
+    assert data["conflicts"] == [ids[2]]
+    assert data["not_found"] == [999999]
+
+    response = test_client.post("/api/v1/books/return", json={"ids": ids})
+    assert response.json()["data"]["updated"] == ids
+
+
+def test_sparse_fieldsets(test_client):
+    """Тест параметра fields и компактного списка"""
+    book_data = {
+        "title": "Sparse Book",
+        "author": "Sparse Author",
+        "isbn": "9999999909",
+        "year": 2023,
+        "description": "Long description",
+        "is_available": True,
+    }
+    book_id = test_client.post("/api/v1/books/", json=book_data).json()["data"]["id"]
+
+    # По умолчанию список компактный - без description
+    data = test_client.get("/api/v1/books/?title=Sparse").json()["data"]
+    assert data[0]["title"] == "Sparse Book"
+    assert "description" not in data[0]
+
+    data = test_client.get("/api/v1/books/?title=Sparse&view=full").json()["data"]
+    assert data[0]["description"] == "Long description"
+
+    data = test_client.get("/api/v1/books/?title=Sparse&fields=title,author").json()
+    assert data["data"][0] == {
+        "id": book_id,
+        "title": "Sparse Book",
+        "author": "Sparse Author",
+    }
+
+    response = test_client.get(f"/api/v1/books/{book_id}?fields=year")
+    assert response.json()["data"] == {"id": book_id, "year": 2023}
+
+    response = test_client.get(f"/api/v1/books/{book_id}?fields=year,password")
+    assert response.status_code == 422
+    assert response.json()["code"] == "VALIDATION_ERROR"
+
+
+def test_changes_feed(test_client):
+    """Тест ленты изменений"""
+    latest = test_client.get("/api/v1/books/changes").json()["latest_version"]
+
+    book_data = {
+        "title": "Feed Book",
+        "author": "Feed Author",
+        "isbn": "9999999919",
+        "year": 2023,
+        "is_available": True,
+    }
+    book_id = test_client.post("/api/v1/books/", json=book_data).json()["data"]["id"]
+    test_client.patch(f"/api/v1/books/{book_id}", json={"title": "Feed Book 2"})
+    test_client.delete(f"/api/v1/books/{book_id}")
+
+    response = test_client.get(f"/api/v1/books/changes?since={latest}")
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["op"] for c in data["data"]] == ["insert", "update", "delete"]
+    assert all(c["book_id"] == book_id for c in data["data"])
+    assert data["data"][2]["book"] is None
+    assert data["next_since"] == data["data"][-1]["version"]
+    assert data["truncated"] is False
+
+    # Long-poll без новых изменений возвращает пустой пакет по таймауту
+    response = test_client.get(
+        f"/api/v1/books/changes?since={data['next_since']}&wait=0.3"
+    )
+    assert response.json()["data"] == []
+
+
+def test_suggest_endpoint(test_client):
+    """Тест эндпоинта подсказок"""
+    book_data = {
+        "title": "Typeahead Compendium",
+        "author": "Zyxwv Author",
+        "isbn": "9999999929",
+        "year": 2023,
+        "is_available": True,
+    }
+    book_id = test_client.post("/api/v1/books/", json=book_data).json()["data"]["id"]
+
+    response = test_client.get("/api/v1/books/suggest?q=typea")
+    assert response.status_code == 200
+    assert response.json()["data"] == [
+        {"id": book_id, "title": "Typeahead Compendium", "author": "Zyxwv Author"}
+    ]
+
+    test_client.delete(f"/api/v1/books/{book_id}")
+    assert test_client.get("/api/v1/books/suggest?q=typea").json()["data"] == []
+
+
+def test_books_by_isbn(test_client):
+    """Тест поиска по ISBN и дедупликации ISBN-10/13"""
+    book_data = {
+        "title": "ISBN Book",
+        "author": "Author",
+        "isbn": "0306406152",
+        "year": 2023,
+        "is_available": True,
+    }
+    book_id = test_client.post("/api/v1/books/", json=book_data).json()["data"]["id"]
+
+    response = test_client.get("/api/v1/books/by-isbn/978-0-306-40615-7")
+    assert response.status_code == 200
+    assert response.json()["data"]["id"] == book_id
+
+    assert test_client.get("/api/v1/books/by-isbn/9781111111113").status_code == 404
+
+    response = test_client.post(
+        "/api/v1/books/by-isbn", json={"isbns": ["0306406152", "9781111111113"]}
+    )
+    data = response.json()["data"]
+    assert data[0]["book"]["id"] == book_id
+    assert data[1] == {"isbn": "9781111111113", "book": None}
+
+    # Тот же ISBN в форме ISBN-13 - дубликат
+    response = test_client.post(
+        "/api/v1/books/", json=dict(book_data, isbn="9780306406157")
+    )
+    assert response.status_code == 409
+
+
+def test_import_dedupes_isbn_forms(test_client):
+    """ISBN-10 и ISBN-13 одной книги в одном импорте - одна книга"""
+    books = [
+        {"title": "Import Twin", "author": "Importer", "year": 2001, "isbn": isbn}
+        for isbn in ["0131103628", "9780131103627", "0131103628"]
+    ]
+    response = test_client.post(
+        "/api/v1/jobs/", json={"type": "import", "params": {"books": books}}
+    )
+    job_id = response.json()["data"]["id"]
+    for _ in range(200):
+        job = test_client.get(f"/api/v1/jobs/{job_id}").json()["data"]
+        if job["status"] == "succeeded":
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded"
+    result = test_client.get(f"/api/v1/jobs/{job_id}/result").json()["data"]
+    assert (result["created"], result["duplicates"]) == (1, 2)
+
+    book = test_client.get("/api/v1/books/by-isbn/0131103628").json()["data"]
+    assert book["isbn"] == "9780131103627"
+
+
+def test_jobs_endpoints(test_client):
+    """Тест фоновых задач через API"""
+    response = test_client.post("/api/v1/jobs/", json={"type": "recompute_stats"})
+    assert response.status_code == 202
+    job_id = response.json()["data"]["id"]
+
+    for _ in range(200):
+        job = test_client.get(f"/api/v1/jobs/{job_id}").json()["data"]
+        if job["status"] == "succeeded":
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded"
+
+    result = test_client.get(f"/api/v1/jobs/{job_id}/result").json()
+    assert result["data"]["total"] >= 1
+
+    response = test_client.post("/api/v1/jobs/", json={"type": "unknown"})
+    assert response.status_code == 422
+
+    assert test_client.get("/api/v1/jobs/999999").status_code == 404
+
+
+def test_sorting_and_ranges(test_client):
+    """Тест сортировки и фильтров-диапазонов списка"""
+    for i, title in enumerate(["Sort C", "sort a", "Sort B"]):
+        test_client.post(
+            "/api/v1/books/",
+            json={"title": title, "author": "Sorter", "year": 1801 + i},
+        )
+
+    response = test_client.get("/api/v1/books/?author=sorter&sort=title")
+    assert [b["title"] for b in response.json()["data"]] == [
+        "sort a",
+        "Sort B",
+        "Sort C",
+    ]
+
+    response = test_client.get(
+        "/api/v1/books/?sort=year&order=desc&year_from=1801&year_to=1802"
+    )
+    data = response.json()
+    assert [b["year"] for b in data["data"]] == [1802, 1801]
+    assert data["pagination"]["total"] == 2
+
+    response = test_client.get(
+        "/api/v1/books/?author=sorter&updated_since=2999-01-01T00:00:00"
+    )
+    assert response.json()["data"] == []
+
+    assert test_client.get("/api/v1/books/?sort=description").status_code == 422
+    assert test_client.get("/api/v1/books/?order=up").status_code == 422
+
+
+def test_bulk_update_and_delete(test_client):
+    """Тест PATCH и DELETE /books/bulk"""
+    ids = [
+        test_client.post(
+            "/api/v1/books/",
+            json={"title": f"Bulk {i}", "author": "Bulker", "year": 1700 + i},
+        ).json()["data"]["id"]
+        for i in range(3)
+    ]
+
+    body = {"filters": {"author": "bulker"}, "fields": {"is_available": False}}
+    response = test_client.patch("/api/v1/books/bulk", json=dict(body, dry_run=True))
+    assert response.status_code == 200
+    assert response.json()["data"] == {"matched": 3, "updated": 0, "dry_run": True}
+
+    response = test_client.patch("/api/v1/books/bulk", json=body)
+    assert response.json()["data"]["updated"] == 3
+    response = test_client.get("/api/v1/books/?author=bulker&available_only=true")
+    assert response.json()["data"] == []
+
+    response = test_client.patch(
+        "/api/v1/books/bulk",
+        json={"ids": [ids[0], 999999], "fields": {"title": "Bulk renamed"}},
+    )
+    assert response.json()["data"] == {
+        "matched": 1,
+        "updated": 1,
+        "dry_run": False,
+        "not_found": [999999],
+    }
+    assert test_client.get(f"/api/v1/books/{ids[0]}").json()["data"]["title"] == (
+        "Bulk renamed"
+    )
+
+    response = test_client.request(
+        "DELETE", "/api/v1/books/bulk", json={"ids": ids[:2]}
+    )
+    assert response.json()["data"]["deleted"] == 2
+    assert test_client.get(f"/api/v1/books/{ids[0]}").status_code == 404
+    response = test_client.request(
+        "DELETE", "/api/v1/books/bulk", json={"filters": {"author": "bulker"}}
+    )
+    assert response.json()["data"]["deleted"] == 1
+
+    # Ровно один способ выбора, непустые фильтры и поля, без ISBN
+    for bad in [
+        {"fields": {"year": 2000}},
+        {"ids": ids, "filters": {"year": 1700}, "fields": {"year": 2000}},
+        {"filters": {}, "fields": {"year": 2000}},
+        {"ids": ids, "fields": {}},
+        {"ids": ids, "fields": {"isbn": "978-5-00000-000-0"}},
+    ]:
+        assert test_client.patch("/api/v1/books/bulk", json=bad).status_code == 422
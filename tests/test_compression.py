@@ -0,0 +1,154 @@
+import gzip
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import (
+    CompressionMiddleware,
+    clear_compressed_caches,
+    parse_accept_encoding,
+)
+
+
+def make_client(**options):
+    """Мини-приложение с middleware сжатия"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **options)
+
+    @app.get("/big")
+    async def big():
+        return {"data": "x" * 5000}
+
+    @app.get("/small")
+    async def small():
+        return {"data": "x"}
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("y" * 5000)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield ("row %d\n" % i).encode() * 200
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return TestClient(app), app
+
+
+def test_parse_accept_encoding():
+    """Тест разбора Accept-Encoding"""
+    assert parse_accept_encoding("gzip, zstd;q=0.5, br;q=0") == {
+        "gzip": 1.0,
+        "zstd": 0.5,
+        "br": 0.0,
+    }
+
+
+def test_gzip_threshold():
+    """Тест порога минимального размера"""
+    client, _ = make_client(minimum_size=1000)
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["data"] == "x" * 5000
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_compressed_body_cache():
+    """Тест кэша сжатых тел: повторный ответ не сжимается заново"""
+    version = [1]
+    client, app = make_client(minimum_size=100, version=lambda: version[0])
+    for _ in range(2):
+        client.get("/text", headers={"Accept-Encoding": "gzip"})
+    client.get("/text?page=2", headers={"Accept-Encoding": "gzip"})
+    version[0] = 2
+    client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+    cache = app.middleware_stack.app.cache
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_cache_version_ttl_and_rollback():
+    """Версия читается раз в ttl и после записи; откат версии сбрасывает кэш"""
+    version = [5]
+    reads = []
+
+    def read_version():
+        reads.append(version[0])
+        return version[0]
+
+    client, app = make_client(minimum_size=100, version=read_version, version_ttl=60)
+    gzip_only = {"Accept-Encoding": "gzip"}
+    for _ in range(2):
+        client.get("/text", headers=gzip_only)
+    assert reads == [5]
+
+    # Восстановление из бэкапа: версия меньше уже виденной
+    version[0] = 3
+    client.post("/text")
+    client.get("/text", headers=gzip_only)
+    assert reads == [5, 3]
+    cache = app.middleware_stack.app.cache
+    assert (cache.hits, cache.misses, len(cache._items)) == (1, 2, 1)
+
+    clear_compressed_caches()
+    assert cache.size == 0 and not cache._items
+
+
+def compression_middleware(app):
+    layer = app.middleware_stack
+    while not isinstance(layer, CompressionMiddleware):
+        layer = layer.app
+    return layer
+
+
+def test_api_compression_cache(test_client, sample_book_data):
+    """Повторный список книг берется из кэша, запись меняет версию"""
+    for i in range(20):
+        test_client.post(
+            "/api/v1/books/",
+            json=dict(sample_book_data, isbn=None, title=f"Cached {i}"),
+        )
+    cache = compression_middleware(test_client.app).cache
+    gzip_only = {"Accept-Encoding": "gzip"}
+    hits, misses = cache.hits, cache.misses
+
+    first = test_client.get("/api/v1/books/?limit=50", headers=gzip_only)
+    second = test_client.get("/api/v1/books/?limit=50", headers=gzip_only)
+    assert second.headers["content-encoding"] == "gzip"
+    assert second.json() == first.json()
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+    test_client.post("/api/v1/books/", json=dict(sample_book_data, isbn=None))
+    third = test_client.get("/api/v1/books/?limit=50", headers=gzip_only)
+    total = first.json()["pagination"]["total"]
+    assert third.json()["pagination"]["total"] == total + 1
+    assert (cache.hits - hits, cache.misses - misses) == (1, 2)
+
+    test_client.get("/api/v1/books/popular", headers=gzip_only)
+    assert cache.misses - misses == 2
+
+
+def test_streaming_stays_streaming():
+    """Тест сжатия потокового ответа по чанкам"""
+    client, _ = make_client(minimum_size=100)
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        assert "content-length" not in r.headers
+        raw = b"".join(r.iter_raw())
+
+    body = zlib.decompress(raw, 31)
+    assert body == b"".join(("row %d\n" % i).encode() * 200 for i in range(3))
+    assert gzip.decompress(raw) == body
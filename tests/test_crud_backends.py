@@ -0,0 +1,401 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud.books import (
+    AUTHORS_FROM,
+    BOOKS_FROM,
+    LIST_COLUMNS,
+    SORTS,
+    InMemoryBookRepository,
+    SQLiteBookRepository,
+    build_where,
+    create_repository,
+    order_by,
+    select_list,
+)
+from app.crud.sharding import ShardedBookRepository
+from app.db.session import (
+    BACKEND_MEMORY,
+    BACKEND_SQLITE_FILE,
+    BACKEND_SQLITE_MEMORY,
+    parse_database_url,
+)
+from app.schemas.book import BookFilter
+
+
+def test_parse_database_url():
+    """Тест разбора DATABASE_URL"""
+    assert parse_database_url("sqlite:///./library.db") == (
+        BACKEND_SQLITE_FILE,
+        "library.db",
+    )
+    assert parse_database_url("sqlite:////data/library.db") == (
+        BACKEND_SQLITE_FILE,
+        "/data/library.db",
+    )
+    assert parse_database_url("sqlite:///:memory:") == (BACKEND_SQLITE_MEMORY, None)
+    assert parse_database_url("memory://") == (BACKEND_MEMORY, None)
+
+    with pytest.raises(ValueError):
+        parse_database_url("postgresql://localhost/library")
+
+
+def test_create_repository_types():
+    """Тест выбора реализации хранилища"""
+    repo = create_repository("memory://")
+    assert isinstance(repo, InMemoryBookRepository)
+
+    repo = create_repository("sqlite:///:memory:")
+    assert isinstance(repo, SQLiteBookRepository)
+    repo.close()
+
+
+def test_repository_crud(repository, sample_book_data):
+    """Тест CRUD операций во всех хранилищах"""
+    book = repository.create_book(sample_book_data)
+    assert book["id"] is not None
+    assert book["is_available"] is True
+    assert repository.count() == 1
+
+    assert repository.get_book(book["id"])["title"] == sample_book_data["title"]
+
+    updated = repository.update_book(book["id"], {"title": "New", "is_available": 0})
+    assert updated["title"] == "New"
+    assert updated["is_available"] is False
+    assert updated["author"] == sample_book_data["author"]
+
+    assert repository.update_book(10**6, {"title": "Missing"}) is None
+
+    deleted = repository.delete_book(book["id"])
+    assert deleted["id"] == book["id"]
+    assert repository.get_book(book["id"]) is None
+    assert repository.delete_book(book["id"]) is None
+
+
+def test_repository_duplicate_isbn(repository, sample_book_data):
+    """Тест уникальности ISBN во всех хранилищах"""
+    repository.create_book(sample_book_data)
+    with pytest.raises(sqlite3.IntegrityError):
+        repository.create_book(sample_book_data)
+
+
+def test_repository_filters(repository):
+    """Тест фильтрации и пагинации во всех хранилищах"""
+    for i, (title, author) in enumerate(
+        [("Python Basics", "Guido"), ("Advanced python", "Other"), ("JS", "Dev")]
+    ):
+        repository.create_book(
+            {
+                "title": title,
+                "author": author,
+                "isbn": f"900000000{i}",
+                "year": 2020 + i,
+                "is_available": i != 1,
+            }
+        )
+
+    books, total = repository.list_books(BookFilter(search="PYTHON"), 0, 10)
+    assert total == 2
+    assert len(books) == 2
+
+    books, total = repository.list_books(BookFilter(year=2022), 0, 10)
+    assert [b["title"] for b in books] == ["JS"]
+
+    books, total = repository.list_books(BookFilter(available_only=True), 0, 10)
+    assert total == 2
+    assert all(b["is_available"] for b in books)
+
+    books, total = repository.list_books(BookFilter(), 1, 1)
+    assert total == 3
+    assert len(books) == 1
+
+
+def test_repository_set_availability(repository, sample_book_data):
+    """Тест выдачи/возврата во всех хранилищах"""
+    book = repository.create_book(sample_book_data)
+    other = repository.create_book(dict(sample_book_data, isbn="1231231231"))
+
+    result = repository.set_availability([book["id"]], False)
+    assert result == {"updated": [book["id"]], "conflicts": [], "not_found": []}
+    assert repository.get_book(book["id"])["is_available"] is False
+
+    result = repository.set_availability([book["id"], other["id"], 777], False, True)
+    assert result["updated"] == []
+    assert result["conflicts"] == [book["id"]]
+    assert result["not_found"] == [777]
+    assert repository.get_book(other["id"])["is_available"] is True
+
+    result = repository.set_availability([book["id"], other["id"]], False)
+    assert result["updated"] == [other["id"]]
+    assert result["conflicts"] == [book["id"]]
+
+
+def test_sharded_isbn_writes_are_serialized(tmp_path, sample_book_data):
+    """Создание и обновление одного ISBN в разных шардах не проходят оба"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'isbn.db'}", shards=3)
+    repo.init_schema()
+    isbn = "5550000001"
+    target = repo.shard_for_isbn(isbn)
+    other = next(
+        book
+        for book in (repo.create_book(dict(sample_book_data, isbn=None)) for _ in "abc")
+        if repo.shard_for_id(book["id"]) is not target
+    )
+
+    check = repo._check_isbn
+
+    def slow_check(*args):
+        check(*args)
+        time.sleep(0.1)  # окно между проверкой и записью
+
+    repo._check_isbn = slow_check
+    errors = []
+
+    def run(func, *args):
+        try:
+            func(*args)
+        except sqlite3.IntegrityError as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(
+            target=run, args=(repo.create_book, dict(sample_book_data, isbn=isbn))
+        ),
+        threading.Thread(
+            target=run, args=(repo.update_book, other["id"], {"isbn": isbn})
+        ),
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 1
+        assert [b["isbn"] for b in repo.scan(["isbn"])].count(isbn) == 1
+    finally:
+        repo.close()
+
+
+def test_sharded_repository(tmp_path, sample_book_data):
+    """Тест шардированного хранилища"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'library.db'}", shards=3)
+    repo.init_schema()
+    try:
+        assert len(list(tmp_path.glob("library.shard*.db"))) == 3
+
+        ids = []
+        for i in range(9):
+            book = repo.create_book(
+                dict(sample_book_data, isbn=f"55500000{i:02d}", title=f"Book {i}")
+            )
+            ids.append(book["id"])
+            # Книга лежит в шарде, который вычисляется по ID
+            assert repo.shard_for_id(book["id"]).get_book(book["id"]) is not None
+
+        assert len(set(ids)) == 9
+        assert repo.count() == 9
+
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.create_book(dict(sample_book_data, isbn="5550000003"))
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.update_book(ids[0], {"isbn": "5550000004"})
+
+        # Пагинация по всем шардам в порядке created_at DESC, id DESC.
+        # ID идут с шагом по шардам, а created_at - с точностью до секунды,
+        # поэтому порядок ID сам по себе не гарантирован
+        books, total = repo.list_books(BookFilter(), 0, 100)
+        assert total == 9
+        assert sorted(b["id"] for b in books) == sorted(ids)
+        keys = [(b["created_at"], b["id"]) for b in books]
+        assert keys == sorted(keys, reverse=True)
+
+        page, _ = repo.list_books(BookFilter(), 3, 3)
+        assert page == books[3:6]
+
+        result = repo.set_availability(ids[:4] + [10**6], False, atomic=True)
+        assert result["updated"] == []
+        assert all(repo.get_book(i)["is_available"] for i in ids[:4])
+
+        assert repo.delete_book(ids[0])["id"] == ids[0]
+        assert repo.get_book(ids[0]) is None
+    finally:
+        repo.close()
+
+
+def test_sharded_change_log_compaction(tmp_path):
+    """Журналы шардов чистятся планировщиком, версия данных растет"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'log.db'}", shards=3)
+    repo.init_schema()
+    try:
+        for i in range(9):
+            book = repo.create_book({"title": f"B{i}", "author": "A", "year": 2000})
+            repo.update_book(book["id"], {"year": 2001})
+        assert repo.data_version() == 18
+
+        assert repo.compact_changes(3) == 15
+        for shard in repo.shards:
+            conn = shard.connect()
+            try:
+                assert (
+                    conn.execute("SELECT COUNT(*) FROM book_changes").fetchone()[0] == 1
+                )
+            finally:
+                conn.close()
+        assert repo.data_version() == 18
+    finally:
+        repo.close()
+
+
+def test_repository_columns(repository, sample_book_data):
+    """Тест проекции полей во всех хранилищах"""
+    book = repository.create_book(sample_book_data)
+
+    books, _ = repository.list_books(BookFilter(), 0, 10, ["id", "title"])
+    assert books == [{"id": book["id"], "title": sample_book_data["title"]}]
+
+    assert repository.get_book(book["id"], ["id", "year"]) == {
+        "id": book["id"],
+        "year": sample_book_data["year"],
+    }
+
+    with pytest.raises(ValueError):
+        repository.get_book(book["id"], ["id", "password"])
+
+
+def test_repository_changes(repository, sample_book_data):
+    """Тест журнала изменений и компакции во всех хранилищах"""
+    if isinstance(repository, ShardedBookRepository):
+        pytest.skip("у шардов нет общей ленты изменений")
+    book = repository.create_book(sample_book_data)
+    repository.update_book(book["id"], {"title": "Changed"})
+    repository.set_availability([book["id"]], False)
+
+    batch = repository.changes_since(0, 10)
+    assert [c["op"] for c in batch["changes"]] == ["insert", "update", "update"]
+    assert batch["changes"][0]["book"]["title"] == "Changed"
+    assert "description" not in batch["changes"][0]["book"]
+    assert batch["latest_version"] == batch["changes"][-1]["version"]
+
+    repository.delete_book(book["id"])
+    batch = repository.changes_since(batch["latest_version"], 10)
+    assert [c["op"] for c in batch["changes"]] == ["delete"]
+    assert batch["changes"][0]["book"] is None
+
+    assert repository.compact_changes(1) == 3
+    batch = repository.changes_since(0, 10)
+    assert len(batch["changes"]) == 1
+    assert batch["oldest_version"] == batch["latest_version"] == 4
+
+
+SORT_BOOKS = [
+    ("banana", "Zed", 2001),
+    ("Apple", "adams", 1999),
+    ("cherry", "Émile", 2010),
+    ("apple", "Baker", 2005),
+]
+
+
+def test_repository_sorting(repository):
+    """Сортировки и диапазоны одинаковы во всех хранилищах"""
+    ids = {}
+    for title, author, year in SORT_BOOKS:
+        book = repository.create_book({"title": title, "author": author, "year": year})
+        ids[title] = book["id"]
+
+    def titles(sort, descending=False, filters=None, columns=("id", "title")):
+        books, _ = repository.list_books(
+            filters or BookFilter(), 0, 10, list(columns), sort, descending
+        )
+        return [b["title"] for b in books]
+
+    # NOCASE: Apple и apple равны, дальше порядок по id
+    assert titles("title") == ["Apple", "apple", "banana", "cherry"]
+    assert titles("title", True) == ["cherry", "banana", "apple", "Apple"]
+    assert titles("author") == ["Apple", "apple", "cherry", "banana"]
+    assert titles("year", True) == ["cherry", "apple", "banana", "Apple"]
+    assert titles("created_at", True) == [b[0] for b in reversed(SORT_BOOKS)]
+
+    between = BookFilter(year_from=2000, year_to=2009)
+    assert titles("title", filters=between) == ["apple", "banana"]
+    assert titles("author", filters=between) == ["apple", "banana"]
+    books, total = repository.list_books(between, 1, 1, ["title"], "year", False)
+    assert (books, total) == ([{"title": "apple"}], 2)
+
+    repository.update_book(ids["banana"], {"year": 2002})
+    since = datetime.utcnow() - timedelta(minutes=1)
+    assert len(titles("updated_at", filters=BookFilter(updated_since=since))) == 4
+    future = BookFilter(updated_since=datetime.utcnow() + timedelta(minutes=1))
+    assert titles("updated_at", filters=future) == []
+
+
+def test_repository_bulk(repository):
+    """Пакетные изменение и удаление по ID и по фильтрам"""
+    ids = [
+        repository.create_book({"title": f"Bulk {i}", "author": "A", "year": 1990 + i})
+        for i in range(5)
+    ]
+    ids = [book["id"] for book in ids]
+    old = BookFilter(year_to=1992)
+
+    assert repository.update_books(None, old, {"year": 2000}, dry_run=True) == ids[:3]
+    assert repository.list_books(old, 0, 10)[1] == 3
+
+    fields = {"author": "B", "is_available": False}
+    assert repository.update_books(None, old, fields) == ids[:3]
+    assert repository.list_authors(None, 0, 10)[0] == [
+        {"name": "A", "book_count": 2},
+        {"name": "B", "book_count": 3},
+    ]
+    book = repository.get_book(ids[0])
+    assert (book["author"], book["is_available"]) == ("B", False)
+
+    # Ничего не подошло - новый автор не остается в справочнике
+    assert repository.update_books([10**6], None, {"author": "C"}) == []
+    assert repository.list_authors("c", 0, 10) == ([], 0)
+
+    assert repository.delete_books([ids[0], ids[4], 10**6], None, dry_run=True) == [
+        ids[0],
+        ids[4],
+    ]
+    assert repository.count() == 5
+    assert repository.delete_books([ids[0], ids[4], 10**6], None) == [ids[0], ids[4]]
+    assert repository.delete_books(None, BookFilter(author="b")) == ids[1:3]
+    assert [b["id"] for b in repository.scan()] == [ids[3]]
+    assert repository.list_authors(None, 0, 10) == ([{"name": "A", "book_count": 1}], 1)
+
+
+def test_sorted_ranges_use_index_order(tmp_path):
+    """Страница с сортировкой и диапазонами идет по индексу без сортировки"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'plan.db'}")
+    repo.init_schema()
+    filters = [
+        BookFilter(),
+        BookFilter(year_from=2000, year_to=2010),
+        BookFilter(updated_since=datetime(2020, 1, 1)),
+        BookFilter(available_only=True, year_from=2000),
+    ]
+    conn = repo.connect()
+    try:
+        for sort in SORTS:
+            for descending in (False, True):
+                for f in filters:
+                    where, params = build_where(f, sort)
+                    source = AUTHORS_FROM if sort == "author" else BOOKS_FROM
+                    plan = conn.execute(
+                        f"EXPLAIN QUERY PLAN SELECT {select_list(LIST_COLUMNS)} "
+                        f"FROM {source} WHERE {where} "
+                        f"ORDER BY {order_by(sort, descending)} LIMIT 10",
+                        params,
+                    ).fetchall()
+                    assert not any("TEMP B-TREE" in row[3] for row in plan), (
+                        sort,
+                        f,
+                        plan,
+                    )
+    finally:
+        conn.close()
+        repo.close()
@@ -0,0 +1,162 @@
+import time
+
+import pytest
+
+from app.crud.books import create_repository
+
+np = pytest.importorskip("numpy")
+
+from app.crud import dedup  # noqa: E402
+from app.crud.dedup import (  # noqa: E402
+    DuplicateIndex,
+    MinHasher,
+    dedup_text,
+    find_duplicates,
+    similarity,
+)
+
+BOOKS = [
+    ("Война и мир", "Лев Толстой"),
+    ("Война и мир.", "Л. Н. Толстой"),
+    ("ВОЙНА И МИР (том 1)", "Лев Толстой"),
+    ("Анна Каренина", "Лев Толстой"),
+    ("Мастер и Маргарита", "Михаил Булгаков"),
+    ("Мастер и Маргарита", "Михаил Булгаков "),
+    ("Преступление и наказание", "Федор Достоевский"),
+]
+
+
+@pytest.fixture
+def repo():
+    repo = create_repository("memory://")
+    for title, author in BOOKS:
+        repo.create_book({"title": title, "author": author, "isbn": None, "year": 2000})
+    return repo
+
+
+def test_signatures():
+    """Сигнатура почти одинаковых текстов совпадает почти целиком"""
+    hasher = MinHasher()
+    texts = [
+        dedup_text("Война и мир", "Лев Толстой"),
+        dedup_text("Война и мир!", "лев толстой"),
+        dedup_text("Преступление и наказание", "Федор Достоевский"),
+        dedup_text("", ""),
+    ]
+    sigs = hasher.signatures(texts)
+    assert sigs.shape == (4, 64)
+    assert similarity(sigs[0], sigs[1]) == 1.0
+    assert similarity(sigs[0], sigs[2]) < 0.3
+    # Пачка и поштучный расчет дают одно и то же
+    assert (hasher.signatures(texts[2:3])[0] == sigs[2]).all()
+
+
+def test_find_duplicates(repo):
+    """Пакетный поиск находит группы дубликатов"""
+    progress = []
+    groups = find_duplicates(
+        repo, MinHasher(), batch_size=2, progress=lambda f, m: progress.append(f)
+    )
+    assert [group["ids"] for group in groups] == [[1, 2, 3], [5, 6]]
+    assert all(0.7 <= group["similarity"] <= 1.0 for group in groups)
+    assert progress[-1] == 1.0
+
+
+class CollidingHasher(MinHasher):
+    """Все книги попадают в одну корзину каждой полосы"""
+
+    def band_keys(self, signatures):
+        return np.tile(np.arange(self.bands, dtype=np.uint64), (len(signatures), 1))
+
+
+def test_find_duplicates_compares_whole_bucket():
+    """Чужая книга между дубликатами в корзине не разрывает пару"""
+    repo = create_repository("memory://")
+    for title, author in [
+        ("Война и мир", "Лев Толстой"),
+        ("Преступление и наказание", "Федор Достоевский"),
+        ("Война и мир!", "лев толстой"),
+    ]:
+        repo.create_book({"title": title, "author": author, "isbn": None, "year": 2000})
+    groups = find_duplicates(repo, CollidingHasher())
+    assert [group["ids"] for group in groups] == [[1, 3]]
+
+
+def test_duplicate_index(repo):
+    """Проверка при создании и обновление индекса"""
+    index = DuplicateIndex()
+    index.build(repo)
+    assert len(index) == len(BOOKS)
+
+    found = index.check("Мастер и Маргарита", "М. Булгаков")
+    assert [item["id"] for item in found] == [5, 6]
+    assert index.check("Идиот", "Федор Достоевский") == []
+
+    index.remove(5)
+    found = index.check("Мастер и Маргарита", "Михаил Булгаков")
+    assert [item["id"] for item in found] == [6]
+
+    # Изменения другого процесса - через журнал изменений
+    repo.create_book(
+        {"title": "Идиот", "author": "Федор Достоевский", "isbn": None, "year": 2000}
+    )
+    index.sync(repo)
+    assert [item["id"] for item in index.check("Идиот", "Федор Достаевский")] == [8]
+
+
+def test_duplicate_index_rebuilds_after_restore(repo):
+    """Журнал моложе индекса (база из бэкапа) - индекс строится заново"""
+    index = DuplicateIndex()
+    index.build(repo)
+
+    restored = create_repository("memory://")
+    restored.create_book(
+        {"title": "Идиот", "author": "Федор Достоевский", "isbn": None, "year": 2000}
+    )
+    assert restored.data_version() < index.version
+    index.sync(restored)
+    assert len(index) == 1
+    assert [item["id"] for item in index.check("Идиот", "Федор Достоевский")] == [1]
+
+
+def test_duplicates_endpoints(test_client, sample_book_data):
+    """Проверка при создании и GET /books/duplicates"""
+    data = dict(sample_book_data, isbn=None, title="Собачье сердце")
+    first = test_client.post("/api/v1/books/", json=data).json()
+    assert first["possible_duplicates"] == []
+
+    second = test_client.post(
+        "/api/v1/books/", json=dict(data, title="Собачье сердце.")
+    ).json()
+    assert [d["id"] for d in second["possible_duplicates"]] == [first["data"]["id"]]
+
+    response = test_client.post(
+        "/api/v1/books/?reject_duplicates=true", json=dict(data, title="СОБАЧЬЕ СЕРДЦЕ")
+    )
+    assert response.status_code == 409
+
+    job_id = test_client.post("/api/v1/jobs/", json={"type": "find_duplicates"}).json()[
+        "data"
+    ]["id"]
+    for _ in range(200):
+        job = test_client.get(f"/api/v1/jobs/{job_id}").json()["data"]
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded", job["error"]
+
+    response = test_client.get("/api/v1/books/duplicates")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["job_id"] == job_id
+    ids = {first["data"]["id"], second["data"]["id"]}
+    assert any({b["id"] for b in group["books"]} >= ids for group in body["data"])
+
+
+def test_signatures_chunked(monkeypatch):
+    """Хеширование кусками дает те же сигнатуры, что и одной операцией"""
+    hasher = MinHasher()
+    texts = [dedup_text(f"Книга номер {i}", "Автор") for i in range(50)]
+    whole = hasher.signatures(texts)
+    monkeypatch.setattr(dedup, "GRAMS_PER_CHUNK", 40)
+    assert (hasher.signatures(texts) == whole).all()
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+
+from app.crud.books import create_repository
+from app.db.descriptions import (
+    FORMAT_DEFLATE,
+    FORMAT_RAW,
+    decode_description,
+    encode_description,
+    migrate_descriptions,
+    storage_report,
+)
+from app.db.session import ConnectionFactory, init_schema
+from app.schemas.book import BookFilter
+
+LONG = "Роман о судьбе семьи и любви во время войны, история главного героя. " * 5
+
+
+def test_codec():
+    """Короткие описания хранятся как есть, длинные - deflate со словарем"""
+    for text in ["", "Коротко", LONG, "ü" * 500]:
+        assert decode_description(encode_description(text)) == text
+    assert encode_description("Коротко")[0] == FORMAT_RAW
+    data = encode_description(LONG)
+    assert data[0] == FORMAT_DEFLATE
+    assert len(data) < len(LONG.encode()) / 4
+    assert decode_description(None) is None
+
+
+def test_repository_descriptions(tmp_path):
+    """Описание пишется в book_descriptions и читается, только если запрошено"""
+    path = tmp_path / "d.db"
+    repo = create_repository(f"sqlite:///{path}")
+    repo.init_schema()
+    book = repo.create_book(
+        {"title": "A", "author": "X", "year": 2000, "description": LONG}
+    )
+    other = repo.create_book({"title": "B", "author": "X", "year": 2000})
+    assert book["description"] == LONG and other["description"] is None
+    assert repo.get_book(book["id"], ["id", "description"])["description"] == LONG
+    assert "description" not in repo.list_books(BookFilter(), 0, 10, ["id"])[0][0]
+
+    repo.update_book(book["id"], {"description": "Новое"})
+    assert repo.get_book(book["id"])["description"] == "Новое"
+    repo.update_books([book["id"], other["id"]], None, {"description": LONG})
+    assert {b["description"] for b in repo.scan()} == {LONG}
+
+    repo.delete_book(book["id"])
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(books)")]
+        assert "description" not in columns
+        rows = conn.execute("SELECT book_id FROM book_descriptions").fetchall()
+        assert rows == [(other["id"],)]
+        report = storage_report(conn)
+    finally:
+        conn.close()
+    assert (report["descriptions"], report["compressed"]) == (1, 1)
+    assert report["raw_bytes"] == len(LONG.encode())
+    assert report["disk_bytes_saved"] > 0
+    repo.close()
+
+
+def test_migration_from_inline_descriptions(tmp_path):
+    """Старая схема: описания из books.description переносятся и сжимаются"""
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE,
+            year INTEGER,
+            description TEXT,
+            is_available BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    conn.executemany(
+        "INSERT INTO books (title, author, year, description) VALUES (?, ?, ?, ?)",
+        [(f"Book {i}", "Author", 2000, LONG if i % 2 else None) for i in range(200)],
+    )
+    conn.commit()
+    conn.close()
+
+    conn = ConnectionFactory(path).connect()
+    try:
+        report = migrate_descriptions(conn)
+        assert report["migrated"] == 100
+        assert report["stored_bytes"] < report["raw_bytes"] / 4
+        assert report["books_pages_after"] < report["books_pages_before"]
+        assert migrate_descriptions(conn) is None
+        init_schema(conn)  # дальше - перенос авторов
+    finally:
+        conn.close()
+
+    repo = create_repository(f"sqlite:///{path}")
+    assert repo.get_book(2)["description"] == LONG
+    assert repo.get_book(1)["description"] is None
+    assert repo.list_authors(None, 0, 10)[0] == [{"name": "Author", "book_count": 200}]
+
+
+def test_storage_report_job(test_client, sample_book_data):
+    """Задача storage_report возвращает отчет по каждой базе"""
+    test_client.post(
+        "/api/v1/books/", json=dict(sample_book_data, isbn=None, description=LONG)
+    )
+    job_id = test_client.post("/api/v1/jobs/", json={"type": "storage_report"}).json()[
+        "data"
+    ]["id"]
+    for _ in range(200):
+        job = test_client.get(f"/api/v1/jobs/{job_id}").json()["data"]
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded", job["error"]
+
+    result = test_client.get(f"/api/v1/jobs/{job_id}/result").json()["data"]
+    (report,) = result["databases"].values()
+    assert report["descriptions"] >= 1
+    assert report["stored_bytes"] < report["raw_bytes"]
@@ -0,0 +1,54 @@
+from app.crud.books import InMemoryBookRepository
+from app.crud.isbn import BloomFilter, IsbnFilter, canonical_isbn, isbn_variants
+
+
+def test_isbn_normalization():
+    """Тест нормализации ISBN-10/13"""
+    assert isbn_variants("0-306-40615-2") == ["0306406152", "9780306406157"]
+    assert isbn_variants("978-0-306-40615-7") == ["9780306406157", "0306406152"]
+    assert canonical_isbn("0306406152") == canonical_isbn("9780306406157")
+    assert isbn_variants("9791234567896") == ["9791234567896"]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Тест фильтра Блума"""
+    bloom = BloomFilter(5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"isbn-{i}")
+
+    assert all(f"isbn-{i}" in bloom for i in range(5000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_isbn_filter_find():
+    """Тест поиска по ISBN с фильтром и догонянием по журналу"""
+    repo = InMemoryBookRepository()
+    book = repo.create_book(
+        {"title": "A", "author": "B", "year": 2000, "isbn": "0306406152"}
+    )
+    isbn_filter = IsbnFilter()
+    isbn_filter.build(repo)
+
+    found = isbn_filter.find(repo, ["978-0-306-40615-7", "9781111111113"])
+    assert found["978-0-306-40615-7"]["id"] == book["id"]
+    assert found["9781111111113"] is None
+
+    # Запись мимо фильтра подтягивается из журнала изменений
+    other = repo.create_book(
+        {"title": "C", "author": "D", "year": 2000, "isbn": "9781111111113"}
+    )
+    assert isbn_filter.find(repo, ["9781111111113"])["9781111111113"] == other
+
+
+def test_isbn_filter_builds_on_first_find():
+    """До прогрева find() строит фильтр сам и находит ISBN-10 по ISBN-13"""
+    repo = InMemoryBookRepository()
+    book = repo.create_book(
+        {"title": "A", "author": "B", "year": 2000, "isbn": "0306406152"}
+    )
+    isbn_filter = IsbnFilter()
+    assert not isbn_filter.built
+    found = isbn_filter.find(repo, ["9780306406157"], sync=False)
+    assert found["9780306406157"]["id"] == book["id"]
+    assert isbn_filter.built
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from app.jobs.manager import (
+    CANCELLED,
+    FAILED,
+    SUCCEEDED,
+    JobCancelled,
+    JobManager,
+    QueueFullError,
+    create_job_store,
+)
+from app.jobs.tasks import import_job
+
+
+@pytest.fixture
+def store(tmp_path):
+    return create_job_store(f"sqlite:///{tmp_path / 'jobs.db'}")
+
+
+def wait_for(store, job_id, statuses, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Задача {job_id} не дошла до {statuses}")
+
+
+def test_job_success_and_failure(store):
+    """Тест выполнения задач, прогресса и ошибок"""
+    manager = JobManager(store, workers=1)
+
+    def ok(ctx):
+        ctx.progress(0.5, "половина")
+        return {"answer": ctx.params["x"] * 2}
+
+    def broken(ctx):
+        raise RuntimeError("boom")
+
+    manager.register("ok", ok)
+    manager.register("broken", broken)
+    manager.start()
+    try:
+        job = manager.submit("ok", {"x": 21})
+        done = wait_for(store, job["id"], [SUCCEEDED])
+        assert done["result"] == {"answer": 42}
+        assert done["progress"] == 1.0
+
+        job = manager.submit("broken", {})
+        failed = wait_for(store, job["id"], [FAILED])
+        assert "boom" in failed["error"]
+
+        with pytest.raises(ValueError):
+            manager.submit("unknown", {})
+    finally:
+        manager.stop()
+
+
+def test_job_priorities_and_cancel(store):
+    """Тест приоритетов, отмены и ограниченной очереди"""
+    manager = JobManager(store, workers=1, queue_size=3)
+    gate = threading.Event()
+    order = []
+
+    def blocker(ctx):
+        while not gate.is_set():
+            ctx.check_cancelled()
+            time.sleep(0.01)
+        return None
+
+    def record(ctx):
+        order.append(ctx.params["name"])
+
+    manager.register("blocker", blocker)
+    manager.register("record", record)
+    manager.start()
+    try:
+        first = manager.submit("blocker", {})
+        wait_for(store, first["id"], ["running"])
+
+        manager.submit("record", {"name": "low"}, priority=9)
+        manager.submit("record", {"name": "high"}, priority=0)
+        queued = manager.submit("record", {"name": "cancelled"}, priority=5)
+        with pytest.raises(QueueFullError):
+            manager.submit("record", {"name": "overflow"})
+
+        assert manager.cancel(queued["id"])["status"] == CANCELLED
+
+        gate.set()
+        manager.wait_idle()
+        assert order == ["high", "low"]
+
+        # Отмена выполняющейся задачи
+        gate.clear()
+        running = manager.submit("blocker", {})
+        wait_for(store, running["id"], ["running"])
+        manager.cancel(running["id"])
+        wait_for(store, running["id"], [CANCELLED])
+    finally:
+        manager.stop()
+
+
+def test_job_list_omits_params(store):
+    """Список задач без params, карточка задачи - с ними"""
+    job = store.create("import", {"books": [{"title": "A"}] * 100}, 5)
+    (listed,) = store.list()
+    assert "params" not in listed
+    assert listed["id"] == job["id"]
+    assert store.get(job["id"])["params"]["books"][0] == {"title": "A"}
+
+
+def test_import_progress_counts_rejected_rows():
+    """Прогресс и отмена импорта идут по обработанным, а не созданным строкам"""
+
+    class Context:
+        params = {"books": [{"title": ""}] * 2500}
+        calls = []
+
+        def progress(self, fraction, message=None):
+            self.calls.append(round(fraction, 2))
+            if len(self.calls) == 2:
+                raise JobCancelled()
+
+    ctx = Context()
+    with pytest.raises(JobCancelled):
+        import_job(ctx)
+    assert ctx.calls == [0.4, 0.8]
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.crud.books import create_repository
+from app.db.maintenance import (
+    checkpoint,
+    create_maintenance_scheduler,
+    incremental_vacuum,
+    wal_size,
+)
+
+
+def make_settings(**overrides):
+    """Настройки обслуживания для тестов"""
+    values = {
+        "SQLITE_JOURNAL_MODE": "WAL",
+        "MAINTENANCE_ENABLED": True,
+        "MAINTENANCE_CHECKPOINT_INTERVAL": 1.0,
+        "MAINTENANCE_WAL_TRUNCATE_BYTES": 0,
+        "MAINTENANCE_VACUUM_INTERVAL": 1.0,
+        "MAINTENANCE_VACUUM_PAGES": 8,
+        "MAINTENANCE_VACUUM_PAUSE": 0.0,
+        "MAINTENANCE_ANALYZE_INTERVAL": 1.0,
+        "CHANGE_LOG_COMPACT_INTERVAL": 1.0,
+        "CHANGE_LOG_MAX_ENTRIES": 100,
+        "CHANGE_LOG_MAX_AGE_SECONDS": None,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def fill(repo, count, description_size=2000):
+    for i in range(count):
+        repo.create_book(
+            {
+                "title": f"Book {i}",
+                "author": "Author",
+                "isbn": None,
+                "year": 2000,
+                "description": "x" * description_size,
+                "is_available": True,
+            }
+        )
+
+
+def test_wal_checkpoint_truncates(tmp_path):
+    """TRUNCATE-чекпойнт обнуляет выросший WAL"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'wal.db'}")
+    repo.init_schema()
+    conn = repo.factory.connect()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        # Держим соединение открытым, чтобы закрытие не сделало чекпойнт
+        fill(repo, 50)
+        assert wal_size(repo.factory) > 0
+
+        result = checkpoint(repo.factory, truncate_bytes=0)
+        assert result["mode"] == "TRUNCATE"
+        assert not result["busy"]
+        assert wal_size(repo.factory) == 0
+
+        assert checkpoint(repo.factory, 1 << 30)["mode"] == "PASSIVE"
+    finally:
+        conn.close()
+        repo.close()
+
+
+def test_incremental_vacuum_frees_pages(tmp_path):
+    """Свободные страницы возвращаются шагами"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'vacuum.db'}")
+    repo.init_schema()
+    fill(repo, 100)
+    for book in repo.scan(["id"]):
+        repo.delete_book(book["id"])
+
+    result = incremental_vacuum(repo.factory, pages=8, pause=0)
+    assert result["incremental"]
+    assert result["freed_pages"] > 0
+    assert result["steps"] > 1
+
+    conn = repo.factory.connect()
+    try:
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    finally:
+        conn.close()
+    repo.close()
+
+
+def test_scheduler_tasks_and_stats(tmp_path):
+    """Планировщик выполняет задачи и собирает статистику"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'sched.db'}")
+    repo.init_schema()
+    fill(repo, 5, description_size=10)
+
+    scheduler = create_maintenance_scheduler(repo, make_settings())
+    assert set(scheduler.tasks) == {
+        "compact_change_log",
+        "wal_checkpoint",
+        "incremental_vacuum",
+        "optimize",
+    }
+    asyncio.run(scheduler.run_all())
+    stats = scheduler.stats()
+    for name, task in stats.items():
+        assert task["runs"] == 1, name
+        assert task["errors"] == 0, task["last_error"]
+    assert stats["compact_change_log"]["last_result"] == {"deleted": 0}
+    repo.close()
+
+    # In-memory хранилище обслуживать нечего, кроме журнала изменений
+    scheduler = create_maintenance_scheduler(
+        create_repository("memory://"), make_settings()
+    )
+    assert set(scheduler.tasks) == {"compact_change_log"}
+
+
+def test_metrics_endpoint(test_client):
+    """Метрики обслуживания доступны через /metrics"""
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    maintenance = response.json()["data"]["maintenance"]
+    assert "compact_change_log" in maintenance
+    assert maintenance["compact_change_log"]["runs"] >= 0
@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+from app.crud.books import get_book_repository
+from app.crud.popularity import (
+    PopularityTracker,
+    TopK,
+    ViewCounter,
+    get_popularity_tracker,
+)
+
+
+@pytest.fixture
+def repository(repository):
+    """Хранилище каждого типа с пятью книгами"""
+    for i in range(5):
+        repository.create_book(
+            {"title": f"Book {i}", "author": "Author", "isbn": None, "year": 2000}
+        )
+    return repository
+
+
+def test_view_counter_threads():
+    """Параллельные просмотры не теряются"""
+    counter = ViewCounter(stripes=4)
+
+    def worker():
+        for i in range(1000):
+            counter.hit(i % 10)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts = counter.drain()
+    assert sum(counts.values()) == 8000
+    assert counts[3] == 800
+    assert counter.drain() == {}
+
+
+def test_top_k():
+    """В рейтинге остаются k лучших"""
+    top = TopK(3)
+    for book_id, views in [(1, 5), (2, 1), (3, 7), (4, 2), (2, 9), (5, 3)]:
+        top.update(book_id, views)
+    assert top.items(10) == [(2, 9), (3, 7), (1, 5)]
+
+    top.remove(3)
+    assert top.items(2) == [(2, 9), (1, 5)]
+    for views in range(10, 100):
+        top.update(1, views)
+    assert top.items(1) == [(1, 99)]
+
+
+def test_tracker_flush(repository):
+    """Просмотры пишутся пачкой и попадают в рейтинг"""
+    ids = [book["id"] for book in repository.scan(["id"])]
+    tracker = PopularityTracker(k=3)
+    for _ in range(3):
+        tracker.hit(ids[0])
+    tracker.hit(ids[1])
+    tracker.hit(999999)  # удаленная книга не попадает в статистику
+
+    assert tracker.flush(repository) == {"books": 3, "views": 5}
+    assert tracker.popular(10) == [(ids[0], 3), (ids[1], 1)]
+
+    tracker.hit(ids[1])
+    tracker.hit(ids[1])
+    tracker.hit(ids[1])
+    tracker.flush(repository)
+    assert tracker.popular(1) == [(ids[1], 4)]
+    assert repository.top_viewed(2) == [(ids[1], 4), (ids[0], 3)]
+
+    # После перезапуска рейтинг восстанавливается из book_stats
+    restarted = PopularityTracker(k=3)
+    restarted.load(repository)
+    assert restarted.popular(10) == [(ids[1], 4), (ids[0], 3)]
+
+    repository.delete_book(ids[1])
+    assert repository.top_viewed(10) == [(ids[0], 3)]
+    assert set(repository.get_books_by_ids(ids, ["title"])) == set(ids) - {ids[1]}
+
+
+def test_tracker_refills_after_forget(repository):
+    """После удаления книги рейтинг добирается из book_stats до k"""
+    ids = [book["id"] for book in repository.scan(["id"])]
+    tracker = PopularityTracker(k=2)
+    for views, book_id in enumerate(ids[:3], start=1):
+        for _ in range(views):
+            tracker.hit(book_id)
+    tracker.flush(repository)
+    assert tracker.popular(10) == [(ids[2], 3), (ids[1], 2)]
+
+    repository.delete_book(ids[2])
+    tracker.forget(ids[2])
+    assert tracker.popular(10, repository) == [(ids[1], 2), (ids[0], 1)]
+
+    repository.delete_book(ids[1])
+    tracker.forget(ids[1])
+    tracker.flush(repository)
+    assert tracker.popular(10) == [(ids[0], 1)]
+
+
+def test_tracker_reset_after_restore(repository):
+    """После restore несброшенные просмотры отброшены, рейтинг - из базы"""
+    ids = [book["id"] for book in repository.scan(["id"])]
+    tracker = PopularityTracker(k=3)
+    tracker.hit(ids[0])
+    tracker.flush(repository)
+    tracker.hit(ids[1])
+
+    repository.add_views({ids[2]: 5})  # содержимое восстановленной базы
+    tracker.reset(repository)
+    assert tracker.counter.pending() == 0
+    assert tracker.popular(10) == [(ids[2], 5), (ids[0], 1)]
+
+
+def test_tracker_keeps_views_on_failed_flush():
+    """При ошибке записи просмотры возвращаются в счетчики"""
+
+    class BrokenRepository:
+        def add_views(self, counts):
+            raise RuntimeError("disk full")
+
+    tracker = PopularityTracker()
+    tracker.hit(1)
+    tracker.hit(1)
+    with pytest.raises(RuntimeError):
+        tracker.flush(BrokenRepository())
+    assert tracker.counter.pending() == 2
+
+
+def test_popular_endpoint(test_client, sample_book_data):
+    """Просмотры через get_book попадают в /books/popular после сброса"""
+    book = test_client.post(
+        "/api/v1/books/", json=dict(sample_book_data, isbn="9780000000737")
+    ).json()["data"]
+    for _ in range(50):
+        assert test_client.get(f"/api/v1/books/{book['id']}").status_code == 200
+    get_popularity_tracker().flush(get_book_repository())
+
+    response = test_client.get("/api/v1/books/popular?limit=5")
+    assert response.status_code == 200
+    top = response.json()["data"]
+    assert top[0]["id"] == book["id"]
+    assert top[0]["views"] >= 50
+    assert "description" not in top[0]
+
+    test_client.delete(f"/api/v1/books/{book['id']}")
+    ids = [b["id"] for b in test_client.get("/api/v1/books/popular").json()["data"]]
+    assert book["id"] not in ids
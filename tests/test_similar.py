@@ -0,0 +1,175 @@
+import pytest
+
+from app.crud.books import create_repository
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from app.crud.similar import SimilarIndex  # noqa: E402
+
+BOOKS = [
+    ("Война и мир", "Лев Толстой", "Роман о войне 1812 года, Наполеоне и дворянстве"),
+    ("Анна Каренина", "Лев Толстой", "Роман о любви, семье и дворянстве"),
+    ("Бородино", "Михаил Лермонтов", "Стихотворение о войне 1812 года и Наполеоне"),
+    ("Python для начинающих", "Иван Петров", "Программирование на Python, функции"),
+    ("Продвинутый Python", "Петр Иванов", "Программирование на Python, асинхронность"),
+]
+
+
+@pytest.fixture
+def repo():
+    repo = create_repository("memory://")
+    for title, author, description in BOOKS:
+        repo.create_book(
+            {
+                "title": title,
+                "author": author,
+                "isbn": None,
+                "year": 2000,
+                "description": description,
+            }
+        )
+    return repo
+
+
+def ids(results):
+    return [item["id"] for item in results]
+
+
+def test_similar_ranking(repo):
+    """Ближайшие книги - с общими словами описания и автора"""
+    index = SimilarIndex(n_features=1 << 12)
+    index.build(repo)
+    assert len(index) == 5
+
+    war = repo.get_book(1)
+    results = index.similar(war, limit=2)
+    assert set(ids(results)) == {2, 3}
+    assert 1 not in ids(index.similar(war, limit=10))
+    assert results[0]["score"] >= results[1]["score"] > 0
+
+    python = index.similar(repo.get_book(4), limit=1)
+    assert ids(python) == [5]
+
+
+@pytest.mark.parametrize("merge_threshold", [1000, 1])
+def test_incremental_updates(repo, merge_threshold):
+    """Новые, измененные и удаленные книги видны без перестроения"""
+    index = SimilarIndex(n_features=1 << 12, merge_threshold=merge_threshold)
+    index.build(repo)
+
+    book = repo.create_book(
+        {
+            "title": "Python и данные",
+            "author": "Анна Смирнова",
+            "isbn": None,
+            "year": 2020,
+            "description": "Программирование на Python для анализа данных",
+        }
+    )
+    index.upsert(book)
+    index.merge_if_needed()
+    assert book["id"] in ids(index.similar(repo.get_book(4), limit=2))
+
+    repo.delete_book(5)
+    index.remove(5)
+    index.merge_if_needed()
+    assert 5 not in ids(index.similar(repo.get_book(4), limit=10))
+    assert len(index) == 5
+
+    # Изменения другого процесса подтягиваются из журнала
+    repo.update_book(3, {"description": "Программирование на Python"})
+    index.sync(repo, force=True)
+    assert 3 in ids(index.similar(repo.get_book(4), limit=2))
+
+
+def test_persisted_index_is_memory_mapped(repo, tmp_path):
+    """Сохраненный индекс грузится с диска и догоняет журнал"""
+    path = str(tmp_path / "similar")
+    index = SimilarIndex(path, n_features=1 << 12)
+    index.build(repo)
+    expected = index.similar(repo.get_book(1), limit=3)
+
+    loaded = SimilarIndex(path, n_features=1 << 12)
+    assert loaded.load()
+    assert type(loaded._data).__name__ == "memmap"
+    assert loaded.similar(repo.get_book(1), limit=3) == expected
+
+    repo.delete_book(2)
+    reopened = SimilarIndex(path, n_features=1 << 12)
+    reopened.open(repo)
+    assert len(reopened) == 4
+    assert 2 not in ids(reopened.similar(repo.get_book(1), limit=10))
+
+
+def test_merge_keeps_generations_in_use(repo, tmp_path):
+    """Слияние не удаляет поколение, которое отображено другим индексом"""
+    path = tmp_path / "similar"
+    writer = SimilarIndex(str(path), n_features=1 << 12, merge_threshold=1)
+    writer.build(repo)
+    reader = SimilarIndex(str(path), n_features=1 << 12)
+    assert reader.load()
+    expected = reader.similar(repo.get_book(1), limit=3)
+
+    writer.upsert(repo.get_book(2))
+    assert writer.merge_if_needed() == {"merged": 1}
+    assert len(list(path.glob("gen-*"))) == 2
+    assert reader.similar(repo.get_book(1), limit=3) == expected
+
+    # Читатель перешел на новое поколение - старое удалит следующая запись
+    assert reader.load()
+    writer.upsert(repo.get_book(3))
+    writer.merge_if_needed()
+    assert len(list(path.glob("gen-*"))) == 2
+    assert writer.merge_if_needed() is None
+
+
+def test_similar_endpoint(test_client, sample_book_data):
+    """Похожие книги через API"""
+    first = test_client.post(
+        "/api/v1/books/",
+        json=dict(
+            sample_book_data,
+            isbn=None,
+            title="Квантовая механика",
+            description="Учебник квантовой механики и теории поля",
+        ),
+    ).json()["data"]
+    second = test_client.post(
+        "/api/v1/books/",
+        json=dict(
+            sample_book_data,
+            isbn=None,
+            title="Теория поля",
+            description="Квантовая теория поля для студентов",
+        ),
+    ).json()["data"]
+
+    response = test_client.get(f"/api/v1/books/{first['id']}/similar?limit=3")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data[0]["id"] == second["id"]
+    assert data[0]["score"] > 0
+    assert "description" not in data[0]
+
+    assert test_client.get("/api/v1/books/999999/similar").status_code == 404
+
+
+def test_index_failure_after_commit(test_client, sample_book_data, monkeypatch):
+    """Ошибка индекса после записи не превращает 201/200 в 500"""
+
+    def broken(self, *args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(SimilarIndex, "upsert", broken)
+    monkeypatch.setattr(SimilarIndex, "remove", broken)
+    response = test_client.post(
+        "/api/v1/books/", json=dict(sample_book_data, isbn=None)
+    )
+    assert response.status_code == 201
+    book_id = response.json()["data"]["id"]
+    assert test_client.get(f"/api/v1/books/{book_id}").status_code == 200
+
+    response = test_client.put(f"/api/v1/books/{book_id}", json={"title": "Новое"})
+    assert response.status_code == 200
+    assert test_client.delete(f"/api/v1/books/{book_id}").status_code == 200
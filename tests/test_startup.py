@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+import time
+
+from app.core.startup import Warmup, warm_queries
+from app.crud.books import create_repository
+from app.crud.suggest import get_suggest_index
+from app.db.session import SCHEMA_VERSION, ConnectionFactory, schema_version
+from app.db.warmup import HOT_BTREES, warm_pages
+
+
+def test_schema_version_skips_ddl(tmp_path):
+    """Текущая схема не пересоздается; устаревшая версия - обновляется"""
+    path = tmp_path / "v.db"
+    repo = create_repository(f"sqlite:///{path}")
+    assert repo.init_schema() is True
+    assert repo.init_schema() is False
+
+    conn = sqlite3.connect(path)
+    try:
+        assert schema_version(conn) == SCHEMA_VERSION
+        conn.execute("UPDATE schema_version SET version = 0")
+        conn.commit()
+    finally:
+        conn.close()
+    assert repo.init_schema() is True
+    assert repo.init_schema() is False
+    repo.close()
+
+
+def test_warmup_stages():
+    """Этапы замеряются, ошибка этапа не останавливает прогрев"""
+
+    def broken():
+        raise RuntimeError("нет индекса")
+
+    warmup = Warmup([("ok", lambda: {"n": 1}), ("broken", broken), ("last", dict)])
+    assert not warmup.ready
+    warmup.run()
+    stats = warmup.stats()
+    assert stats["ready"] is True
+    assert list(stats["stages"]) == ["ok", "broken", "last"]
+    assert stats["stages"]["ok"]["result"] == {"n": 1}
+    assert stats["stages"]["broken"]["error"] == "нет индекса"
+    assert stats["stages"]["last"]["error"] is None
+
+
+def test_warm_pages_and_queries(tmp_path):
+    """Обход горячих B-деревьев укладывается в deadline"""
+    repo = create_repository(f"sqlite:///{tmp_path / 'w.db'}")
+    repo.init_schema()
+    repo.create_book({"title": "A", "author": "X", "year": 2000})
+
+    factory = ConnectionFactory(str(tmp_path / "w.db"))
+    warmed = warm_pages(factory)
+    assert warmed == {"warmed": [name for name, _ in HOT_BTREES], "skipped": 0}
+    assert warm_pages(factory, time.monotonic()) == {
+        "warmed": [],
+        "skipped": len(HOT_BTREES),
+    }
+    assert warm_queries(repo, 20)["books"] == 1
+    repo.close()
+
+
+def test_ready_endpoint(test_client):
+    """После прогрева /ready отвечает 200, этапы видны в /metrics"""
+    response = test_client.get("/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert "suggest_index" in data["warmup"]["stages"]
+
+    startup = test_client.get("/metrics").json()["data"]["startup"]
+    assert startup["duration_ms"] > 0
+    assert startup["warmup"]["ready"] is True
+
+
+def test_health_answers_while_index_is_built(test_client):
+    """Запрос, ждущий блокировку индекса (прогрев в фоне), не держит цикл"""
+    index = get_suggest_index()
+    responses = []
+    with index._lock:
+        waiting = threading.Thread(
+            target=lambda: responses.append(
+                test_client.get("/api/v1/books/suggest?q=test")
+            )
+        )
+        waiting.start()
+        time.sleep(0.1)
+        assert test_client.get("/health").status_code == 200
+        assert not responses
+    waiting.join(5)
+    assert responses[0].status_code == 200
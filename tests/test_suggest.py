@@ -0,0 +1,60 @@
+from app.crud.books import InMemoryBookRepository
+from app.crud.suggest import SuggestIndex, normalize
+
+
+def make_repository():
+    repo = InMemoryBookRepository()
+    for i, (title, author) in enumerate(
+        [
+            ("Harry Potter", "J. K. Rowling"),
+            ("Пётр Первый", "Алексей Толстой"),
+            ("Война и мир", "Лев Толстой"),
+            ("Potions Handbook", "Severus Snape"),
+        ]
+    ):
+        repo.create_book({"title": title, "author": author, "year": 2000 + i})
+    return repo
+
+
+def test_normalize():
+    """Тест нормализации: регистр и диакритика"""
+    assert normalize("Пётр") == "петр"
+    assert normalize("Émile") == "emile"
+
+
+def test_suggest_prefixes():
+    """Тест подсказок по префиксам слов"""
+    index = SuggestIndex()
+    index.build(make_repository())
+
+    titles = [b["title"] for b in index.suggest("pot")]
+    assert sorted(titles) == ["Harry Potter", "Potions Handbook"]
+
+    assert [b["title"] for b in index.suggest("har pot")] == ["Harry Potter"]
+    assert [b["title"] for b in index.suggest("ПЕТР")] == ["Пётр Первый"]
+    assert len(index.suggest("толст")) == 2
+    assert len(index.suggest("толст", limit=1)) == 1
+    assert index.suggest("xyz") == []
+
+
+def test_suggest_incremental_updates():
+    """Тест точечного обновления и синхронизации по журналу"""
+    repo = make_repository()
+    index = SuggestIndex(sync_interval=0)
+    index.build(repo)
+
+    index.upsert(1, "Fantastic Beasts", "J. K. Rowling")
+    assert index.suggest("harry") == []
+    assert index.suggest("fant")[0]["id"] == 1
+
+    index.remove(1)
+    assert index.suggest("fant") == []
+
+    # Запись мимо индекса (другой процесс) подтягивается из журнала
+    book = repo.create_book({"title": "Dune", "author": "Herbert", "year": 1965})
+    index.sync(repo)
+    assert index.suggest("dun")[0]["id"] == book["id"]
+
+    repo.delete_book(book["id"])
+    index.sync(repo)
+    assert index.suggest("dun") == []